@@ -1,7 +1,12 @@
 from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import os
-import json
+
+from scrapers.changes import PAGE_SIZE, ChangeLog
+from scrapers.match import filter_groups, latest_matches_path, load_matches
+from scrapers.snapshot import SnapshotReader
+from scrapers.telemetry import load_latest_report, prometheus_text
+from scrapers.units import UNITS, canonical_unit
 
 app = FastAPI()
 
@@ -11,6 +16,14 @@ DATA_PATH = os.path.join(
 
 print(DATA_PATH)
 
+# Each worker maps the current snapshot generation read-only; the records are
+# shared through the page cache rather than parsed into every process.
+catalog = SnapshotReader(data_path=DATA_PATH)
+# Latest match artifact, reloaded when the matching stage publishes a new one
+matches_cache = {"path": None, "artifact": None}
+# Opened on the first /changes request of each worker
+change_log = {"log": None}
+
 
 @app.get("/")
 def root():
@@ -21,28 +34,103 @@ def root():
 
 @app.get("/materials/{category}")
 def get_materials_by_category(category: str):
-    if not os.path.exists(DATA_PATH):
+    snapshot = catalog.current()
+    if snapshot is None:
+        return JSONResponse(
+            status_code=404, content={"error": "materials.json not found"}
+        )
+    return snapshot.find_by_category(category)
+
+
+@app.get("/cheapest/{category}")
+def get_cheapest_per_unit(category: str, unit: str = "L", limit: int = 10):
+    """Cheapest offers per litre/kg/m²/m/piece in a category, all suppliers."""
+    canonical = canonical_unit(unit)
+    if canonical is None:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"unknown unit {unit!r}, use one of {', '.join(UNITS)}"},
+        )
+    snapshot = catalog.current()
+    if snapshot is None:
+        return JSONResponse(
+            status_code=404, content={"error": "materials.json not found"}
+        )
+    offers = []
+    limit = max(1, min(limit, 500))
+    for price, idx in snapshot.cheapest_per_unit(category, canonical, limit):
+        record = snapshot.get(idx)
+        record["price_per_unit"] = price
+        record["quantity_unit"] = canonical
+        offers.append(record)
+    return {"category": category, "unit": canonical, "offers": offers}
+
+
+@app.get("/catalog")
+def get_catalog_info():
+    snapshot = catalog.current()
+    if snapshot is None:
         return JSONResponse(
             status_code=404, content={"error": "materials.json not found"}
         )
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    category_lower = category.lower()
-    results = []
-    for item in data:
-        # Check main category field (can be list or str)
-        cat = item.get("category", "")
-        if isinstance(cat, list):
-            if any(category_lower in str(c).lower() for c in cat):
-                results.append(item)
-                continue
-        elif category_lower in str(cat).lower():
-            results.append(item)
-            continue
-        # Check primary/secondary/tertiary
-        for key in ["category_primary", "category_secondary", "category_tertiary"]:
-            val = item.get(key, "")
-            if val and category_lower in str(val).lower():
-                results.append(item)
-                break
-    return results
+    return {
+        "generation": snapshot.generation,
+        "count": len(snapshot),
+        "created_at": snapshot.created_at,
+        "pid": os.getpid(),
+    }
+
+
+@app.get("/matches")
+def get_matches(keyword: str = "", min_spread: float = 0.0):
+    path = latest_matches_path()
+    if path is None or not os.path.exists(path):
+        return JSONResponse(
+            status_code=404,
+            content={"error": "no match artifact, run python -m scrapers.match"},
+        )
+    if matches_cache["path"] != path:
+        matches_cache["artifact"] = load_matches()
+        matches_cache["path"] = path
+    artifact = matches_cache["artifact"]
+    groups = [
+        g
+        for g in filter_groups(artifact["groups"], keyword)
+        if (g["spread"] or 0.0) >= min_spread
+    ]
+    return {
+        "version": artifact["version"],
+        "created_at": artifact["created_at"],
+        "match_stats": artifact.get("match_stats"),
+        "count": len(groups),
+        "groups": groups,
+    }
+
+
+@app.get("/changes")
+def get_changes(since: int = 0, limit: int = PAGE_SIZE):
+    """Catalog changes after version `since`; pass `next` back to continue."""
+    if change_log["log"] is None:
+        change_log["log"] = ChangeLog()
+    log = change_log["log"]
+    changes, has_more = log.since(since, limit)
+    return {
+        "since": since,
+        "next": changes[-1]["version"] if changes else since,
+        "has_more": has_more,
+        "latest": log.latest(),
+        "changes": changes,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Latest crawl run report (scrapers/telemetry.py) in Prometheus format."""
+    if os.getenv("EXPOSE_METRICS", "1") == "0":
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    report = load_latest_report()
+    if report is None:
+        return PlainTextResponse("no crawl run report yet\n", status_code=404)
+    return PlainTextResponse(
+        prometheus_text(report), media_type="text/plain; version=0.0.4"
+    )
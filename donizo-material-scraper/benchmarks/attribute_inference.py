@@ -0,0 +1,67 @@
+"""
+attribute_inference.py
+Micro-benchmark: brand/unit inference, per-card legacy logic vs the
+config-driven `scrapers.attributes` stage, over the names in
+data/materials.json.
+
+    python -m benchmarks.attribute_inference --repeat 200
+"""
+
+import argparse
+import json
+import time
+
+from scrapers.attributes import rules_for
+from scrapers.helpers import get_data_path
+from tests.legacy_attributes import legacy_brand, legacy_unit
+
+
+def load_names():
+    with open(get_data_path(), "r", encoding="utf-8") as f:
+        return [item["name"] for item in json.load(f) if item.get("name")]
+
+
+def bench(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    names = load_names()
+    castorama = rules_for("Castorama")
+    manomano = rules_for("ManoMano")
+
+    def legacy():
+        for name in names:
+            legacy_brand(name)
+            legacy_unit(name)
+
+    def stage():
+        castorama.apply([{"name": name, "brand": None} for name in names])
+        manomano.apply([{"name": name, "unit": None} for name in names])
+
+    calls = len(names) * args.repeat
+    legacy_time = bench(legacy, args.repeat)
+    stage_time = bench(stage, args.repeat)
+    print(
+        json.dumps(
+            {
+                "names": len(names),
+                "repeat": args.repeat,
+                "legacy_us_per_name": round(legacy_time / calls * 1e6, 2),
+                "stage_us_per_name": round(stage_time / calls * 1e6, 2),
+                "speedup": round(legacy_time / stage_time, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+catalog_memory.py
+Memory per record of the catalog held as a list of dicts (json.load) vs the
+compact `scrapers.catalog.Catalog`, for synthetic catalogs of 100k and 1M
+products built by varying the records in data/materials.json.
+
+Each measurement loads a generated materials.json in a fresh interpreter
+and reports the Python heap still allocated (tracemalloc) divided by the
+number of records.
+
+    python -m benchmarks.catalog_memory --sizes 100000 1000000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from scrapers.helpers import get_data_path
+
+SAMPLE = {
+    "name": "Faience murale blanche 20x20cm",
+    "category": ["Salle de bain", "Carrelage", "Faience"],
+    "price": "12,99 €",
+    "url": "",
+    "brand": "Faience",
+    "unit": "20x20cm",
+    "image_url": "https://media.castorama.fr/is/image/Castorama/faience~3663602_FR",
+    "supplier": "Castorama",
+    "category_primary": "Salle de bain",
+    "category_secondary": "Carrelage",
+    "category_tertiary": "Faience",
+}
+
+MEASURE = """
+import gc, json, sys, time, tracemalloc
+from scrapers.catalog import Catalog
+path, kind = sys.argv[1], sys.argv[2]
+tracemalloc.start()
+start = time.perf_counter()
+if kind == "dicts":
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+else:
+    data = Catalog.load(path)
+seconds = time.perf_counter() - start
+gc.collect()
+current, peak = tracemalloc.get_traced_memory()
+print(json.dumps({"bytes": current, "peak": peak, "seconds": seconds}))
+"""
+
+
+def base_records():
+    try:
+        with open(get_data_path(), "r", encoding="utf-8") as f:
+            records = [item for item in json.load(f) if isinstance(item, dict)]
+    except (OSError, ValueError):
+        records = []
+    return records or [SAMPLE]
+
+
+def write_synthetic(path, size):
+    """`size` products cycling through the real ones, each with its own name/URL."""
+    base = base_records()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for i in range(size):
+            item = dict(base[i % len(base)])
+            item["name"] = f"{item.get('name')} #{i}"
+            if item.get("url"):
+                item["url"] = f"{item['url']}?v={i}"
+            if item.get("image_url", "").startswith("http"):
+                item["image_url"] = f"{item['image_url']}&v={i}"
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(item, ensure_ascii=False, indent=2))
+        f.write("\n]")
+
+
+def measure(path, kind):
+    out = subprocess.run(
+        [sys.executable, "-c", MEASURE, path, kind],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"materials-{size}.json")
+            start = time.perf_counter()
+            write_synthetic(path, size)
+            print(f"Generated {size} records in {time.perf_counter() - start:.1f}s")
+            row = {"file_mb": round(os.path.getsize(path) / 1e6, 1)}
+            for kind in ("dicts", "catalog"):
+                result = measure(path, kind)
+                row[kind] = {
+                    "bytes_per_record": round(result["bytes"] / size),
+                    "peak_mb": round(result["peak"] / 1e6, 1),
+                    "load_seconds": round(result["seconds"], 2),
+                }
+            row["ratio"] = round(
+                row["dicts"]["bytes_per_record"] / row["catalog"]["bytes_per_record"],
+                2,
+            )
+            report[size] = row
+            os.remove(path)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+cli_startup.py
+Startup cost of the crawler CLI, each run in a fresh interpreter:
+
+- "import": `import scrapers.main` as it is now (supplier plugins, Playwright,
+  BeautifulSoup, requests and the matching stage are imported on use);
+- "eager import": the same plus every module the CLI used to import up front;
+- "dry run": wall time of `python -m scrapers.main --dry-run`.
+
+    python -m benchmarks.cli_startup --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["playwright", "bs4", "requests", "spacy", "numpy"]
+EAGER = [
+    "scrapers.main",
+    "scrapers.common",
+    "scrapers.castorama",
+    "scrapers.manomano",
+    "scrapers.enrich",
+    "scrapers.match",
+]
+
+IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+seconds = time.perf_counter() - start
+heavy = [m for m in %r if m in sys.modules]
+print(json.dumps({"seconds": seconds, "heavy": heavy}))
+""" % (HEAVY,)
+
+
+def run(args):
+    return subprocess.run(
+        [sys.executable] + args, cwd=ROOT, check=True, capture_output=True, text=True
+    )
+
+
+def import_time(modules, repeat):
+    results = [
+        json.loads(run(["-c", IMPORT] + modules).stdout) for _ in range(repeat)
+    ]
+    return {
+        "median_ms": round(statistics.median(r["seconds"] for r in results) * 1000, 1),
+        "heavy_modules": results[0]["heavy"],
+    }
+
+
+def dry_run_time(repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(["-m", "scrapers.main", "--dry-run"])
+        times.append(time.perf_counter() - start)
+    return {"median_ms": round(statistics.median(times) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    report = {
+        "import": import_time(["scrapers.main"], args.repeat),
+        "eager_import": import_time(EAGER, args.repeat),
+        "dry_run": dry_run_time(args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+matching_recall.py
+Recall of the blocked LSH matcher against the exhaustive matcher.
+
+The exhaustive matcher's cross-supplier pairs on a sample of the catalog are
+the labels; the report shows how many of them the LSH candidate generator
+recovers and how much scoring work it saved.
+
+    python -m benchmarks.matching_recall --sample 300 --tables 20 --bits 6
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from scrapers.compare_prices import (
+    CrossSupplierMatcher,
+    LSH_BITS,
+    LSH_TABLES,
+    SimilarityIndex,
+    category_text,
+    load_nlp,
+    exhaustive_pairs,
+    normalize_texts,
+    pair_recall,
+)
+
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "data", "materials.json"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample", type=int, default=0, help="0 = whole catalog")
+    parser.add_argument("--tables", type=int, default=LSH_TABLES)
+    parser.add_argument(
+        "--bits", type=int, default=LSH_BITS, help="bits of the smallest blocks"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    if args.sample and args.sample < len(items):
+        items = random.Random(args.seed).sample(items, args.sample)
+
+    nlp = load_nlp()
+    norm_names = normalize_texts(nlp, [item.get("name") or "" for item in items])
+    norm_cats = normalize_texts(nlp, [category_text(item) for item in items])
+    suppliers = [item.get("supplier") for item in items]
+
+    start = time.perf_counter()
+    expected = exhaustive_pairs(SimilarityIndex(nlp, norm_names, norm_cats), suppliers)
+    exhaustive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matcher = CrossSupplierMatcher(
+        nlp, norm_names, norm_cats, suppliers, n_tables=args.tables, n_bits=args.bits
+    )
+    candidates = matcher.candidate_pairs()
+    found = matcher.matches()
+    lsh_time = time.perf_counter() - start
+
+    n = len(items)
+    print(
+        json.dumps(
+            {
+                "products": n,
+                "all_pairs": n * (n - 1) // 2,
+                "labelled_pairs": len(expected),
+                "candidate_pairs": int(len(candidates)),
+                "matched_pairs": int(len(found)),
+                "recall": round(pair_recall(found, expected), 4),
+                "exhaustive_seconds": round(exhaustive_time, 3),
+                "lsh_seconds": round(lsh_time, 3),
+                "tables": args.tables,
+                "bits": args.bits,
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
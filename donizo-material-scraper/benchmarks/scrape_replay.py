@@ -0,0 +1,107 @@
+"""
+scrape_replay.py
+Offline crawl throughput: replays a recorded crawl (see scrapers/replay.py)
+through the real discovery functions and `scrape_category`, and reports
+pages/items per second with the per-phase breakdown from scrapers.telemetry.
+
+    python -m scrapers.main --supplier castorama --record data/recordings
+    python -m benchmarks.scrape_replay --archive data/recordings --repeat 3
+"""
+
+import argparse
+import json
+import os
+import time
+
+from scrapers.replay import ARCHIVE_DIR
+
+
+def crawl(supplier, categories):
+    from scrapers.castorama import discover_castorama_categories_with_paths
+    from scrapers.common import scrape_category
+    from scrapers.manomano import discover_manomano_categories
+
+    if supplier["name"].lower() == "castorama":
+        discovered = discover_castorama_categories_with_paths(supplier["base_url"])
+    else:
+        discovered = discover_manomano_categories(
+            supplier["base_url"], "section.ec_tSD"
+        )
+        # main() skips ManoMano's first category as well
+        discovered = dict(list(discovered.items())[1:])
+    items = []
+    for cat_key, cat_url in list(discovered.items())[:categories]:
+        context = {"name": supplier["name"], "base_url": supplier["base_url"]}
+        if isinstance(cat_key, tuple):
+            context.update(
+                category_primary=cat_key[0],
+                category_secondary=cat_key[1],
+                category_tertiary=cat_key[2],
+            )
+        selectors = supplier["categories"].get(cat_key) or supplier["categories"].get(
+            "tiles"
+        )
+        items.extend(scrape_category(context, cat_key, cat_url, selectors))
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", default=ARCHIVE_DIR)
+    parser.add_argument("--supplier", default="castorama")
+    parser.add_argument("--categories", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["SCRAPER_MODE"] = "replay"
+    os.environ["SCRAPER_ARCHIVE"] = args.archive
+    from scrapers.helpers import load_config
+    from scrapers.replay import replay_server
+    from scrapers.telemetry import telemetry
+
+    supplier = next(
+        s
+        for s in load_config()["suppliers"]
+        if s["name"].lower() == args.supplier.lower()
+    )
+    runs = []
+    for _ in range(args.repeat):
+        telemetry.reset()
+        start = time.perf_counter()
+        items = crawl(supplier, args.categories)
+        seconds = time.perf_counter() - start
+        report = telemetry.report()
+        pages = sum(c["value"] for c in report["counters"] if c["name"] == "pages")
+        runs.append(
+            {
+                "seconds": round(seconds, 2),
+                "pages": pages,
+                "items": len(items),
+                "pages_per_s": round(pages / seconds, 2),
+                "items_per_s": round(len(items) / seconds, 1),
+                "phases": {
+                    s["phase"]: s["seconds"]
+                    for s in report["spans"]
+                    if s["labels"].get("supplier") == supplier["name"]
+                },
+            }
+        )
+    server = replay_server()
+    print(
+        json.dumps(
+            {
+                "archive": args.archive,
+                "supplier": supplier["name"],
+                "recorded_urls": len(server.responses),
+                "replay_hits": server.hits,
+                "replay_misses": server.misses,
+                "runs": runs,
+            },
+            indent=2,
+            ensure_ascii=False,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
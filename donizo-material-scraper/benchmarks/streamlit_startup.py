@@ -0,0 +1,95 @@
+"""
+streamlit_startup.py
+Time-to-first-render of the Streamlit app, with and without eager spaCy.
+
+Each measurement runs in a fresh interpreter (cold imports, empty Streamlit
+caches) and executes one full script run through Streamlit's AppTest:
+
+- "eager": the previous behaviour, the full fr_core_news_md pipeline is
+  loaded before the page finishes rendering;
+- "lazy": the current app, which leaves spaCy unloaded until a comparison
+  needs it.
+
+It also compares load time and lemmatization throughput of the full and the
+trimmed (no parser/NER) pipelines.
+
+    python -m benchmarks.streamlit_startup
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+APP_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "streamlit_app.py"
+)
+
+
+def first_render(eager):
+    start = time.perf_counter()
+    if eager:
+        import spacy
+
+        spacy.load("fr_core_news_md")
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=300).run()
+    assert not at.exception, at.exception
+    return time.perf_counter() - start
+
+
+def pipelines():
+    from scrapers.compare_prices import SPACY_MODEL, UNUSED_COMPONENTS, lemmatize
+    from scrapers.helpers import get_data_path
+
+    import spacy
+
+    with open(get_data_path(), "r", encoding="utf-8") as f:
+        texts = [item["name"].lower() for item in json.load(f)]
+    report = {}
+    for label, exclude in [("full", []), ("trimmed", UNUSED_COMPONENTS)]:
+        start = time.perf_counter()
+        nlp = spacy.load(SPACY_MODEL, exclude=exclude)
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        for doc in nlp.pipe(texts):
+            lemmatize(doc)
+        report[label] = {
+            "components": nlp.pipe_names,
+            "load_seconds": round(loaded, 2),
+            "lemmatize_seconds": round(time.perf_counter() - start, 2),
+            "texts": len(texts),
+        }
+    return report
+
+
+def run_child(mode):
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.streamlit_startup", mode],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1:
+        mode = sys.argv[1]
+        result = pipelines() if mode == "pipelines" else first_render(mode == "eager")
+        print(json.dumps(result))
+        return
+    report = {
+        "time_to_first_render_seconds": {
+            "before_eager_spacy": round(run_child("eager"), 2),
+            "after_lazy_spacy": round(run_child("lazy"), 2),
+        },
+        "pipelines": run_child("pipelines"),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+attributes.py
+Post-extraction brand and unit inference.
+
+Card extraction only reads what the page shows; brand guesses and pack
+sizes derived from the product name are filled in afterwards, per page of
+records, by rules loaded once per supplier from the `attributes` section of
+scraper_config.yaml (word sets and compiled regexes).
+"""
+
+import re
+
+from scrapers.helpers import load_config
+
+
+class AttributeRules:
+    def __init__(
+        self, brand_from_first_word=False, generic_words=(), unit_patterns=()
+    ):
+        self.brand_from_first_word = brand_from_first_word
+        self.generic_words = frozenset(generic_words)
+        self.unit_patterns = [re.compile(p, re.IGNORECASE) for p in unit_patterns]
+
+    @classmethod
+    def from_config(cls, supplier_config):
+        attributes = supplier_config.get("attributes") or {}
+        return cls(
+            brand_from_first_word=attributes.get("brand_from_first_word", False),
+            generic_words=attributes.get("generic_words") or (),
+            unit_patterns=attributes.get("unit_patterns") or (),
+        )
+
+    def brand(self, name):
+        """First word of the name, unless it is a generic material word."""
+        first_word = name.split()[0]
+        if first_word.lower() in self.generic_words:
+            return None
+        return first_word
+
+    def unit(self, name):
+        """First unit pattern (in config order) found in the name."""
+        for pattern in self.unit_patterns:
+            match = pattern.search(name)
+            if match:
+                return match.group(0)
+        return None
+
+    def apply(self, records):
+        """Fill brand/unit on a page or batch of records, in place."""
+        for record in records:
+            name = record.get("name")
+            if self.brand_from_first_word and record.get("brand") is None and name:
+                record["brand"] = self.brand(name)
+            if self.unit_patterns:
+                record["unit"] = self.unit(name) if name else None
+        return records
+
+
+_rules = {}
+
+
+def rules_for(supplier_name):
+    """Attribute rules of a supplier, built once per process from the config."""
+    key = supplier_name.lower()
+    if key not in _rules:
+        for supplier in load_config()["suppliers"]:
+            rules = AttributeRules.from_config(supplier)
+            _rules.setdefault(supplier["name"].lower(), rules)
+        _rules.setdefault(key, AttributeRules())
+    return _rules[key]
@@ -0,0 +1,193 @@
+"""
+browser.py
+Browser memory governance for long crawls.
+
+A `ManagedBrowser` wraps the Chromium a crawl thread or worker uses. Every
+listing page gets a fresh context from it; once a page has loaded,
+`measure(page)` samples the page's JS heap and the resident memory of the
+browser's processes into the run telemetry (`page_js_heap_bytes`,
+`browser_rss_bytes`). The browser is closed and relaunched:
+
+- after BROWSER_MAX_NAVIGATIONS contexts (default 200),
+- when its processes use more than BROWSER_MAX_RSS_MB (default 1500),
+- when it has crashed or disconnected, before the next page.
+
+Long-lived pages (Castorama's category menu) call `page_due` to learn when
+to be replaced: after PAGE_MAX_NAVIGATIONS uses or PAGE_MAX_HEAP_MB of JS
+heap. The run report keeps memory over time, and `memory_summary` prints it.
+"""
+
+import os
+
+from scrapers.replay import headless, new_context
+from scrapers.telemetry import count, telemetry
+
+MAX_NAVIGATIONS = 200
+MAX_RSS_MB = 1500
+PAGE_MAX_NAVIGATIONS = 25
+PAGE_MAX_HEAP_MB = 256
+MB = 1024 * 1024
+
+JS_HEAP = "() => performance.memory ? performance.memory.usedJSHeapSize : null"
+
+
+def _limit(name, default):
+    return float(os.getenv(name, default))
+
+
+def launch_browser(p):
+    return p.chromium.launch(
+        headless=headless(), args=["--disable-blink-features=AutomationControlled"]
+    )
+
+
+def process_rss(pids):
+    """Resident memory of the given processes in bytes, from /proc (Linux).
+
+    None when it cannot be read; processes that already exited count as 0.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    total = 0
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm", "r") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+def browser_pids(browser):
+    """Ids of a Chromium browser's processes (browser, renderers, GPU...)."""
+    try:
+        session = browser.new_browser_cdp_session()
+        try:
+            info = session.send("SystemInfo.getProcessInfo")
+        finally:
+            session.detach()
+    except Exception:
+        # Not Chromium, or the browser is gone
+        return None
+    return [process["id"] for process in info.get("processInfo", [])]
+
+
+def page_heap(page):
+    """JS heap in use by a page in bytes, or None where it isn't exposed."""
+    try:
+        value = page.evaluate(JS_HEAP)
+    except Exception:
+        return None
+    return int(value) if value else None
+
+
+class ManagedBrowser:
+    """A browser that is relaunched when it grows too large or crashes.
+
+    `label` names it in the telemetry (a supplier, "worker", "enrich").
+    """
+
+    def __init__(self, playwright, label, max_navigations=None, max_rss_mb=None):
+        self.playwright = playwright
+        self.label = label
+        self.max_navigations = max_navigations or _limit(
+            "BROWSER_MAX_NAVIGATIONS", MAX_NAVIGATIONS
+        )
+        self.max_rss = (max_rss_mb or _limit("BROWSER_MAX_RSS_MB", MAX_RSS_MB)) * MB
+        self.browser = None
+        self.navigations = 0
+        self.recycle_reason = None
+        self.launch()
+
+    def launch(self):
+        self.browser = launch_browser(self.playwright)
+        self.navigations = 0
+        self.recycle_reason = None
+        count("browser_launches", browser=self.label)
+
+    def is_connected(self):
+        return self.browser is not None and self.browser.is_connected()
+
+    def recycle(self, reason):
+        print(
+            f"♻️ Relaunching {self.label} browser after {self.navigations} "
+            f"navigations ({reason})"
+        )
+        count("browser_recycles", browser=self.label)
+        self.close()
+        self.launch()
+
+    def new_context(self, **kwargs):
+        """A fresh context (see `replay.new_context`), relaunching the browser
+        first if it crashed or is due to be recycled."""
+        if not self.is_connected():
+            print(f"💥 {self.label} browser crashed or disconnected, relaunching")
+            count("browser_crashes", browser=self.label)
+            self.browser = None
+            self.launch()
+        elif self.navigations >= self.max_navigations:
+            self.recycle(f"{self.navigations} navigations")
+        elif self.recycle_reason:
+            self.recycle(self.recycle_reason)
+        self.navigations += 1
+        return new_context(self.browser, **kwargs)
+
+    def rss(self):
+        pids = browser_pids(self.browser)
+        return process_rss(pids) if pids else None
+
+    def measure(self, page):
+        """Sample the page's heap and the browser's memory; flag a recycle
+        (before the next context) when the browser is over its budget."""
+        heap = page_heap(page)
+        if heap is not None:
+            telemetry.sample("page_js_heap_bytes", heap, browser=self.label)
+        rss = self.rss()
+        if rss is not None:
+            telemetry.sample("browser_rss_bytes", rss, browser=self.label)
+            if rss > self.max_rss:
+                self.recycle_reason = f"{rss / MB:.0f} MB resident"
+        return rss
+
+    def close(self):
+        if self.browser is None:
+            return
+        try:
+            self.browser.close()
+        except Exception:
+            # Already dead; the Playwright driver cleans up after it
+            pass
+        self.browser = None
+
+
+def page_due(page, uses, label):
+    """Whether a long-lived page should be replaced by a fresh one."""
+    heap = page_heap(page)
+    if heap is not None:
+        telemetry.sample("page_js_heap_bytes", heap, browser=label)
+    max_uses = _limit("PAGE_MAX_NAVIGATIONS", PAGE_MAX_NAVIGATIONS)
+    max_heap = _limit("PAGE_MAX_HEAP_MB", PAGE_MAX_HEAP_MB) * MB
+    return uses >= max_uses or (heap is not None and heap > max_heap)
+
+
+def memory_summary(report):
+    """Console lines: peak/last memory of each sampled browser and recycles."""
+    events = {}
+    for c in report.get("counters", []):
+        if c["name"] in ("browser_recycles", "browser_crashes"):
+            label = c["labels"].get("browser")
+            events.setdefault(label, {})[c["name"]] = c["value"]
+    lines = []
+    for s in report.get("samples", []):
+        if s["name"] != "browser_rss_bytes" or not s["points"]:
+            continue
+        label = s["labels"].get("browser")
+        first, last = s["points"][0], s["points"][-1]
+        lines.append(
+            f"🧠 {label} browser memory: {first[1] / MB:.0f} MB at {first[0]:.0f}s, "
+            f"{last[1] / MB:.0f} MB at {last[0]:.0f}s, peak {s['max'] / MB:.0f} MB; "
+            f"{events.get(label, {}).get('browser_recycles', 0)} recycles, "
+            f"{events.get(label, {}).get('browser_crashes', 0)} crashes"
+        )
+    return lines
@@ -1,6 +1,9 @@
 import time
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from scrapers.helpers import human_scroll, get_random_headers
+from scrapers.browser import page_due
+from scrapers.helpers import human_scroll, get_random_headers, pause
+from scrapers.ratelimit import limiter_for, navigate
+from scrapers.replay import headless, new_context, replaying
 import os
 
 
@@ -16,7 +19,7 @@ def open_castorama_menu(page):
         menu_btn.wait_for_element_state("enabled", timeout=5000)
         menu_btn.click(force=True)
         print("✅ Menu button clicked.")
-        time.sleep(2)
+        pause(2)
         return True
     except Exception as e:
         print(f"❌ Failed to open menu: {e}")
@@ -31,7 +34,7 @@ def handle_castorama_cookie_banner(page):
         if cookie_btn:
             print("🍪 Clicking Castorama cookie consent button...")
             cookie_btn.click()
-            time.sleep(1)
+            pause(1)
     except Exception as e:
         print("No Castorama cookie consent button found or error:", e)
 
@@ -44,25 +47,45 @@ def handle_castorama_location_drawer(page):
         if close_btn:
             print("📍 Closing location/postal code drawer...")
             close_btn.click()
-            time.sleep(1)
+            pause(1)
         continue_btn = page.query_selector(
             'button[data-test-id="location-drawer-continue-without"]'
         )
         if continue_btn:
             print("📍 Continuing without choosing location...")
             continue_btn.click()
-            time.sleep(1)
+            pause(1)
         tooltip_btn = page.query_selector(
             'button[data-test-id="location-tool-tip-button"]'
         )
         if tooltip_btn:
             print("📍 Closing location tooltip popup...")
             tooltip_btn.click()
-            time.sleep(1)
+            pause(1)
     except Exception as e:
         print("No location drawer to close or error:", e)
 
 
+def open_home(context, base_url):
+    """A new page on the home page, with the banners out of the way."""
+    page = context.new_page()
+    navigate(page, base_url, limiter_for("Castorama"))
+    handle_castorama_cookie_banner(page)
+    handle_castorama_location_drawer(page)
+    pause(2)
+    return page
+
+
+def open_main_menu(page):
+    """Open the mega menu and return its primary category list."""
+    menu_btn = page.wait_for_selector(
+        'button[data-test-id="menu-button-open"]', timeout=15000, state="visible"
+    )
+    menu_btn.click()
+    page.wait_for_selector('ol[id^="megaNav-list[1]"]', timeout=10000)
+    return page.query_selector('ol[id^="megaNav-list[1]"]')
+
+
 def discover_castorama_categories_with_paths(base_url):
     MAX_PRIMARIES = int(os.getenv("CASTORAMA_PRIMARY_LIMIT", 2))
     MAX_SECONDARIES = int(os.getenv("CASTORAMA_SECONDARY_LIMIT", 2))
@@ -76,33 +99,31 @@ def discover_castorama_categories_with_paths(base_url):
     discovered = {}
     headers = get_random_headers()
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False, slow_mo=400, args=args)
-        context = browser.new_context(
+        browser = p.chromium.launch(
+            headless=headless(), slow_mo=0 if replaying() else 400, args=args
+        )
+        context = new_context(
+            browser,
             extra_http_headers=headers,
             user_agent=headers["User-Agent"],
         )
-        page = context.new_page()
-        page.goto(base_url, timeout=45000)
-        handle_castorama_cookie_banner(page)
-        handle_castorama_location_drawer(page)
-        time.sleep(2)
+        page = open_home(context, base_url)
         print("🕵️ Opening main menu...")
-        menu_btn = page.wait_for_selector(
-            'button[data-test-id="menu-button-open"]', timeout=15000, state="visible"
-        )
-        menu_btn.click()
-        page.wait_for_selector('ol[id^="megaNav-list[1]"]', timeout=10000)
+        primary_ol = open_main_menu(page)
         print("✅ Main menu opened.")
-        primary_ol = page.query_selector('ol[id^="megaNav-list[1]"]')
         if not primary_ol:
             print("❌ Primary category list not found!")
+            context.close()
             browser.close()
             return discovered
         primary_lis = primary_ol.query_selector_all(
             'li > a[data-test-id^="category-menu-link "]'
         )
-        for primary_idx, primary_a in enumerate(primary_lis[:MAX_PRIMARIES]):
+        # Menu re-opens on the current page; it is replaced when due
+        menu_uses = 0
+        for primary_idx in range(min(MAX_PRIMARIES, len(primary_lis))):
             try:
+                primary_a = primary_lis[primary_idx]
                 primary_name = primary_a.inner_text().strip().split("\n")[0]
                 print(f"➡️ Primary: {primary_name}")
                 primary_a.click()
@@ -121,6 +142,7 @@ def discover_castorama_categories_with_paths(base_url):
                 for secondary_idx, secondary_a in enumerate(
                     secondary_lis[:MAX_SECONDARIES]
                 ):
+                    menu_uses += 1
                     try:
                         secondary_name = secondary_a.inner_text().strip().split("\n")[0]
                         print(f"  ↪️ Secondary: {secondary_name}")
@@ -255,5 +277,26 @@ def discover_castorama_categories_with_paths(base_url):
                 if menu_btn:
                     menu_btn.click()
                     page.wait_for_selector('ol[id^="megaNav-list[1]"]', timeout=10000)
+            if page_due(page, menu_uses, "discovery"):
+                # The menu page accumulates DOM and JS heap with every re-open
+                print(f"♻️ Reloading the home page after {menu_uses} menu re-opens")
+                page.close()
+                page = open_home(context, base_url)
+                primary_ol = open_main_menu(page)
+                primary_lis = primary_ol.query_selector_all(
+                    'li > a[data-test-id^="category-menu-link "]'
+                )
+                menu_uses = 0
+        context.close()
         browser.close()
     return discovered
+
+
+def discover_categories(supplier):
+    """Plugin entry point: (primary, secondary, tertiary) -> listing URL."""
+    return discover_castorama_categories_with_paths(supplier["base_url"])
+
+
+def after_navigate(page):
+    handle_castorama_location_drawer(page)
+    pause(2)
@@ -0,0 +1,218 @@
+"""
+catalog.py
+Compact catalog model shared by save_data, the API snapshots and Streamlit.
+
+materials.json repeats the supplier name and the same category strings in
+every record (`category` plus `category_primary/secondary/tertiary`). In
+memory, a `Catalog` keeps one slotted `Record` per product: the category
+fields are replaced by an integer id into a `CategoryTable` of distinct
+paths, and supplier, brand and unit strings (and placeholder images) are
+interned so every product shares one copy. Full dicts are only rebuilt for
+the records a caller actually reads.
+
+`iter_records` streams a materials.json file record by record instead of
+parsing the whole list at once.
+
+    python -m benchmarks.catalog_memory   # bytes per record, dicts vs Catalog
+"""
+
+import json
+import os
+import re
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "materials.json")
+CATEGORY_FIELDS = (
+    "category",
+    "category_primary",
+    "category_secondary",
+    "category_tertiary",
+)
+KEY_ORDER = (
+    "name",
+    "category",
+    "price",
+    "url",
+    "brand",
+    "unit",
+    "image_url",
+    "supplier",
+    "category_primary",
+    "category_secondary",
+    "category_tertiary",
+)
+CHUNK_SIZE = 1 << 20
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def category_labels(item):
+    """Lower-cased category strings an item can be matched on by the API."""
+    labels = set()
+    cat = item.get("category", "")
+    if isinstance(cat, list):
+        labels.update(str(c).lower() for c in cat)
+    else:
+        labels.add(str(cat).lower())
+    for key in ["category_primary", "category_secondary", "category_tertiary"]:
+        val = item.get(key, "")
+        if val:
+            labels.add(str(val).lower())
+    return labels
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _freeze(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+class CategoryTable:
+    """Distinct category paths (the four category fields), by integer id."""
+
+    def __init__(self):
+        self.paths = []
+        self._ids = {}
+        self._labels = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def id_for(self, item):
+        key = tuple(_freeze(item.get(field)) for field in CATEGORY_FIELDS)
+        cat_id = self._ids.get(key)
+        if cat_id is None:
+            cat_id = self._ids[key] = len(self.paths)
+            self.paths.append({field: item.get(field) for field in CATEGORY_FIELDS})
+        return cat_id
+
+    def fields(self, cat_id):
+        return self.paths[cat_id]
+
+    def labels(self, cat_id):
+        """`category_labels` of a path, computed once per path."""
+        if cat_id not in self._labels:
+            self._labels[cat_id] = category_labels(self.paths[cat_id])
+        return self._labels[cat_id]
+
+
+class Record:
+    """One product; its category fields live in the catalog's CategoryTable."""
+
+    __slots__ = (
+        "name",
+        "price",
+        "url",
+        "brand",
+        "unit",
+        "image_url",
+        "supplier",
+        "category_id",
+        "extra",
+    )
+
+    def __init__(self, item, categories):
+        self.name = item.get("name")
+        self.price = item.get("price")
+        self.url = item.get("url")
+        self.brand = _intern(item.get("brand"))
+        self.unit = _intern(item.get("unit"))
+        image_url = item.get("image_url")
+        if isinstance(image_url, str) and image_url.startswith("data:"):
+            # Lazy-loading placeholders are the same SVG on every card
+            image_url = sys.intern(image_url)
+        self.image_url = image_url
+        self.supplier = _intern(item.get("supplier"))
+        self.category_id = categories.id_for(item)
+        # Fields added by later stages (e.g. enrichment), kept as they are
+        extra = {k: v for k, v in item.items() if k not in KEY_ORDER}
+        self.extra = extra or None
+
+    def to_dict(self, categories):
+        path = categories.fields(self.category_id)
+        item = {}
+        for key in KEY_ORDER:
+            if key in path:
+                value = path[key]
+                # Shared by every record on the path; hand out a copy
+                item[key] = list(value) if isinstance(value, list) else value
+            else:
+                item[key] = getattr(self, key)
+        if self.extra:
+            item.update(self.extra)
+        return item
+
+
+class Catalog:
+    """Records plus the category table they point into.
+
+    Indexing returns a freshly built dict, like one element of materials.json.
+    """
+
+    def __init__(self, items=()):
+        self.categories = CategoryTable()
+        self.records = []
+        for item in items:
+            self.add(item)
+
+    @classmethod
+    def load(cls, path=DATA_PATH):
+        return cls(iter_records(path))
+
+    def add(self, item):
+        self.records.append(Record(item, self.categories))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        return self.records[idx].to_dict(self.categories)
+
+    def __iter__(self):
+        for record in self.records:
+            yield record.to_dict(self.categories)
+
+    def ids_by_category_id(self):
+        """Category id -> ids of the records on that path."""
+        ids = {}
+        for idx, record in enumerate(self.records):
+            ids.setdefault(record.category_id, []).append(idx)
+        return ids
+
+
+def iter_records(path=DATA_PATH, chunk_size=CHUNK_SIZE):
+    """Yield the dict records of a materials.json file one at a time.
+
+    The file is read in chunks and decoded element by element, so only the
+    current chunk and record are held. Raises ValueError unless the file is
+    a JSON list.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = _SEPARATORS.match(buf).end()
+        if buf[pos : pos + 1] != "[":
+            raise ValueError(f"{f.name} is not a JSON list")
+        pos += 1
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos == len(buf):
+                    raise ValueError("need more input")
+                item, pos = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            if isinstance(item, dict):
+                yield item
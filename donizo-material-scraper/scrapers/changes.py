@@ -0,0 +1,199 @@
+"""
+changes.py
+Versioned change feed of the catalog, for incremental downstream sync.
+
+Every `save_data` call (one per crawl) appends what it changed in
+materials.json to a SQLite log under data/changes.sqlite: products
+`inserted`, `price_changed` and `removed`. Each change gets a version
+number that only ever increases, and a crawl's changes are committed
+together. Consumers remember the last version they applied and ask the API
+for `/changes?since=<version>`, paging with the returned cursor, so a sync
+costs time proportional to what changed rather than to the catalog size.
+
+A crawl's changes are written as pending before materials.json is swapped
+and committed after it; only committed changes are served. A pending crawl
+left by a process that died in between is settled by the next `save_data`:
+committed if the data file is the one it was written for (the swap
+happened), dropped otherwise.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CHANGES_PATH = os.path.join(BASE_DIR, "data", "changes.sqlite")
+KINDS = ("inserted", "price_changed", "removed")
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    finished_at REAL NOT NULL,
+    inserted INTEGER NOT NULL,
+    price_changed INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    committed INTEGER NOT NULL DEFAULT 1,
+    data_file TEXT
+);
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    crawl INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    supplier TEXT,
+    old_price TEXT,
+    price TEXT,
+    record TEXT
+);
+"""
+# Columns added to `crawls` after the first release of the log
+MIGRATIONS = (
+    ("committed", "INTEGER NOT NULL DEFAULT 1"),
+    ("data_file", "TEXT"),
+)
+COMMITTED = "crawl IN (SELECT id FROM crawls WHERE committed)"
+
+
+def file_stamp(path):
+    """Size and modification time of a file, kept by os.replace; or None."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class ChangeLog:
+    def __init__(self, path=None):
+        self.path = path or CHANGES_PATH
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode; a crawl's changes are written in one transaction
+        self._db = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(crawls)")}
+        for column, kind in MIGRATIONS:
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE crawls ADD COLUMN {column} {kind}")
+
+    def record_crawl(self, changes, data_file=None):
+        """Append one crawl's (kind, key, record, old price) changes.
+
+        With `data_file` (the `file_stamp` of the data file they describe)
+        the changes stay pending until `commit_crawl`. Returns the crawl id
+        and the number of changes of each kind.
+        """
+        counts = dict.fromkeys(KINDS, 0)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                crawl = self._db.execute(
+                    "INSERT INTO crawls (finished_at, inserted, price_changed,"
+                    " removed, committed, data_file) VALUES (?, 0, 0, 0, ?, ?)",
+                    (time.time(), data_file is None, data_file),
+                ).lastrowid
+                for kind, key, record, old_price in changes:
+                    counts[kind] += 1
+                    self._db.execute(
+                        "INSERT INTO changes (crawl, kind, key, supplier,"
+                        " old_price, price, record) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            crawl,
+                            kind,
+                            key,
+                            record.get("supplier"),
+                            old_price,
+                            record.get("price"),
+                            json.dumps(record, ensure_ascii=False),
+                        ),
+                    )
+                self._db.execute(
+                    "UPDATE crawls SET inserted = ?, price_changed = ?, removed = ?"
+                    " WHERE id = ?",
+                    (
+                        counts["inserted"],
+                        counts["price_changed"],
+                        counts["removed"],
+                        crawl,
+                    ),
+                )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        return crawl, counts
+
+    def commit_crawl(self, crawl):
+        """Serve a pending crawl's changes, once its data file is in place."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE crawls SET committed = 1, finished_at = ? WHERE id = ?",
+                (time.time(), crawl),
+            )
+
+    def recover(self, data_file):
+        """Settle crawls left pending against the current data file's stamp.
+
+        Returns the number of pending crawls committed and dropped.
+        """
+        committed = dropped = 0
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT id, data_file FROM crawls WHERE NOT committed"
+            ).fetchall()
+            for crawl, stamp in pending:
+                self._db.execute("BEGIN IMMEDIATE")
+                if stamp is not None and stamp == data_file:
+                    self._db.execute(
+                        "UPDATE crawls SET committed = 1 WHERE id = ?", (crawl,)
+                    )
+                    committed += 1
+                else:
+                    self._db.execute("DELETE FROM changes WHERE crawl = ?", (crawl,))
+                    self._db.execute("DELETE FROM crawls WHERE id = ?", (crawl,))
+                    dropped += 1
+                self._db.execute("COMMIT")
+        return committed, dropped
+
+    def since(self, version, limit=PAGE_SIZE):
+        """Changes after `version`, oldest first, and whether more follow."""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT version, crawl, kind, key, supplier, old_price, price, record"
+                f" FROM changes WHERE version > ? AND {COMMITTED}"
+                " ORDER BY version LIMIT ?",
+                (version, limit + 1),
+            ).fetchall()
+        changes = [
+            {
+                "version": row[0],
+                "crawl": row[1],
+                "kind": row[2],
+                "key": row[3],
+                "supplier": row[4],
+                "old_price": row[5],
+                "price": row[6],
+                "record": json.loads(row[7]) if row[7] else None,
+            }
+            for row in rows[:limit]
+        ]
+        return changes, len(rows) > limit
+
+    def latest(self):
+        """Version of the newest change (0 before the first one)."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT MAX(version) FROM changes WHERE {COMMITTED}"
+            ).fetchone()
+        return row[0] or 0
+
+    def close(self):
+        self._db.close()
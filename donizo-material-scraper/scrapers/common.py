@@ -1,288 +1,420 @@
+import math
 import os
+import queue
 import re
-import random
-import time
+import threading
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlsplit, urlunsplit
+
 from playwright.sync_api import sync_playwright
-from scrapers.helpers import get_random_headers, human_scroll, apply_stealth
-
-
-def scrape_category(supplier, category_key, category_url, selectors):
-    results = []
-    page_url = category_url
-    supplier_name = supplier["name"].lower()
-    if supplier_name == "castorama":
-        PRODUCT_LIMIT = int(os.getenv("CASTORAMA_PRODUCT_LIMIT", 100))
-        PAGE_LIMIT = int(os.getenv("CASTORAMA_PAGE_LIMIT", 10))
-    elif supplier_name == "manomano":
-        PRODUCT_LIMIT = int(os.getenv("MANOMANO_PRODUCT_LIMIT", 100))
-        PAGE_LIMIT = int(os.getenv("MANOMANO_PAGE_LIMIT", 10))
-    else:
-        PRODUCT_LIMIT = 100
-        PAGE_LIMIT = 10
-    page_count = 0
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False, args=["--disable-blink-features=AutomationControlled"]
-        )
-        headers = get_random_headers()
-        while True:
-            context = browser.new_context(
-                extra_http_headers=headers, user_agent=headers["User-Agent"]
+from scrapers.attributes import rules_for
+from scrapers.browser import ManagedBrowser
+from scrapers.crawl_state import category_id, crawl_limits
+from scrapers.helpers import get_random_headers, human_scroll, load_config
+from scrapers.plugins import hook
+from scrapers.ratelimit import BlockedError, limiter_for, navigate
+from scrapers.telemetry import count, span
+from scrapers.validate import CategoryValidator
+
+# Castorama's pager; used when a supplier sets no next_button_selector
+DEFAULT_NEXT_SELECTOR = 'a[aria-label="Page suivante"]'
+
+
+def _element(card, selectors, key):
+    """The card's element for a configured selector, or None."""
+    selector = selectors.get(key)
+    return card.query_selector(selector) if selector else None
+
+
+def extract_card(card, supplier, category_key, selectors):
+    """One product record from a listing card.
+
+    A selector that matches nothing leaves its field empty (None) rather than
+    failing the page; the quality validator catches drifted selectors.
+    """
+    name_el = _element(card, selectors, "name_selector")
+    name = name_el.inner_text().strip() if name_el else None
+    price_el = _element(card, selectors, "price_selector")
+    price = price_el.inner_text().strip() if price_el else None
+    if price:
+        price = re.sub(r"[\n\r\u00A0\xa0]+", "", price)
+        price = re.sub(r"\s+", " ", price).strip()
+    url = card.get_attribute("href") or ""
+    if not url:
+        # Castorama cards are <div>s around the product link
+        link = _element(card, selectors, "url_selector")
+        url = (link.get_attribute("href") if link else None) or ""
+    if url.startswith("/"):
+        url = supplier["base_url"] + url
+    brand = None
+    brand_el = _element(card, selectors, "brand_selector")
+    if brand_el:
+        if selectors.get("brand_attribute"):
+            brand = brand_el.get_attribute(selectors["brand_attribute"])
+        else:
+            brand = brand_el.inner_text().strip()
+    unit_el = _element(card, selectors, "unit_selector")
+    unit = unit_el.inner_text().strip() if unit_el else None
+    image_el = _element(card, selectors, "image_selector")
+    image_url = image_el.get_attribute("src") if image_el else None
+    return {
+        "name": name,
+        "category": category_key,
+        "price": price,
+        "url": url,
+        "brand": brand,
+        "unit": unit,
+        "image_url": image_url,
+        "supplier": supplier["name"],
+        "category_primary": supplier.get("category_primary"),
+        "category_secondary": supplier.get("category_secondary"),
+        "category_tertiary": supplier.get("category_tertiary"),
+    }
+
+
+_pagination = {}
+
+
+def pagination_for(supplier_name):
+    """The `pagination` section of a supplier's config, loaded once."""
+    key = supplier_name.lower()
+    if key not in _pagination:
+        for supplier in load_config()["suppliers"]:
+            _pagination.setdefault(
+                supplier["name"].lower(), supplier.get("pagination") or {}
             )
-            page = context.new_page()
-            if supplier["name"].lower() == "manomano":
-                apply_stealth(page)
-            page.goto(page_url, timeout=45000)
-            time.sleep(10)  # Cloudflare wait
-            if supplier["name"].lower() == "castorama":
-                from scrapers.castorama import handle_castorama_location_drawer
-
-                handle_castorama_location_drawer(page)
-                time.sleep(2)
+        _pagination.setdefault(key, {})
+    return _pagination[key]
+
+
+def page_url(category_url, supplier_name, number):
+    """URL of listing page `number` from the supplier's `page_param` template."""
+    param = pagination_for(supplier_name).get("page_param")
+    if not param:
+        return None
+    parts = urlsplit(category_url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k != param]
+    if number > 1:
+        query.append((param, str(number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def total_pages(page, supplier_name):
+    """Highest page number linked from the pager, or None if it can't be read."""
+    pagination = pagination_for(supplier_name)
+    param = pagination.get("page_param")
+    selector = pagination.get("total_pages_selector")
+    if not (param and selector):
+        return None
+    numbers = []
+    for link in page.query_selector_all(selector):
+        href = link.get_attribute("href") or ""
+        value = parse_qs(urlsplit(href).query).get(param, [""])[0]
+        if value.isdigit():
+            numbers.append(int(value))
+    return max(numbers) if numbers else None
+
+
+def next_page_url(page, supplier, page_number=1):
+    selector = (
+        pagination_for(supplier["name"]).get("next_button_selector")
+        or DEFAULT_NEXT_SELECTOR
+    )
+    next_button = page.query_selector(selector)
+    if next_button and next_button.is_enabled():
+        next_href = next_button.get_attribute("href")
+        if next_href:
+            if next_href.startswith("http"):
+                return next_href
+            return supplier["base_url"] + next_href
+        # A <button> pager (ManoMano): build the URL from the page template
+        return page_url(page.url, supplier["name"], page_number + 1)
+    return None
+
+
+def scrape_page(
+    browser,
+    supplier,
+    category_key,
+    page_url,
+    selectors,
+    product_limit,
+    headers=None,
+    page_number=1,
+):
+    """One listing page in a fresh context: (records, next page URL, total pages).
+
+    `browser` is a `ManagedBrowser`; the page's memory is sampled once loaded.
+
+    The next URL is None on the last page; the total is None unless the
+    supplier's `pagination` config can read it from the page.
+
+    Raises BlockedError when the page stays blocked, or the Playwright error
+    when the product grid never shows up.
+    """
+    limiter = limiter_for(supplier["name"])
+    headers = headers or get_random_headers()
+    context = browser.new_context(
+        extra_http_headers=headers,
+        user_agent=headers["User-Agent"],
+    )
+    try:
+        page = context.new_page()
+        hook(supplier["name"], "prepare_page", page)
+        # Paced per supplier; waits out challenges and retries blocks
+        navigate(page, page_url, limiter)
+        with span("popups", supplier=supplier["name"]):
+            hook(supplier["name"], "after_navigate", page)
+        with span("scroll", supplier=supplier["name"]):
             human_scroll(page)
+        with span("wait_for_grid", supplier=supplier["name"]):
+            page.wait_for_selector(selectors["product_selector"], timeout=15000)
+        browser.measure(page)
+        with span("extract", supplier=supplier["name"]):
+            product_cards = page.query_selector_all(selectors["product_selector"])
+            print(f"Found {len(product_cards)} products")
+            page_results = []
+            for card in product_cards:
+                page_results.append(
+                    extract_card(card, supplier, category_key, selectors)
+                )
+                if len(page_results) >= product_limit:
+                    break
+        count("pages", supplier=supplier["name"])
+        count("cards", len(product_cards), supplier=supplier["name"])
+        # Brand/unit inference runs once over the whole page
+        with span("attributes", supplier=supplier["name"]):
+            rules_for(supplier["name"]).apply(page_results)
+        return (
+            page_results,
+            next_page_url(page, supplier, page_number),
+            total_pages(page, supplier["name"]),
+        )
+    finally:
+        context.close()
+
+
+def fetch_page(browser, supplier, category_key, url, selectors, product_limit, **kw):
+    """`scrape_page` retried with the supplier's backoff; raises once exhausted."""
+    limiter = limiter_for(supplier["name"])
+    failures = 0
+    while True:
+        try:
+            return scrape_page(
+                browser, supplier, category_key, url, selectors, product_limit, **kw
+            )
+        except BlockedError:
+            # navigate already counted the blocks and navigation errors
+            raise
+        except Exception:
+            count("errors", supplier=supplier["name"])
+            failures += 1
+            if failures > limiter.max_retries:
+                raise
+            count("retries", supplier=supplier["name"])
+            if not browser.is_connected():
+                # The browser died under the page: retry at once in a new one
+                continue
+            # Usually a block/challenge the status code didn't reveal:
+            # slow the supplier down and retry the same page
+            limiter.on_block(f"{url} failed")
+
+
+def fetch_pages(supplier, category_key, urls, selectors, product_limit, headers):
+    """Yield the records of listing pages 2..N as they finish, fetched concurrently.
+
+    Each thread drives its own Playwright instance and browser (the sync
+    API is bound to the thread that started it); navigations still share
+    the supplier's rate limiter. Finished pages wait in a bounded hand-off
+    queue, so threads pause when the consumer is slow. A page that keeps
+    failing yields []. Closing the generator early stops the threads.
+    """
+    concurrency = min(
+        int(pagination_for(supplier["name"]).get("concurrency", 3)), len(urls)
+    )
+    pending = queue.Queue()
+    for i, url in enumerate(urls):
+        pending.put((i, url))
+    finished = queue.Queue(maxsize=max(concurrency, 1))
+    stop = threading.Event()
+
+    def hand_off(records):
+        while not stop.is_set():
             try:
-                page.wait_for_selector(selectors["product_selector"], timeout=15000)
-                product_cards = page.query_selector_all(selectors["product_selector"])
-                print(f"Found {len(product_cards)} products")
-                for card in product_cards:
-                    name = (
-                        (
-                            card.query_selector(selectors["name_selector"])
-                            .inner_text()
-                            .strip()
-                        )
-                        if selectors.get("name_selector")
-                        else None
-                    )
-                    price = (
-                        (
-                            card.query_selector(selectors["price_selector"])
-                            .inner_text()
-                            .strip()
-                        )
-                        if selectors.get("price_selector")
-                        else None
-                    )
-                    if price:
-                        price = re.sub(r"[\n\r\u00A0\xa0]+", "", price)
-                        price = re.sub(r"\s+", " ", price).strip()
-                    url = card.get_attribute("href") or ""
-                    if url.startswith("/"):
-                        url = supplier["base_url"] + url
-                    brand = None
-                    if selectors.get("brand_selector") and card.query_selector(
-                        selectors["brand_selector"]
-                    ):
-                        brand_el = card.query_selector(selectors["brand_selector"])
-                        if supplier["name"].lower() == "manomano":
-                            brand = brand_el.get_attribute("alt")
-                        else:
-                            brand = brand_el.inner_text().strip()
-                    else:
-                        if supplier["name"].lower() == "castorama" and name:
-                            generic_words = [
-                                "plastique",
-                                "bois",
-                                "acier",
-                                "métal",
-                                "metal",
-                                "verre",
-                                "alu",
-                                "aluminium",
-                                "inox",
-                                "pvc",
-                                "cuivre",
-                                "laiton",
-                                "béton",
-                                "beton",
-                                "céramique",
-                                "ceramique",
-                                "résine",
-                                "resine",
-                                "polypropylène",
-                                "polypropylene",
-                                "polyéthylène",
-                                "polyethylene",
-                                "caoutchouc",
-                                "papier",
-                                "carton",
-                                "tissu",
-                                "coton",
-                                "laine",
-                                "soie",
-                                "nylon",
-                                "polyester",
-                                "polyamide",
-                                "polyuréthane",
-                                "polyurethane",
-                                "liège",
-                                "bambou",
-                                "osier",
-                                "rotin",
-                                "chanvre",
-                                "jute",
-                                "lin",
-                                "sisal",
-                                "coco",
-                                "peau",
-                                "cuir",
-                                "fourrure",
-                                "laqué",
-                                "laque",
-                                "émaillé",
-                                "emaille",
-                                "fonte",
-                                "granit",
-                                "marbre",
-                                "pierre",
-                                "ardoise",
-                                "terre",
-                                "terre-cuite",
-                                "terre cuite",
-                                "porcelaine",
-                                "argile",
-                                "silicone",
-                                "graphite",
-                                "carbone",
-                                "chrome",
-                                "zinc",
-                                "titane",
-                                "plomb",
-                                "argent",
-                                "or",
-                                "bronze",
-                                "étain",
-                                "etain",
-                                "plastics",
-                                "wood",
-                                "steel",
-                                "glass",
-                                "iron",
-                                "copper",
-                                "brass",
-                                "concrete",
-                                "ceramic",
-                                "resin",
-                                "rubber",
-                                "paper",
-                                "cardboard",
-                                "fabric",
-                                "cotton",
-                                "wool",
-                                "silk",
-                                "nylon",
-                                "polyester",
-                                "polyamide",
-                                "polyurethane",
-                                "cork",
-                                "bamboo",
-                                "rattan",
-                                "hemp",
-                                "jute",
-                                "linen",
-                                "sisal",
-                                "coconut",
-                                "skin",
-                                "leather",
-                                "fur",
-                                "lacquered",
-                                "enameled",
-                                "cast",
-                                "granite",
-                                "marble",
-                                "stone",
-                                "slate",
-                                "clay",
-                                "porcelain",
-                                "silicon",
-                                "graphite",
-                                "carbon",
-                                "chrome",
-                                "zinc",
-                                "titanium",
-                                "lead",
-                                "silver",
-                                "gold",
-                                "bronze",
-                                "tin",
-                            ]
-                            first_word = name.split()[0].lower()
-                            if first_word not in generic_words:
-                                brand = name.split()[0]
-                            else:
-                                brand = None
-                    unit = None
-                    if supplier["name"].lower() == "manomano":
-                        unit_patterns = [
-                            r"\b\d+\s?(cm|m|pcs|places|personnes|L|kg|ml|mm)\b",
-                            r"\b(lot de|lot)\s*\d+",
-                            r"\bx\s?\d+",
-                            r"\b\d+\s?pi[eè]ces?\b",
-                        ]
-                        unit = None
-                        if name:
-                            for pat in unit_patterns:
-                                match = re.search(pat, name, re.IGNORECASE)
-                                if match:
-                                    unit = match.group(0)
-                                    break
-                    elif selectors.get("unit_selector") and card.query_selector(
-                        selectors["unit_selector"]
-                    ):
-                        unit = (
-                            card.query_selector(selectors["unit_selector"])
-                            .inner_text()
-                            .strip()
-                        )
-                    image_url = (
-                        (
-                            card.query_selector(
-                                selectors["image_selector"]
-                            ).get_attribute("src")
-                        )
-                        if selectors.get("image_selector")
-                        and card.query_selector(selectors["image_selector"])
-                        else None
-                    )
-                    results.append(
-                        {
-                            "name": name,
-                            "category": category_key,
-                            "price": price,
-                            "url": url,
-                            "brand": brand,
-                            "unit": unit,
-                            "image_url": image_url,
-                            "supplier": supplier["name"],
-                            "category_primary": supplier.get("category_primary"),
-                            "category_secondary": supplier.get("category_secondary"),
-                            "category_tertiary": supplier.get("category_tertiary"),
-                        }
-                    )
-                    if len(results) >= PRODUCT_LIMIT:
-                        context.close()
-                        browser.close()
-                        return results
-                page_count += 1
-                if page_count >= PAGE_LIMIT:
-                    context.close()
+                finished.put(records, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def work():
+        with sync_playwright() as p:
+            browser = ManagedBrowser(p, supplier["name"])
+            while not stop.is_set():
+                try:
+                    i, url = pending.get_nowait()
+                except queue.Empty:
                     break
-                next_button = page.query_selector('a[aria-label="Page suivante"]')
-                if next_button and next_button.is_enabled():
-                    next_href = next_button.get_attribute("href")
-                    if next_href:
-                        if next_href.startswith("http"):
-                            page_url = next_href
-                        else:
-                            page_url = supplier["base_url"] + next_href
-                        time.sleep(random.uniform(2, 4))
-                        context.close()
-                        continue
-                context.close()
-                break
+                records = []
+                try:
+                    records = fetch_page(
+                        browser,
+                        supplier,
+                        category_key,
+                        url,
+                        selectors,
+                        product_limit,
+                        headers=headers,
+                        page_number=i + 2,
+                    )[0]
+                except Exception as e:
+                    print(f"Error scraping {category_key} page {i + 2}: {e}")
+                hand_off(records)
+            browser.close()
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        for _ in urls:
+            while True:
+                try:
+                    records = finished.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    # Every thread gone (e.g. a browser failed to launch)
+                    if not any(t.is_alive() for t in threads) and finished.empty():
+                        return
+            yield records
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def iter_category(
+    supplier, category_key, category_url, selectors, crawl_state=None, max_pages=None
+):
+    """Yield a category's records page by page, up to the crawl limits."""
+    PRODUCT_LIMIT, PAGE_LIMIT = crawl_limits(supplier["name"])
+    # Cut short by the run's page budget rather than the category's limits
+    budgeted = max_pages is not None and max_pages < PAGE_LIMIT
+    if max_pages is not None:
+        PAGE_LIMIT = min(PAGE_LIMIT, max_pages)
+    produced = 0
+    # Each page is checked as it arrives; too many bad ones end the category
+    validator = CategoryValidator(supplier["name"], category_key)
+    with span("category", supplier=supplier["name"]), sync_playwright() as p:
+        browser = ManagedBrowser(p, supplier["name"])
+        # One identity per category, as a visitor paging through it would
+        headers = get_random_headers()
+        try:
+            try:
+                first_page, next_url, total = fetch_page(
+                    browser,
+                    supplier,
+                    category_key,
+                    category_url,
+                    selectors,
+                    PRODUCT_LIMIT,
+                    headers=headers,
+                )
             except Exception as e:
                 print(f"Error scraping {category_key}: {e}")
-                context.close()
-                break
-        browser.close()
-    return results
+                # A page without products, so the quality report shows it
+                validator.check([])
+                return
+            # Whether the crawl reaches the category's last page, and whether
+            # a page failed on the way
+            complete, failed, paginate = True, False, True
+            if crawl_state is not None:
+                crawl_state.count_page()
+                cat_id = category_id(supplier["name"], category_key)
+                if not crawl_state.observe(cat_id, first_page):
+                    print(f"⏭️ {category_key}: first page unchanged, not paginating")
+                    count("unchanged_categories", supplier=supplier["name"])
+                    next_url = total = None
+                    complete = paginate = False
+            validator.check(first_page)
+            if validator.failed:
+                next_url = total = None
+                complete = False
+            produced += len(first_page)
+            yield from first_page
+            if total and page_url(category_url, supplier["name"], 2):
+                # Page URLs follow a template: fetch the rest side by side
+                per_page = max(len(first_page), 1)
+                last = min(total, PAGE_LIMIT, math.ceil(PRODUCT_LIMIT / per_page))
+                urls = [
+                    page_url(category_url, supplier["name"], n)
+                    for n in range(2, last + 1)
+                ]
+                if urls:
+                    print(f"Fetching pages 2-{last} of {category_key} concurrently")
+                complete = last >= total
+                pages = fetch_pages(
+                    supplier, category_key, urls, selectors, PRODUCT_LIMIT, headers
+                )
+                fetched = 0
+                for page_results in pages:
+                    fetched += 1
+                    if crawl_state is not None:
+                        crawl_state.count_page()
+                    if not page_results:
+                        complete, failed = False, True  # failed page
+                    validator.check(page_results)
+                    page_results = page_results[: PRODUCT_LIMIT - produced]
+                    produced += len(page_results)
+                    yield from page_results
+                    if produced >= PRODUCT_LIMIT or validator.failed:
+                        pages.close()
+                        break
+                if fetched < len(urls):
+                    complete = False
+                    # Not stopped by the product limit: the fetch threads died
+                    failed = failed or produced < PRODUCT_LIMIT
+                next_url = None
+            page_count = 1
+            while next_url and produced < PRODUCT_LIMIT and page_count < PAGE_LIMIT:
+                try:
+                    page_results, next_url, _ = fetch_page(
+                        browser,
+                        supplier,
+                        category_key,
+                        next_url,
+                        selectors,
+                        PRODUCT_LIMIT - produced,
+                        headers=headers,
+                        page_number=page_count + 1,
+                    )
+                except Exception as e:
+                    print(f"Error scraping {category_key}: {e}")
+                    failed = True
+                    break
+                page_count += 1
+                if crawl_state is not None:
+                    crawl_state.count_page()
+                validator.check(page_results)
+                produced += len(page_results)
+                yield from page_results
+                if validator.failed:
+                    break
+            if next_url or produced >= PRODUCT_LIMIT or validator.failed:
+                # Stopped at a crawl limit, a failed page or bad pages
+                complete = False
+            # Crawled as deep as the category's limits allow
+            failed = failed or validator.failed
+            deep = paginate and not failed and (complete or not budgeted)
+            if deep and crawl_state is not None:
+                crawl_state.mark_complete(cat_id, every_product=complete)
+        finally:
+            browser.close()
+            count("items", produced, supplier=supplier["name"])
+
+
+def scrape_category(
+    supplier, category_key, category_url, selectors, crawl_state=None, max_pages=None
+):
+    return list(
+        iter_category(
+            supplier, category_key, category_url, selectors, crawl_state, max_pages
+        )
+    )
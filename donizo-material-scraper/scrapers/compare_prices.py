@@ -0,0 +1,383 @@
+"""
+compare_prices.py
+Cross-supplier price comparison: groups similar products using spaCy vectors.
+
+Every distinct name/category string is parsed once through `nlp.pipe`, its
+document vector is L2-normalized into a NumPy matrix, and all pairwise cosine
+similarities come from a single matrix product. This reproduces
+`Doc.similarity` (including its "identical tokens -> 1.0" and "empty vector
+-> 0.0" cases) without re-parsing each document for every pair.
+"""
+
+import importlib.util
+
+import numpy as np
+
+SPACY_MODEL = "fr_core_news_md"  # Medium model: ships word vectors for similarity
+# Lemmas need tok2vec/morphologizer/attribute_ruler/lemmatizer and vectors are
+# static; the dependency parser and NER never contribute to matching
+UNUSED_COMPONENTS = ["parser", "ner"]
+NAME_THRESHOLD = 0.6
+CATEGORY_THRESHOLD = 0.5
+BATCH_SIZE = 256
+# Worker processes only pay off once their model start-up is amortized
+PARALLEL_MIN_TEXTS = 5000
+# Above this many products the Compare grouping switches to the LSH matcher
+EXHAUSTIVE_LIMIT = 5000
+LSH_TABLES = 20
+# Bits per LSH signature grow with log2 of the block size, so buckets hold
+# about LSH_BUCKET products however large a block gets (at least LSH_BITS
+# bits, at most LSH_MAX_BITS)
+LSH_BITS = 6
+LSH_MAX_BITS = 16
+LSH_BUCKET = 64
+# Larger buckets (near-identical names) are paired in chunks of this size
+LSH_MAX_BUCKET = 256
+LSH_SEED = 13
+
+
+def nlp_missing(model=SPACY_MODEL):
+    """Why spaCy matching cannot run here, or None; imports nothing."""
+    if importlib.util.find_spec("spacy") is None:
+        return "spaCy is not installed (pip install spacy)"
+    if importlib.util.find_spec(model) is None:
+        return f"the {model} model is missing (python -m spacy download {model})"
+    return None
+
+
+def load_nlp(model=SPACY_MODEL):
+    """Load the spaCy pipeline without the components matching doesn't use."""
+    import spacy
+
+    return spacy.load(model, exclude=UNUSED_COMPONENTS)
+
+
+def category_text(item):
+    """All category fields of an item, de-duplicated and joined in sorted order."""
+    cats = item.get("category", [])
+    cats = [cats] if isinstance(cats, str) else list(cats or [])
+    for cat_field in ["category_primary", "category_secondary", "category_tertiary"]:
+        cat_val = item.get(cat_field)
+        if cat_val and isinstance(cat_val, str):
+            cats.append(cat_val)
+    return " ".join(sorted(set([str(cat) for cat in cats if isinstance(cat, str)])))
+
+
+def lemmatize(doc):
+    tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct]
+    return " ".join(tokens)
+
+
+def _unique(texts):
+    """Distinct texts in first-seen order, plus each input's index into them."""
+    positions = {}
+    index = np.empty(len(texts), dtype=np.intp)
+    for i, text in enumerate(texts):
+        index[i] = positions.setdefault(text, len(positions))
+    return list(positions), index
+
+
+def normalize_texts(nlp, texts, batch_size=BATCH_SIZE, n_process=1, cache=None):
+    """Lower-case and lemmatize texts, parsing each distinct string once."""
+    unique, index = _unique(texts)
+    if cache is not None:
+        lemmas = cache.lemmas(unique, n_process=n_process)
+    else:
+        if len(unique) < PARALLEL_MIN_TEXTS:
+            n_process = 1
+        docs = nlp.pipe(
+            [t.lower() for t in unique], batch_size=batch_size, n_process=n_process
+        )
+        lemmas = [lemmatize(doc) for doc in docs]
+    return [lemmas[i] for i in index]
+
+
+def vectorize(nlp, texts, batch_size=BATCH_SIZE, cache=None):
+    """Unit-normalized document vectors for texts (zero rows for empty/OOV)."""
+    width = nlp.vocab.vectors_length
+    if cache is not None:
+        matrix = cache.vectors(texts)
+    else:
+        docs = nlp.pipe(texts, batch_size=batch_size)
+        matrix = np.asarray([doc.vector for doc in docs], dtype=np.float32).reshape(
+            len(texts), width
+        )
+    matrix[[not t.strip() for t in texts]] = 0.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def similarity_matrix(texts, vectors):
+    """Pairwise cosine similarity of distinct texts, matching `Doc.similarity`."""
+    sims = vectors @ vectors.T
+    # Doc.similarity short-circuits identical token sequences to 1.0
+    nonempty = np.array([bool(t.strip()) for t in texts])
+    np.fill_diagonal(sims, 1.0)
+    sims[~nonempty, :] = 0.0
+    sims[:, ~nonempty] = 0.0
+    return sims
+
+
+class SimilarityIndex:
+    """Name and category similarity for a list of normalized products."""
+
+    def __init__(self, nlp, norm_names, norm_cats, cache=None):
+        names, self.name_idx = _unique(norm_names)
+        cats, self.cat_idx = _unique(norm_cats)
+        self.name_vectors = vectorize(nlp, names, cache=cache)
+        self.cat_vectors = vectorize(nlp, cats, cache=cache)
+        self.name_sims = similarity_matrix(names, self.name_vectors)
+        self.cat_sims = similarity_matrix(cats, self.cat_vectors)
+
+    def __len__(self):
+        return len(self.name_idx)
+
+    def match_row(
+        self, i, name_threshold=NAME_THRESHOLD, cat_threshold=CATEGORY_THRESHOLD
+    ):
+        """Boolean mask of products similar enough to product i."""
+        name_row = self.name_sims[self.name_idx[i]][self.name_idx]
+        cat_row = self.cat_sims[self.cat_idx[i]][self.cat_idx]
+        return (name_row > name_threshold) & (cat_row > cat_threshold)
+
+
+def group_similar(
+    index, name_threshold=NAME_THRESHOLD, cat_threshold=CATEGORY_THRESHOLD
+):
+    """Greedy grouping: each unused product claims all unused products like it."""
+    used = np.zeros(len(index), dtype=bool)
+    groups = []
+    for i in range(len(index)):
+        if used[i]:
+            continue
+        used[i] = True
+        row = index.match_row(i, name_threshold, cat_threshold)
+        members = np.flatnonzero(row & ~used)
+        used[members] = True
+        groups.append([i] + members.tolist())
+    return groups
+
+
+def _components(adjacency):
+    """Connected-component id of every node of a boolean adjacency matrix."""
+    comp = np.full(len(adjacency), -1, dtype=np.intp)
+    n_comp = 0
+    for start in range(len(adjacency)):
+        if comp[start] >= 0:
+            continue
+        comp[start] = n_comp
+        stack = [start]
+        while stack:
+            node = stack.pop()
+            for other in np.flatnonzero(adjacency[node] & (comp < 0)):
+                comp[other] = n_comp
+                stack.append(other)
+        n_comp += 1
+    return comp
+
+
+def block_bits(block_sizes, min_bits=LSH_BITS, max_bits=LSH_MAX_BITS):
+    """Signature bits per block: about LSH_BUCKET products per bucket."""
+    wanted = np.ceil(np.log2(np.maximum(block_sizes, 1) / LSH_BUCKET))
+    return np.clip(wanted, min_bits, max_bits).astype(np.int64)
+
+
+def _cross_pairs(bucket, supplier_idx):
+    """(i, j) pairs of a bucket's products from different suppliers."""
+    suppliers = supplier_idx[bucket]
+    if (suppliers == suppliers[0]).all():
+        return None
+    a, b = np.triu_indices(len(bucket), 1)
+    cross = suppliers[a] != suppliers[b]
+    return np.stack([bucket[a[cross]], bucket[b[cross]]], axis=1)
+
+
+class CrossSupplierMatcher:
+    """Cross-supplier matching without scoring all pairs.
+
+    Products are blocked by category: two products can only match when their
+    category strings are similar, so candidates are restricted to connected
+    components of the category-similarity graph (few distinct paths, cheap to
+    compute exactly). Inside a block, names are bucketed with random-hyperplane
+    LSH tables, and only pairs from different suppliers that share a bucket
+    are scored. A block's signatures use more bits the larger it is (see
+    `block_bits`), so buckets stay about the same size even when components
+    merge into one big block, and oversized buckets are paired in chunks of
+    LSH_MAX_BUCKET: candidate pairs grow about linearly with the catalog.
+    """
+
+    def __init__(
+        self,
+        nlp,
+        norm_names,
+        norm_cats,
+        suppliers,
+        n_tables=LSH_TABLES,
+        n_bits=LSH_BITS,
+        seed=LSH_SEED,
+        cat_threshold=CATEGORY_THRESHOLD,
+        cache=None,
+        max_bits=LSH_MAX_BITS,
+        max_bucket=LSH_MAX_BUCKET,
+    ):
+        names, self.name_idx = _unique(norm_names)
+        cats, self.cat_idx = _unique(norm_cats)
+        _, self.supplier_idx = _unique(list(suppliers))
+        self.name_vectors = vectorize(nlp, names, cache=cache)
+        self.name_nonempty = np.array([bool(t.strip()) for t in names], dtype=bool)
+        cat_sims = similarity_matrix(cats, vectorize(nlp, cats, cache=cache))
+        self.cat_ok = cat_sims > cat_threshold
+        self.block = _components(self.cat_ok)[self.cat_idx]
+        max_bits = max(max_bits, n_bits)
+        self.block_bits = block_bits(np.bincount(self.block), n_bits, max_bits)
+        rng = np.random.default_rng(seed)
+        dims = self.name_vectors.shape[1]
+        # The first n_bits planes of each table, then the extra ones large
+        # blocks use, so small blocks hash as with a fixed n_bits
+        planes = np.concatenate(
+            [
+                rng.standard_normal((n_tables, n_bits, dims)),
+                rng.standard_normal((n_tables, max_bits - n_bits, dims)),
+            ],
+            axis=1,
+        ).astype(np.float32)
+        # Full-length signatures; a block keeps the low `block_bits` of them
+        weights = 1 << np.arange(max_bits, dtype=np.int64)
+        self.signatures = np.stack(
+            [(self.name_vectors @ table.T >= 0) @ weights for table in planes],
+            axis=1,
+        ).reshape(len(names), n_tables)
+        self.max_bits = max_bits
+        self.max_bucket = max_bucket
+
+    def __len__(self):
+        return len(self.name_idx)
+
+    def candidate_pairs(self):
+        """Sorted (n, 2) array of cross-supplier pairs sharing a block and bucket."""
+        products = np.flatnonzero(self.name_nonempty[self.name_idx])
+        blocks = self.block[products]
+        masks = (np.int64(1) << self.block_bits[blocks]) - 1
+        found = []
+        for table in range(self.signatures.shape[1]):
+            full = self.signatures[self.name_idx[products], table]
+            keys = (blocks.astype(np.int64) << self.max_bits) + (full & masks)
+            order = np.argsort(keys, kind="stable")
+            sorted_keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+            ends = np.r_[starts[1:], len(sorted_keys)]
+            for start, end in zip(starts, ends):
+                if end - start < 2:
+                    continue
+                members = order[start:end]
+                if len(members) > self.max_bucket:
+                    # Neighbours by full signature end up in the same chunk
+                    members = members[np.argsort(full[members], kind="stable")]
+                for chunk in range(0, len(members), self.max_bucket):
+                    bucket = products[members[chunk : chunk + self.max_bucket]]
+                    if len(bucket) < 2:
+                        continue
+                    pairs = _cross_pairs(bucket, self.supplier_idx)
+                    if pairs is not None:
+                        found.append(pairs)
+        if not found:
+            return np.empty((0, 2), dtype=np.intp)
+        pairs = np.sort(np.concatenate(found), axis=1)
+        return np.unique(pairs, axis=0)
+
+    def score(self, pairs):
+        """Name similarity of each pair, matching `Doc.similarity`."""
+        left, right = self.name_idx[pairs[:, 0]], self.name_idx[pairs[:, 1]]
+        sims = np.einsum(
+            "ij,ij->i", self.name_vectors[left], self.name_vectors[right]
+        )
+        sims[left == right] = 1.0
+        return sims
+
+    def matches(self, name_threshold=NAME_THRESHOLD):
+        """Verified cross-supplier pairs above both similarity thresholds."""
+        pairs = self.candidate_pairs()
+        if not len(pairs):
+            return pairs
+        cat_ok = self.cat_ok[self.cat_idx[pairs[:, 0]], self.cat_idx[pairs[:, 1]]]
+        return pairs[cat_ok & (self.score(pairs) > name_threshold)]
+
+
+def group_pairs(n, pairs):
+    """Greedy grouping (same order as `group_similar`) over a sparse edge list."""
+    if len(pairs):
+        edges = np.concatenate([pairs, pairs[:, ::-1]])
+        edges = edges[np.lexsort((edges[:, 1], edges[:, 0]))]
+    else:
+        edges = np.empty((0, 2), dtype=np.intp)
+    indptr = np.searchsorted(edges[:, 0], np.arange(n + 1))
+    used = np.zeros(n, dtype=bool)
+    groups = []
+    for i in range(n):
+        if used[i] or indptr[i] == indptr[i + 1]:
+            continue
+        used[i] = True
+        neighbours = edges[indptr[i] : indptr[i + 1], 1]
+        members = neighbours[~used[neighbours]]
+        used[members] = True
+        if len(members):
+            groups.append([i] + members.tolist())
+    return groups
+
+
+def exhaustive_pairs(index, suppliers):
+    """All cross-supplier pairs the exhaustive matcher accepts (i < j)."""
+    _, supplier_idx = _unique(list(suppliers))
+    pairs = []
+    for i in range(len(index)):
+        row = index.match_row(i)
+        row[: i + 1] = False
+        others = np.flatnonzero(row & (supplier_idx != supplier_idx[i]))
+        pairs.extend((i, j) for j in others.tolist())
+    return pairs
+
+
+def pair_recall(found, expected):
+    """Share of expected pairs the approximate matcher also found."""
+    expected = {tuple(p) for p in expected}
+    if not expected:
+        return 1.0
+    found = {tuple(p) for p in np.asarray(found).tolist()}
+    return len(expected & found) / len(expected)
+
+
+def match_groups(nlp, norm_names, norm_cats, suppliers, method=None, cache=None):
+    """Cross-supplier groups of normalized products, as lists of indexes.
+
+    `method` is "exhaustive" (all pairs) or "lsh" (blocked candidate pairs);
+    by default small catalogs use the exhaustive matcher.
+    """
+    if method is None:
+        method = "exhaustive" if len(norm_names) <= EXHAUSTIVE_LIMIT else "lsh"
+    if method == "lsh":
+        matcher = CrossSupplierMatcher(
+            nlp, norm_names, norm_cats, suppliers, cache=cache
+        )
+        groups = group_pairs(len(norm_names), matcher.matches())
+    else:
+        index = SimilarityIndex(nlp, norm_names, norm_cats, cache=cache)
+        groups = group_similar(index)
+    return [g for g in groups if len({suppliers[i] for i in g}) > 1]
+
+
+def compare_products(nlp, items, method=None, cache=None):
+    """Normalize items and return (norm_names, norm_cats, cross-supplier groups).
+
+    With an `NlpCache`, lemmas and vectors are read from disk where possible
+    and entries for texts no longer in `items` (the whole catalog) are evicted.
+    """
+    names = [item.get("name") or "" for item in items]
+    cats = [category_text(item) for item in items]
+    norm_names = normalize_texts(nlp, names, cache=cache)
+    norm_cats = normalize_texts(nlp, cats, cache=cache)
+    suppliers = [item.get("supplier") for item in items]
+    groups = match_groups(nlp, norm_names, norm_cats, suppliers, method, cache)
+    if cache is not None:
+        cache.evict(names + cats + norm_names + norm_cats)
+    return norm_names, norm_cats, [[items[i] for i in group] for group in groups]
@@ -0,0 +1,157 @@
+"""
+crawl_state.py
+Change-aware recrawl scheduling.
+
+For every category the crawler keeps a cheap fingerprint of its first
+listing page (product ids and prices) in data/crawl_state.json, with how
+often it was checked and how often it had changed. When the first page is
+unchanged the deeper pages are skipped (up to a maximum age, after which a
+full crawl is forced), and categories are ordered by their observed change
+rate so a fixed page budget goes to the categories whose prices move.
+A changed fingerprint is only stored once the deeper pages have been
+crawled (`mark_complete`), so a category whose pagination failed is crawled
+again on the next run.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from scrapers.snapshot import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+STATE_PATH = os.path.join(BASE_DIR, "data", "crawl_state.json")
+FULL_RECRAWL_DAYS = 7
+
+
+def crawl_limits(supplier_name):
+    """(PRODUCT_LIMIT, PAGE_LIMIT) of a supplier's categories, from the env.
+
+    Read from <SUPPLIER>_PRODUCT_LIMIT and <SUPPLIER>_PAGE_LIMIT.
+    """
+    prefix = supplier_name.upper()
+    return (
+        int(os.getenv(f"{prefix}_PRODUCT_LIMIT", 100)),
+        int(os.getenv(f"{prefix}_PAGE_LIMIT", 10)),
+    )
+
+
+def category_id(supplier_name, category_key):
+    if isinstance(category_key, (tuple, list)):
+        category_key = " > ".join(part for part in category_key if part)
+    return f"{supplier_name}|{category_key}"
+
+
+def fingerprint(records):
+    """Order-insensitive hash of the (product id, price) pairs of a page."""
+    pairs = sorted(
+        (
+            r.get("url") or r.get("image_url") or r.get("name") or "",
+            r.get("price") or "",
+        )
+        for r in records
+    )
+    return hashlib.sha1(json.dumps(pairs).encode("utf-8")).hexdigest()
+
+
+class CrawlState:
+    def __init__(self, path=STATE_PATH, full_recrawl_days=None):
+        self.path = path
+        if full_recrawl_days is None:
+            full_recrawl_days = float(
+                os.getenv("FULL_RECRAWL_DAYS", FULL_RECRAWL_DAYS)
+            )
+        self.max_age = full_recrawl_days * 86400
+        self.pages_this_run = 0
+        # Categories crawled to their last page in this run (not persisted)
+        self.completed = set()
+        # First-page fingerprints waiting for their category's deeper pages
+        self._pending = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.categories = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.categories = {}
+
+    def change_rate(self, cat_id):
+        """Smoothed share of checks that saw a change; unseen categories rank 1."""
+        entry = self.categories.get(cat_id)
+        if entry is None:
+            return 1.0
+        return (entry["changes"] + 1) / (entry["checks"] + 2)
+
+    def prioritize(self, cat_ids):
+        """Most frequently changing first, then least recently crawled."""
+        return sorted(
+            cat_ids,
+            key=lambda c: (
+                -self.change_rate(c),
+                self.categories.get(c, {}).get("last_crawled", 0),
+            ),
+        )
+
+    def plan(self, cat_id):
+        """(last fingerprint, full crawl due) for deciding outside this process."""
+        entry = self.categories.get(cat_id)
+        if entry is None:
+            return None, True
+        stale = time.time() - entry["last_full_crawl"] > self.max_age
+        return entry["fingerprint"], stale
+
+    def observe(self, cat_id, first_page):
+        """Record a first-page fingerprint; True if deeper pages need a crawl."""
+        now = time.time()
+        fp = fingerprint(first_page)
+        with self._lock:
+            entry = self.categories.setdefault(
+                cat_id,
+                {
+                    "fingerprint": None,
+                    "checks": 0,
+                    "changes": 0,
+                    "last_crawled": 0,
+                    "last_changed": None,
+                    "last_full_crawl": 0,
+                },
+            )
+            changed = fp != entry["fingerprint"]
+            if entry["fingerprint"] is not None:
+                # The first sighting says nothing about how often it changes
+                entry["checks"] += 1
+                entry["changes"] += int(changed)
+            if changed:
+                entry["last_changed"] = now
+            entry["last_crawled"] = now
+            stale = now - entry["last_full_crawl"] > self.max_age
+            if changed or stale:
+                self._pending[cat_id] = fp
+                return True
+            return False
+
+    def mark_complete(self, cat_id, every_product=True):
+        """The deeper pages were crawled, up to the category's crawl limits.
+
+        Stores the fingerprint seen by `observe`. With `every_product`, the
+        run also reached the last page, so missing products are gone.
+        """
+        with self._lock:
+            fp = self._pending.pop(cat_id, None)
+            if fp is not None:
+                entry = self.categories[cat_id]
+                entry["fingerprint"] = fp
+                entry["last_full_crawl"] = time.time()
+            if every_product:
+                self.completed.add(cat_id)
+
+    def count_page(self):
+        with self._lock:
+            self.pages_this_run += 1
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps(self.categories, ensure_ascii=False, indent=2)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        atomic_write(self.path, payload.encode("utf-8"))
@@ -0,0 +1,316 @@
+"""
+enrich.py
+Optional product-detail enrichment stage (`main --enrich`).
+
+Listing cards only carry a name, a price and guessed brand/unit. This stage
+fetches each product's detail page and reads its structured data (JSON-LD
+`Product` and `Offer`) for the real brand, EAN, SKU, dimensions, packaging
+quantity and availability. Pages are fetched concurrently through a pooled
+`requests` session, paced by the supplier's rate limiter; pages that are
+blocked or only render their data with JavaScript are retried in a browser.
+
+Results are cached by product URL in data/cache/details.sqlite. A product
+whose cached entry is younger than DETAIL_TTL_DAYS and whose listing price
+has not changed is not fetched again on later crawls.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from scrapers.helpers import get_random_headers
+from scrapers.ratelimit import BLOCK_STATUSES, limiter_for, navigate
+from scrapers.replay import mode, replay_server, replaying
+from scrapers.telemetry import count, span
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "details.sqlite")
+CONCURRENCY = 8
+TTL_DAYS = 7
+TIMEOUT = 20
+
+EAN_FIELDS = ("gtin13", "gtin", "gtin14", "gtin12", "gtin8", "ean")
+DIMENSION_FIELDS = ("width", "height", "depth", "weight")
+PACK_WORDS = ("conditionnement", "quantité", "quantite", "contenance", "vendu par")
+
+
+def _types(node):
+    kind = node.get("@type")
+    return kind if isinstance(kind, list) else [kind]
+
+
+def _walk(data):
+    """Every JSON-LD object, including those nested in lists and @graph."""
+    if isinstance(data, list):
+        for item in data:
+            yield from _walk(item)
+    elif isinstance(data, dict):
+        yield data
+        yield from _walk(data.get("@graph"))
+
+
+def _text(value):
+    """A JSON-LD value as text: names of Things, "value unit" of quantities."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        if "value" in value:
+            unit = value.get("unitText") or value.get("unitCode") or ""
+            return f"{value['value']} {unit}".strip()
+        value = value.get("name")
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_product(html):
+    """Details from the first JSON-LD `Product` of a page; {} if there is none."""
+    soup = BeautifulSoup(html, "html.parser")
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        for node in _walk(data):
+            if "Product" in _types(node):
+                return product_details(node)
+    return {}
+
+
+def product_details(product):
+    details = {
+        "brand": _text(product.get("brand")),
+        "ean": next((_text(product[f]) for f in EAN_FIELDS if product.get(f)), None),
+        "sku": _text(product.get("sku")) or _text(product.get("mpn")),
+    }
+    dimensions = {f: _text(product[f]) for f in DIMENSION_FIELDS if product.get(f)}
+    pack_quantity = None
+    for prop in product.get("additionalProperty") or []:
+        name = (_text(prop.get("name")) or "").lower()
+        value = _text(prop.get("value"))
+        if not (name and value):
+            continue
+        if any(word in name for word in PACK_WORDS):
+            pack_quantity = pack_quantity or value
+        elif name in ("longueur", "largeur", "hauteur", "épaisseur", "poids"):
+            dimensions.setdefault(name, value)
+    offers = product.get("offers") or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    if not pack_quantity:
+        pack_quantity = _text(offers.get("eligibleQuantity"))
+    availability = _text(offers.get("availability"))
+    details.update(
+        dimensions=dimensions or None,
+        pack_quantity=pack_quantity,
+        # "https://schema.org/InStock" -> "InStock"
+        availability=availability.rsplit("/", 1)[-1] if availability else None,
+    )
+    return {k: v for k, v in details.items() if v}
+
+
+def listing_fingerprint(record):
+    """What the listing says about a product; a change forces a re-fetch."""
+    return hashlib.sha1(f"{record.get('price')}".encode("utf-8")).hexdigest()[:16]
+
+
+class DetailCache:
+    """Product URL -> parsed details, with the listing fingerprint they match."""
+
+    def __init__(self, path=CACHE_PATH, ttl_days=None):
+        if ttl_days is None:
+            ttl_days = float(os.getenv("DETAIL_TTL_DAYS", TTL_DAYS))
+        self.ttl = ttl_days * 86400
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS details ("
+                " url TEXT PRIMARY KEY, fingerprint TEXT NOT NULL,"
+                " fetched_at REAL NOT NULL, details TEXT NOT NULL)"
+            )
+
+    def get(self, url, fingerprint):
+        """Cached details if still fresh for this listing, else None."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint, fetched_at, details FROM details WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        if time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[2])
+
+    def put(self, url, fingerprint, details):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO details VALUES (?, ?, ?, ?)",
+                (url, fingerprint, time.time(), json.dumps(details)),
+            )
+
+    def close(self):
+        self._db.close()
+
+
+class DetailEnricher:
+    """Streams records through, adding detail-page fields to those with a URL.
+
+    Up to `concurrency` pages are in flight; records come out in their
+    input order. The browser fallback runs in the caller's thread (the
+    Playwright sync API is bound to the thread that started it).
+    """
+
+    def __init__(self, cache=None, concurrency=None):
+        self.cache = cache or DetailCache()
+        self.concurrency = concurrency or int(
+            os.getenv("DETAIL_CONCURRENCY", CONCURRENCY)
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._pool = ThreadPoolExecutor(self.concurrency)
+        self._playwright = None
+        self._browser = None
+
+    def fetch_html(self, url, supplier):
+        """(status, html) over HTTP; status 0 when the request failed."""
+        if replaying():
+            status, _, body = replay_server().fetch("GET", url)
+            return status, body.decode("utf-8", "replace")
+        limiter = limiter_for(supplier)
+        with span("rate_limit_wait", supplier=supplier):
+            limiter.acquire()
+        try:
+            with span("detail_fetch", supplier=supplier):
+                response = self.session.get(
+                    url, headers=get_random_headers(), timeout=TIMEOUT
+                )
+        except requests.RequestException:
+            count("errors", supplier=supplier)
+            return 0, ""
+        if response.status_code in BLOCK_STATUSES:
+            count("blocks", supplier=supplier)
+            limiter.on_block(f"HTTP {response.status_code} on a detail page")
+        else:
+            limiter.on_success()
+        return response.status_code, response.text
+
+    def fetch_details(self, url, supplier):
+        """Parsed details over HTTP, or None when the browser should try."""
+        if mode() == "record":
+            # Only browser traffic ends up in the recordings
+            return None
+        status, html = self.fetch_html(url, supplier)
+        if status != 200:
+            return None
+        return parse_product(html) or None
+
+    def browser_details(self, url, supplier):
+        from playwright.sync_api import sync_playwright
+
+        from scrapers.browser import ManagedBrowser
+
+        if self._browser is None:
+            self._playwright = sync_playwright().start()
+            self._browser = ManagedBrowser(self._playwright, "enrich")
+        count("detail_fallbacks", supplier=supplier)
+        headers = get_random_headers()
+        context = self._browser.new_context(
+            extra_http_headers=headers, user_agent=headers["User-Agent"]
+        )
+        try:
+            page = context.new_page()
+            navigate(page, url, limiter_for(supplier))
+            self._browser.measure(page)
+            return parse_product(page.content())
+        except Exception as e:
+            print(f"Could not enrich {url}: {e}")
+            return {}
+        finally:
+            context.close()
+
+    def _finish(self, record, fingerprint, future):
+        try:
+            details = future.result()
+        except Exception as e:
+            print(f"Detail request for {record['url']} failed: {e}")
+            details = None
+        supplier = record.get("supplier") or ""
+        if details is None:
+            details = self.browser_details(record["url"], supplier)
+        # Negative results are cached too, so broken pages wait for the TTL
+        self.cache.put(record["url"], fingerprint, details)
+        count("details_fetched", supplier=supplier)
+        return details
+
+    def __call__(self, records):
+        window = collections.deque()
+
+        def ready():
+            record, fingerprint, details, future = window.popleft()
+            if future is not None:
+                details = self._finish(record, fingerprint, future)
+            apply_details(record, details)
+            return record
+
+        for record in records:
+            url = record.get("url")
+            supplier = record.get("supplier") or ""
+            if not url:
+                window.append((record, None, {}, None))
+            else:
+                fingerprint = listing_fingerprint(record)
+                details = self.cache.get(url, fingerprint)
+                future = None
+                if details is None:
+                    future = self._pool.submit(self.fetch_details, url, supplier)
+                else:
+                    count("details_cached", supplier=supplier)
+                window.append((record, fingerprint, details, future))
+            # Hand on finished records without waiting for the next ones
+            while window and (
+                len(window) > self.concurrency
+                or window[0][3] is None
+                or window[0][3].done()
+            ):
+                yield ready()
+        while window:
+            yield ready()
+
+    def close(self):
+        self._pool.shutdown()
+        self.session.close()
+        if self._browser is not None:
+            self._browser.close()
+            self._playwright.stop()
+        self.cache.close()
+
+
+def apply_details(record, details):
+    """Copy detail fields onto a record; the detail page's brand wins."""
+    for field, value in details.items():
+        record[field] = value
+    return record
+
+
+def enrich(records):
+    """Pipeline stage: `DetailEnricher` over the stream, closed at the end."""
+    enricher = DetailEnricher()
+    try:
+        yield from enricher(records)
+    finally:
+        enricher.close()
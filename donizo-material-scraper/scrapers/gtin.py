@@ -0,0 +1,88 @@
+"""
+gtin.py
+GTIN/EAN extraction and validation, for exact cross-supplier matching.
+
+Castorama image URLs embed the product's EAN-13
+(`.../liquide-clarifiant-pour-spa-bayrol-1l~4008367953003_01c_FR_CF`) and
+detail pages (`main --enrich`) expose GTINs in their JSON-LD as `ean`. The
+`extract_gtin` pipeline stage reads them at ingest, keeps only codes with a
+valid check digit and stores them on the record as `gtin`. The matching
+stage then joins offers from different suppliers on the same GTIN through
+`gtin_index`, in one pass over the catalog.
+"""
+
+import re
+
+GTIN_LENGTHS = (8, 12, 13, 14)
+# "~4008367953003_01c_FR_CF" in Castorama image URLs
+IMAGE_EAN = re.compile(r"~(\d{13})_")
+CODE_FIELDS = ("gtin", "ean")
+
+
+def valid_gtin(code):
+    """True for a GTIN-8/12/13/14 whose last digit is its mod-10 check digit."""
+    if not isinstance(code, str) or not code.isdigit():
+        return False
+    if len(code) not in GTIN_LENGTHS or not code.strip("0"):
+        return False
+    # Weights 3, 1, 3... from the rightmost digit before the check digit
+    total = sum(
+        int(digit) * (3 if i % 2 == 0 else 1)
+        for i, digit in enumerate(reversed(code[:-1]))
+    )
+    return (10 - total % 10) % 10 == int(code[-1])
+
+
+def clean_gtin(value):
+    """A code with spaces/dashes removed if it is a valid GTIN, else None."""
+    if value is None:
+        return None
+    code = re.sub(r"[\s-]", "", str(value))
+    return code if valid_gtin(code) else None
+
+
+def gtin_key(code):
+    """Index key of a GTIN: zero-padded to 14 digits, so a UPC-A and its
+    EAN-13 form (leading 0) share a key."""
+    return code.zfill(14)
+
+
+def gtin_from_record(record):
+    """The record's GTIN: a `gtin`/`ean` field, else the Castorama image EAN."""
+    for field in CODE_FIELDS:
+        code = clean_gtin(record.get(field))
+        if code:
+            return code
+    match = IMAGE_EAN.search(record.get("image_url") or "")
+    if match:
+        return clean_gtin(match.group(1))
+    return None
+
+
+def extract_gtin(records):
+    """Pipeline stage: set `gtin` on records that carry a valid one."""
+    for record in records:
+        code = gtin_from_record(record)
+        if code:
+            record["gtin"] = code
+        else:
+            record.pop("gtin", None)
+        yield record
+
+
+def gtin_index(gtins):
+    """GTIN key -> indexes of the products carrying it (None entries skipped)."""
+    index = {}
+    for i, code in enumerate(gtins):
+        if code:
+            index.setdefault(gtin_key(code), []).append(i)
+    return index
+
+
+def gtin_groups(gtins, suppliers):
+    """Groups of indexes sharing a GTIN and offered by more than one supplier."""
+    return [
+        group
+        for group in gtin_index(gtins).values()
+        if len({suppliers[i] for i in group}) > 1
+    ]
@@ -1,3 +1,4 @@
+import itertools
 import os
 import json
 import random
@@ -5,6 +6,14 @@ import yaml
 import time
 from dotenv import load_dotenv
 
+from scrapers.catalog import iter_records
+from scrapers.changes import ChangeLog, file_stamp
+from scrapers.crawl_state import category_id
+from scrapers.pipeline import record_key
+from scrapers.replay import replaying
+from scrapers.snapshot import publish_snapshot
+from scrapers.units import UNIT_FIELDS, parse_price
+
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
@@ -15,6 +24,10 @@ USER_AGENTS = [
 ]
 
 DATA_PATH = os.path.join(BASE_DIR, "data", "materials.json")
+# Read from product detail pages by `--enrich` (scrapers/enrich.py)
+DETAIL_FIELDS = ("ean", "sku", "dimensions", "pack_quantity", "availability")
+# Fields a crawl refreshes on products that are already stored
+REFRESHED_FIELDS = ("brand", "gtin") + DETAIL_FIELDS + UNIT_FIELDS
 
 
 def get_user_agents():
@@ -60,34 +73,133 @@ def load_config():
         return yaml.safe_load(f)
 
 
-def save_data(data):
+def save_data(data, completed=()):
+    """Merge a crawl (any iterable, e.g. a crawl stream) into materials.json.
+
+    Existing records keep their place and fields; products seen again take
+    the crawl's price and REFRESHED_FIELDS (detail-page, GTIN and unit
+    fields), and a repriced product loses unit fields the crawl did not set.
+    New products are appended, and products missing from a category in
+    `completed` (ids of categories crawled to their last page) are dropped.
+    The old file is streamed, so besides what changed only the product keys
+    and prices are held in memory. The changes are appended to the change
+    feed (scrapers/changes.py); returns their count per kind.
+    """
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
-    # Try to load existing data
-    if os.path.exists(DATA_PATH):
-        try:
-            with open(DATA_PATH, "r", encoding="utf-8") as f:
-                existing = json.load(f)
-            if not isinstance(existing, list):
-                existing = []
-        except Exception:
-            existing = []
-    else:
-        existing = []
-    # Avoid duplicates by url
-    existing_urls = {
-        item.get("url") for item in existing if isinstance(item, dict) and "url" in item
-    }
-    new_data = [
-        item
-        for item in data
-        if isinstance(item, dict) and item.get("url") not in existing_urls
-    ]
-    all_data = existing + new_data
-    with open(DATA_PATH, "w", encoding="utf-8") as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
+    change_log = ChangeLog()
+    try:
+        return _save_data(data, completed, change_log)
+    finally:
+        change_log.close()
+
+
+def _save_data(data, completed, change_log):
+    committed, dropped = change_log.recover(file_stamp(DATA_PATH))
+    if committed or dropped:
+        print(
+            f"🩹 Settled an interrupted save: {committed} change sets kept, "
+            f"{dropped} dropped"
+        )
+    # Products are identified by url (or supplier/name/image for url-less cards)
+    try:
+        prices = {
+            record_key(item): item.get("price") for item in iter_records(DATA_PATH)
+        }
+        existing = iter_records(DATA_PATH)
+    except (OSError, ValueError):
+        prices, existing = {}, ()
+    seen = set()
+    repriced = {}
+    refreshed = {}
+    inserted = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        key = record_key(item)
+        if key in seen:
+            continue
+        seen.add(key)
+        if key not in prices:
+            inserted.append(item)
+            continue
+        if not same_price(prices[key], item.get("price")):
+            repriced[key] = item
+        fresh = {f: item[f] for f in REFRESHED_FIELDS if item.get(f) is not None}
+        if fresh:
+            refreshed[key] = fresh
+    changes = [("inserted", record_key(item), item, None) for item in inserted]
+
+    def kept():
+        for item in existing:
+            key = record_key(item)
+            if key in refreshed:
+                refresh(item, refreshed[key])
+            if key in repriced:
+                old_price = item.get("price")
+                item["price"] = repriced[key].get("price")
+                # A price per unit from the old price would now be wrong
+                for field in UNIT_FIELDS:
+                    if field not in repriced[key]:
+                        item.pop(field, None)
+                changes.append(("price_changed", key, item, old_price))
+            elif key not in seen and record_category(item) in completed:
+                changes.append(("removed", key, item, None))
+                continue
+            yield item
+
+    tmp_path = f"{DATA_PATH}.tmp-{os.getpid()}"
+    written = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # Same layout as json.dump(..., indent=2), one record at a time
+        f.write("[")
+        for item in itertools.chain(kept(), inserted):
+            item_json = json.dumps(item, ensure_ascii=False, indent=2)
+            f.write(",\n  " if written else "\n  ")
+            f.write(item_json.replace("\n", "\n  "))
+            written += 1
+        f.write("\n]" if written else "]")
+    # Changes go in as pending first, so a crash around the swap cannot lose
+    # them; the next save commits or drops them (ChangeLog.recover)
+    crawl, counts = change_log.record_crawl(changes, file_stamp(tmp_path))
+    os.replace(tmp_path, DATA_PATH)
+    change_log.commit_crawl(crawl)
+    # Let running API workers swap to the new crawl
+    publish_snapshot()
+    return counts
+
+
+def refresh(item, fresh):
+    """Copy a crawl's refreshed fields onto a stored record.
+
+    A brand guessed from a listing card does not replace one that was read
+    from the product's detail page.
+    """
+    if any(item.get(f) for f in DETAIL_FIELDS) and not any(
+        f in fresh for f in DETAIL_FIELDS
+    ):
+        fresh = {k: v for k, v in fresh.items() if k != "brand"}
+    item.update(fresh)
+
+
+def record_category(item):
+    """Crawl-state category id of a stored record."""
+    return category_id(item.get("supplier"), item.get("category"))
+
+
+def same_price(old, new):
+    old_value, new_value = parse_price(old), parse_price(new)
+    if old_value is None or new_value is None:
+        return old == new
+    return abs(old_value - new_value) < 0.005
+
+
+def pause(seconds):
+    """Human-like pause; skipped when replaying recorded pages."""
+    if not replaying():
+        time.sleep(seconds)
 
 
 def human_scroll(page):
     for _ in range(random.randint(3, 6)):
         page.mouse.wheel(0, random.randint(200, 1000))
-        time.sleep(random.uniform(0.5, 1.5))
+        pause(random.uniform(0.5, 1.5))
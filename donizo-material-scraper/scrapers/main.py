@@ -1,5 +1,6 @@
 import argparse
 import os
+import time
 
 from scrapers.helpers import (
     load_config,
@@ -7,9 +8,183 @@ from scrapers.helpers import (
     save_data,
     get_data_path,
 )
-from scrapers.castorama import discover_castorama_categories_with_paths
-from scrapers.manomano import discover_manomano_categories
-from scrapers.common import scrape_category
+from scrapers.browser import memory_summary
+from scrapers.crawl_state import CrawlState, category_id, crawl_limits
+from scrapers.gtin import extract_gtin
+from scrapers.pipeline import (
+    DEFAULT_STAGES,
+    JsonlSink,
+    Pipeline,
+    iter_jsonl,
+    new_stream_path,
+)
+from scrapers.plugins import (
+    cache_categories,
+    cached_categories,
+    plugin_for,
+    validate_config,
+)
+from scrapers.replay import ARCHIVE_DIR
+from scrapers.units import unit_price
+from scrapers.telemetry import span, telemetry, write_report
+from scrapers.validate import quality_report
+from scrapers.workqueue import WorkQueue, run_workers
+
+# Browser, HTML and NLP libraries are imported where they are used, so
+# `--dry-run` and `--help` start without them.
+
+
+def category_limit(supplier):
+    return int(os.getenv(f"{supplier['name'].upper()}_CATEGORY_LIMIT", 2))
+
+
+def select_categories(supplier, items, crawl_state):
+    """The categories to crawl, most frequently changing first."""
+    ids = {category_id(supplier["name"], key): (key, url) for key, url in items}
+    items = [ids[c] for c in crawl_state.prioritize(list(ids))]
+    return items[: category_limit(supplier)]
+
+
+def discover_categories(supplier, crawl_state):
+    """(category key, URL) pairs to crawl, most frequently changing first."""
+    try:
+        plugin = plugin_for(supplier["name"])
+    except ValueError as e:
+        print(f"Skipping unsupported: {e}")
+        return []
+    with span("discover", supplier=supplier["name"]):
+        discovered = plugin.discover_categories(supplier)
+    print("Discovered categories:", discovered)
+    items = list(discovered.items())
+    cache_categories(supplier["name"], items)
+    # Spend the budget on the categories that change most often
+    return select_categories(supplier, items, crawl_state)
+
+
+def category_context(supplier, cat_key):
+    """Supplier fields stamped on a category's records, and its selectors."""
+    context = {"name": supplier["name"], "base_url": supplier["base_url"]}
+    # Menu-tree suppliers (Castorama) key categories by (primary, secondary,
+    # tertiary) and share one set of selectors
+    if isinstance(cat_key, tuple):
+        context.update(
+            category_primary=cat_key[0],
+            category_secondary=cat_key[1],
+            category_tertiary=cat_key[2],
+        )
+    selectors = supplier["categories"].get(cat_key) or supplier["categories"].get(
+        "tiles"
+    )
+    return context, selectors
+
+
+def dry_run(config, suppliers, crawl_state, page_budget):
+    """Validate the config and print the crawl plan from the category cache.
+
+    Returns the number of config problems. No plugin or browser is loaded.
+    """
+    problems = validate_config(config)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Config is valid")
+    for supplier in suppliers:
+        print(f"\n=== {supplier['name']} (plugin {supplier.get('plugin')}) ===")
+        cached = cached_categories(supplier["name"])
+        if cached is None:
+            print("No cached categories yet: the next crawl discovers them")
+            continue
+        discovered_at, items = cached
+        selected = select_categories(supplier, items, crawl_state)
+        age = (time.time() - discovered_at) / 3600
+        print(
+            f"{len(selected)} of {len(items)} cached categories "
+            f"(discovered {age:.1f}h ago)"
+        )
+        product_limit, page_limit = crawl_limits(supplier["name"])
+        for cat_key, cat_url in selected:
+            cat_id = category_id(supplier["name"], cat_key)
+            _, full = crawl_state.plan(cat_id)
+            mode = "full crawl" if full else "first page, deeper if changed"
+            print(
+                f"  - {cat_id} [{mode}, change rate "
+                f"{crawl_state.change_rate(cat_id):.2f}] {cat_url}"
+            )
+        print(f"Limits: {product_limit} products, {page_limit} pages per category")
+    if page_budget:
+        print(f"\nPage budget: {page_budget} listing pages")
+    return len(problems)
+
+
+def crawl(suppliers, crawl_state, page_budget, pipeline):
+    """Crawl every category in this process, streaming records into `pipeline`."""
+    from scrapers.common import iter_category
+
+    for supplier in suppliers:
+        print(f"\n=== Scraping {supplier['name']} ===")
+        for cat_key, cat_url in discover_categories(supplier, crawl_state):
+            max_pages = None
+            if page_budget:
+                max_pages = page_budget - crawl_state.pages_this_run
+                if max_pages <= 0:
+                    print(f"Page budget of {page_budget} spent, stopping")
+                    break
+            context, selectors = category_context(supplier, cat_key)
+            pipeline.feed(
+                iter_category(
+                    context,
+                    cat_key,
+                    cat_url,
+                    selectors,
+                    crawl_state=crawl_state,
+                    max_pages=max_pages,
+                )
+            )
+
+
+def crawl_with_workers(
+    suppliers, crawl_state, page_budget, pipeline, workers, resume=False
+):
+    """Crawl through the durable page queue with `workers` browser processes."""
+    queue = WorkQueue()
+    if resume and queue.unfinished():
+        print(f"Resuming queue {queue.path}: {queue.counts()}")
+    else:
+        queue.reset()
+        for supplier in suppliers:
+            print(f"\n=== Discovering {supplier['name']} ===")
+            for cat_key, cat_url in discover_categories(supplier, crawl_state):
+                context, selectors = category_context(supplier, cat_key)
+                known, full = crawl_state.plan(category_id(supplier["name"], cat_key))
+                queue.put(
+                    supplier["name"],
+                    cat_key,
+                    cat_url,
+                    context,
+                    selectors,
+                    known_fingerprint=known,
+                    full_crawl=full,
+                )
+    caps = {s["name"]: s.get("max_concurrency") or workers for s in suppliers}
+    print(f"Crawling {queue.unfinished()} queued pages with {workers} workers")
+    with span("workers"):
+        exit_codes = run_workers(queue.path, workers, caps, page_budget)
+    if any(exit_codes) or queue.unfinished():
+        print(f"⚠️ Workers exited with {exit_codes}; queue state {queue.counts()}")
+    for report in queue.reports():
+        telemetry.merge(report)
+    # Workers decided on pagination from the plan; record what they saw of
+    # the categories whose every page is done
+    finished = queue.finished_categories()
+    for supplier_name, cat_key, records in queue.first_pages():
+        if (supplier_name, cat_key) not in finished:
+            continue
+        cat_id = category_id(supplier_name, cat_key)
+        stopped = finished[supplier_name, cat_key]
+        if crawl_state.observe(cat_id, records) and stopped in (None, "limit"):
+            crawl_state.mark_complete(cat_id, every_product=stopped is None)
+    pipeline.feed(queue.iter_merged())
+    queue.close()
 
 
 def main():
@@ -18,7 +193,58 @@ def main():
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--supplier", type=str, default="all")
+    parser.add_argument(
+        "--skip-match",
+        action="store_true",
+        help="Do not run the cross-supplier matching stage after the crawl",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Crawl every page even when a category's first page is unchanged",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Crawl with N browser processes over a shared page queue",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="With --workers, continue an interrupted queue instead of a new crawl",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Validate the config and print the crawl plan without crawling",
+    )
+    parser.add_argument(
+        "--enrich",
+        action="store_true",
+        help="Fetch product detail pages for brand, EAN, dimensions and packaging",
+    )
+    offline = parser.add_mutually_exclusive_group()
+    offline.add_argument(
+        "--record",
+        nargs="?",
+        const=ARCHIVE_DIR,
+        metavar="DIR",
+        help="Record every page and network response of the crawl into DIR",
+    )
+    offline.add_argument(
+        "--replay",
+        nargs="?",
+        const=ARCHIVE_DIR,
+        metavar="DIR",
+        help="Crawl offline from recordings in DIR instead of the live sites",
+    )
     args = parser.parse_args()
+    if args.record or args.replay:
+        # Read by scrapers.replay wherever a browser context is created
+        os.environ["SCRAPER_MODE"] = "record" if args.record else "replay"
+        os.environ["SCRAPER_ARCHIVE"] = args.record or args.replay
+    telemetry.reset()
 
     config = load_config()
     suppliers = [
@@ -26,66 +252,81 @@ def main():
         for s in config["suppliers"]
         if args.supplier == "all" or s["name"].lower() == args.supplier.lower()
     ]
-    all_data = []
+    # Categories whose first page is unchanged are not paginated further
+    crawl_state = CrawlState(full_recrawl_days=0 if args.full else None)
+    page_budget = int(os.getenv("CRAWL_PAGE_BUDGET", 0))
+    if args.dry_run:
+        problems = dry_run(config, suppliers, crawl_state, page_budget)
+        raise SystemExit(1 if problems else 0)
 
-    for supplier in suppliers:
-        sname = supplier["name"].lower()
-        print(f"\n=== Scraping {supplier['name']} ===")
+    # Records are streamed to a JSONL file as they are scraped
+    stream_path = new_stream_path()
+    print(f"Streaming records to {stream_path}")
+    stages = DEFAULT_STAGES
+    if args.enrich:
+        from scrapers.enrich import enrich
 
-        # Discover categories
-        if sname == "castorama":
-            discovered = discover_castorama_categories_with_paths(supplier["base_url"])
-            CATEGORY_LIMIT = int(os.getenv("CASTORAMA_CATEGORY_LIMIT", 2))
-        elif sname == "manomano":
-            discovered = discover_manomano_categories(
-                supplier["base_url"], "section.ec_tSD"
+        # Detail pages add EANs and pack sizes; derive GTINs and unit prices
+        # again once they are on the record
+        stages += (enrich, extract_gtin, unit_price)
+    with Pipeline(JsonlSink(stream_path), stages) as pipeline:
+        if args.workers > 1:
+            crawl_with_workers(
+                suppliers,
+                crawl_state,
+                page_budget,
+                pipeline,
+                args.workers,
+                args.resume,
             )
-            CATEGORY_LIMIT = int(os.getenv("MANOMANO_CATEGORY_LIMIT", 2))
         else:
-            print(f"Skipping unsupported: {sname}")
-            continue
+            crawl(suppliers, crawl_state, page_budget, pipeline)
+    scraped = pipeline.sink.count
 
-        print("Discovered categories:", discovered)
-        items = list(discovered.items())
-        if sname == "manomano":
-            items = items[1:]  # skip first category if needed
-
-        for i, (cat_key, cat_url) in enumerate(items):
-            if i >= CATEGORY_LIMIT:
-                break
-            # For Castorama, cat_key is a tuple (primary, secondary, tertiary)
-            if sname == "castorama" and isinstance(cat_key, tuple):
-                selectors = supplier["categories"].get("tiles")
-                results = scrape_category(
-                    {
-                        "name": supplier["name"],
-                        "base_url": supplier["base_url"],
-                        "category_primary": cat_key[0],
-                        "category_secondary": cat_key[1],
-                        "category_tertiary": cat_key[2],
-                    },
-                    cat_key,
-                    cat_url,
-                    selectors,
-                )
-                all_data.extend(results)
-            else:
-                selectors = supplier["categories"].get(cat_key) or supplier[
-                    "categories"
-                ].get("tiles")
-                results = scrape_category(
-                    {
-                        "name": supplier["name"],
-                        "base_url": supplier["base_url"],
-                    },
-                    cat_key,
-                    cat_url,
-                    selectors,
-                )
-                all_data.extend(results)
+    crawl_state.save()
+    with span("save"):
+        # Products missing from fully crawled categories are dropped
+        changes = save_data(iter_jsonl(stream_path), crawl_state.completed)
+    print(f"\nSaved {scraped} products to {get_data_path()}")
+    print(
+        f"Changes: {changes['inserted']} inserted, "
+        f"{changes['price_changed']} price changes, {changes['removed']} removed"
+    )
+
+    if not args.skip_match:
+        from scrapers.compare_prices import nlp_missing
+
+        # spaCy is optional: a crawl without it still saves its products
+        missing = nlp_missing()
+        if missing:
+            print(f"⏭️ Skipping the matching stage: {missing}")
+        else:
+            from scrapers.match import describe_stats, run_cached_matching
+
+            with span("match"):
+                path, artifact = run_cached_matching(processes=os.cpu_count() or 1)
+            print(f"Published {len(artifact['groups'])} match groups to {path}")
+            print(describe_stats(artifact["match_stats"]))
 
-    save_data(all_data)
-    print(f"\nSaved {len(all_data)} products to {get_data_path()}")
+    quality = quality_report(telemetry.report())
+    report_path = write_report(
+        {
+            "supplier": args.supplier,
+            "items": scraped,
+            "changes": changes,
+            "quality": quality,
+        }
+    )
+    for supplier, q in quality.items():
+        rates = ", ".join(f"{k} {v:.0%}" for k, v in q["fill_rates"].items())
+        print(
+            f"🔎 {supplier}: {q['records']} records checked, filled {rates}; "
+            f"{q['bad_pages']} bad pages, {q['aborted_categories']} categories "
+            "skipped"
+        )
+    for line in memory_summary(telemetry.report()):
+        print(line)
+    print(f"Run report written to {report_path}")
 
 
 if __name__ == "__main__":
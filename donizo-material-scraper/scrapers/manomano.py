@@ -7,6 +7,8 @@ import time
 from bs4 import BeautifulSoup
 from playwright.sync_api import sync_playwright
 from scrapers.helpers import human_scroll, get_random_headers, apply_stealth
+from scrapers.ratelimit import limiter_for, navigate
+from scrapers.replay import headless, new_context
 import random
 import os
 
@@ -17,13 +19,13 @@ def discover_manomano_categories(base_url, container_selector):
     # Get category limit from env or config
     category_limit = int(os.environ.get("MANOMANO_CATEGORY_LIMIT", 5))
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
-        context = browser.new_context(user_agent=USER_AGENTS)
+        browser = p.chromium.launch(headless=headless())
+        context = new_context(browser, user_agent=USER_AGENTS)
         page = context.new_page()
         # Apply stealth for ManoMano (as in original logic)
         apply_stealth(page)
-        page.goto(base_url, timeout=45000)
-        time.sleep(7)
+        # Replaces a fixed sleep: waits only while a challenge page is showing
+        navigate(page, base_url, limiter_for("ManoMano"))
         human_scroll(page)
         page.wait_for_selector(container_selector, timeout=15000)
         soup = BeautifulSoup(page.content(), "html.parser")
@@ -42,5 +44,19 @@ def discover_manomano_categories(base_url, container_selector):
                 discovered[key] = href
                 if len(discovered) >= category_limit:
                     break
+        context.close()
         browser.close()
     return discovered
+
+
+def discover_categories(supplier):
+    """Plugin entry point: category key -> listing URL."""
+    discovered = discover_manomano_categories(
+        supplier["base_url"], supplier.get("discovery_container", "section.ec_tSD")
+    )
+    # The first link of the section is not a product category
+    return dict(list(discovered.items())[1:])
+
+
+def prepare_page(page):
+    apply_stealth(page)
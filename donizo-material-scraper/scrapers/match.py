@@ -0,0 +1,270 @@
+"""
+match.py
+Offline cross-supplier matching stage.
+
+Runs after a crawl: joins offers from different suppliers that share a GTIN
+(`scrapers.gtin`), lemmatizes the catalog with `nlp.pipe` across several
+processes, groups the remaining equivalent products by similarity and publishes
+the groups (with price spreads) as a versioned JSON artifact under
+data/matches. Lemmas and vectors go through the persistent NlpCache, so a
+rerun only parses the products it has not seen. The Streamlit Compare tab
+and the API's /matches endpoint only read the latest artifact.
+
+    python -m scrapers.match --processes 4
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+
+from scrapers.gtin import gtin_from_record, gtin_groups, gtin_key
+from scrapers.helpers import get_data_path, parse_price
+from scrapers.snapshot import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+MATCHES_DIR = os.path.join(BASE_DIR, "data", "matches")
+LATEST_NAME = "LATEST"
+KEEP_ARTIFACTS = 5
+
+
+def catalog_digest(items):
+    payload = json.dumps(items, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def price_spread(products):
+    """Cheapest/dearest offer of a group and the gap between them."""
+    prices = [p["price_value"] for p in products if p["price_value"] is not None]
+    if not prices:
+        return {
+            "price_min": None,
+            "price_max": None,
+            "spread": None,
+            "spread_pct": None,
+        }
+    low, high = min(prices), max(prices)
+    return {
+        "price_min": low,
+        "price_max": high,
+        "spread": round(high - low, 2),
+        "spread_pct": round((high - low) / low * 100, 1) if low else None,
+    }
+
+
+def build_groups(items, norm_names, norm_cats, groups):
+    """Artifact entries for cross-supplier groups (lists of catalog indexes)."""
+    result = []
+    for group_id, group in enumerate(groups):
+        products = []
+        for i in group:
+            item = items[i]
+            products.append(
+                dict(
+                    item,
+                    price_value=parse_price(item.get("price")),
+                    norm_name=norm_names[i],
+                    norm_category=norm_cats[i],
+                )
+            )
+        entry = {
+            "id": group_id,
+            "name": products[0].get("name"),
+            "suppliers": sorted({p["supplier"] for p in products}),
+            "products": products,
+        }
+        entry.update(price_spread(products))
+        result.append(entry)
+    return result
+
+
+def compute_matches(items, processes=1, method=None, nlp=None, cache=None):
+    """Cross-supplier groups: exact GTIN joins first, fuzzy spaCy for the rest.
+
+    Products sharing a valid GTIN across suppliers are grouped by key. The
+    fuzzy matcher only sees products left out of those groups, and a fuzzy
+    group may not join two products whose GTINs differ, so products that
+    both carry a GTIN are only ever matched exactly.
+    """
+    from scrapers.compare_prices import (
+        category_text,
+        load_nlp,
+        match_groups,
+        normalize_texts,
+    )
+
+    if nlp is None:
+        nlp = load_nlp()
+    names = [item.get("name") or "" for item in items]
+    cats = [category_text(item) for item in items]
+    norm_names = normalize_texts(nlp, names, n_process=processes, cache=cache)
+    norm_cats = normalize_texts(nlp, cats, n_process=processes, cache=cache)
+    suppliers = [item.get("supplier") for item in items]
+    gtins = [gtin_from_record(item) for item in items]
+    exact = gtin_groups(gtins, suppliers)
+    grouped = {i for group in exact for i in group}
+    rest = [i for i in range(len(items)) if i not in grouped]
+    fuzzy = []
+    if rest:
+        sub_groups = match_groups(
+            nlp,
+            [norm_names[i] for i in rest],
+            [norm_cats[i] for i in rest],
+            [suppliers[i] for i in rest],
+            method,
+            cache,
+        )
+        for sub_group in sub_groups:
+            group = [rest[i] for i in sub_group]
+            if len({gtin_key(gtins[i]) for i in group if gtins[i]}) <= 1:
+                fuzzy.append(group)
+    if cache is not None:
+        cache.evict(names + cats + norm_names + norm_cats)
+    groups = build_groups(items, norm_names, norm_cats, exact + fuzzy)
+    for entry in groups:
+        if entry["id"] < len(exact):
+            entry.update(match="gtin", gtin=gtins[exact[entry["id"]][0]])
+        else:
+            entry["match"] = "fuzzy"
+    meta = nlp.meta
+    return {
+        "model": f"{meta['lang']}_{meta['name']}-{meta['version']}",
+        "method": method or "auto",
+        "match_stats": match_stats(len(items), gtins, exact, fuzzy),
+        "groups": groups,
+    }
+
+
+def match_stats(size, gtins, exact, fuzzy):
+    """How many groups and products each method matched, and their shares."""
+    exact_products = sum(len(g) for g in exact)
+    fuzzy_products = sum(len(g) for g in fuzzy)
+    matched = exact_products + fuzzy_products
+
+    def share(n, total):
+        return round(n / total * 100, 1) if total else None
+
+    return {
+        "with_gtin": sum(1 for code in gtins if code),
+        "gtin_groups": len(exact),
+        "fuzzy_groups": len(fuzzy),
+        "gtin_products": exact_products,
+        "fuzzy_products": fuzzy_products,
+        "gtin_share_pct": share(exact_products, matched),
+        "fuzzy_share_pct": share(fuzzy_products, matched),
+        "matched_pct": share(matched, size),
+    }
+
+
+def describe_stats(stats):
+    """One line for the console: the exact/fuzzy split of a matching run."""
+    return (
+        f"{stats['gtin_groups']} GTIN groups ({stats['gtin_products']} products, "
+        f"{stats['gtin_share_pct'] or 0}%), {stats['fuzzy_groups']} fuzzy groups "
+        f"({stats['fuzzy_products']} products, {stats['fuzzy_share_pct'] or 0}%); "
+        f"{stats['with_gtin']} products carry a GTIN"
+    )
+
+
+def publish_matches(artifact, matches_dir=MATCHES_DIR):
+    """Write a versioned artifact and atomically point LATEST at it."""
+    os.makedirs(matches_dir, exist_ok=True)
+    name = f"matches-{artifact['version']}.json"
+    payload = json.dumps(artifact, ensure_ascii=False, indent=2).encode("utf-8")
+    atomic_write(os.path.join(matches_dir, name), payload)
+    atomic_write(os.path.join(matches_dir, LATEST_NAME), name.encode("utf-8"))
+    artifacts = sorted(f for f in os.listdir(matches_dir) if f.startswith("matches-"))
+    for old in artifacts[:-KEEP_ARTIFACTS]:
+        os.remove(os.path.join(matches_dir, old))
+    return os.path.join(matches_dir, name)
+
+
+def latest_matches_path(matches_dir=MATCHES_DIR):
+    try:
+        with open(os.path.join(matches_dir, LATEST_NAME), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(matches_dir, name) if name else None
+
+
+def load_matches(matches_dir=MATCHES_DIR):
+    path = latest_matches_path(matches_dir)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def filter_groups(groups, keyword, norm_keyword=None):
+    """Groups with a product whose name (or lemmatized fields) contain keyword."""
+    keyword = (keyword or "").strip().lower()
+    norm_keyword = (norm_keyword or keyword).strip()
+    if not keyword:
+        return groups
+    return [
+        g
+        for g in groups
+        if any(
+            keyword in (p.get("name") or "").lower()
+            or norm_keyword in p.get("norm_name", "")
+            or norm_keyword in p.get("norm_category", "")
+            for p in g["products"]
+        )
+    ]
+
+
+def run_matching(processes=1, method=None, data_path=None, nlp=None, cache=None):
+    with open(data_path or get_data_path(), "r", encoding="utf-8") as f:
+        items = [item for item in json.load(f) if isinstance(item, dict)]
+    digest = catalog_digest(items)
+    started = time.time()
+    artifact = compute_matches(items, processes, method, nlp=nlp, cache=cache)
+    artifact.update(
+        {
+            "version": f"{time.strftime('%Y%m%dT%H%M%S')}-{digest[:8]}",
+            "created_at": started,
+            "catalog_sha1": digest,
+            "catalog_size": len(items),
+            "seconds": round(time.time() - started, 2),
+        }
+    )
+    return publish_matches(artifact), artifact
+
+
+def run_cached_matching(processes=1, method=None, data_path=None):
+    """`run_matching` through the on-disk NlpCache (data/cache)."""
+    from scrapers.compare_prices import load_nlp
+    from scrapers.nlp_cache import NlpCache
+
+    nlp = load_nlp()
+    cache = NlpCache(nlp)
+    try:
+        result = run_matching(processes, method, data_path, nlp=nlp, cache=cache)
+        print(f"NLP cache: {cache.hits} hits, {cache.misses} misses")
+        return result
+    finally:
+        cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--method", choices=["exhaustive", "lsh"], default=None)
+    args = parser.parse_args()
+    from scrapers.compare_prices import nlp_missing
+
+    missing = nlp_missing()
+    if missing:
+        raise SystemExit(f"Cannot match products: {missing}")
+    path, artifact = run_cached_matching(args.processes, args.method)
+    print(
+        f"Published {len(artifact['groups'])} match groups "
+        f"({artifact['catalog_size']} products, {artifact['seconds']}s) to {path}"
+    )
+    print(describe_stats(artifact["match_stats"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+nlp_cache.py
+Persistent cache of spaCy lemmas and document vectors, keyed by text hash.
+
+Entries are stored in a small SQLite file under data/cache and tagged with
+the spaCy model name and version; opening the cache with a different model
+drops the stale entries. Lookups compute only the missing texts, in batches
+through `nlp.pipe`, so restarts and reruns reuse earlier work.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from scrapers.compare_prices import PARALLEL_MIN_TEXTS, lemmatize
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "nlp_cache.sqlite")
+BATCH_SIZE = 256
+
+
+def model_tag(nlp):
+    meta = nlp.meta
+    return f"{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+
+def text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class NlpCache:
+    """Text hash -> (lemmatized text, document vector) for one spaCy model."""
+
+    def __init__(self, nlp, path=CACHE_PATH, batch_size=BATCH_SIZE):
+        self.nlp = nlp
+        self.tag = model_tag(nlp)
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Streamlit reruns the script on other threads; access is serialized
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " model TEXT NOT NULL, key BLOB NOT NULL,"
+                " lemma TEXT, vector BLOB, PRIMARY KEY (model, key))"
+            )
+            self._db.execute("DELETE FROM entries WHERE model != ?", (self.tag,))
+
+    def _lookup(self, column, keys):
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            rows = self._db.execute(
+                f"SELECT key, {column} FROM entries WHERE model = ? AND key IN "
+                f"({','.join('?' * len(chunk))}) AND {column} IS NOT NULL",
+                [self.tag, *chunk],
+            )
+            found.update(rows)
+        return found
+
+    def _store(self, column, values):
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO entries (model, key) VALUES (?, ?) "
+                "ON CONFLICT (model, key) DO NOTHING",
+                [(self.tag, key) for key, _ in values],
+            )
+            self._db.executemany(
+                f"UPDATE entries SET {column} = ? WHERE model = ? AND key = ?",
+                [(value, self.tag, key) for key, value in values],
+            )
+
+    def _get(self, column, texts, compute):
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            found = self._lookup(column, list(set(keys)))
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in found:
+                    missing.setdefault(key, text)
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+            if missing:
+                computed = list(zip(missing, compute(list(missing.values()))))
+                self._store(column, computed)
+                found.update(computed)
+        return [found[key] for key in keys]
+
+    def lemmas(self, texts, n_process=1):
+        """Lower-cased, lemmatized form of each text (see `lemmatize`).
+
+        Misses are parsed across `n_process` processes when there are enough
+        of them (a cold cache).
+        """
+
+        def compute(batch):
+            lowered = [t.lower() for t in batch]
+            workers = n_process if len(batch) >= PARALLEL_MIN_TEXTS else 1
+            docs = self.nlp.pipe(
+                lowered, batch_size=self.batch_size, n_process=workers
+            )
+            return [lemmatize(doc) for doc in docs]
+
+        return self._get("lemma", texts, compute)
+
+    def vectors(self, texts):
+        """Raw (un-normalized) float32 document vector of each text."""
+
+        def compute(batch):
+            docs = self.nlp.pipe(batch, batch_size=self.batch_size)
+            return [np.asarray(d.vector, dtype=np.float32).tobytes() for d in docs]
+
+        width = self.nlp.vocab.vectors_length
+        blobs = self._get("vector", texts, compute)
+        matrix = np.frombuffer(b"".join(blobs), dtype=np.float32)
+        return matrix.reshape(len(texts), width).copy()
+
+    def evict(self, live_texts):
+        """Drop every entry whose text is not in `live_texts`; returns the count."""
+        with self._lock, self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS live (key BLOB)")
+            self._db.execute("DELETE FROM live")
+            self._db.executemany(
+                "INSERT INTO live VALUES (?)",
+                [(text_key(t),) for t in set(live_texts)],
+            )
+            removed = self._db.execute(
+                "DELETE FROM entries WHERE model = ? AND key NOT IN"
+                " (SELECT key FROM live)",
+                (self.tag,),
+            ).rowcount
+            self._db.execute("DELETE FROM live")
+        return removed
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM entries WHERE model = ?", (self.tag,)
+            ).fetchone()[0]
+
+    def close(self):
+        self._db.close()
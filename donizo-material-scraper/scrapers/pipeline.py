@@ -0,0 +1,192 @@
+"""
+pipeline.py
+Streaming record pipeline from extraction to storage.
+
+Scraped records are pushed into a bounded buffer as soon as a page is
+extracted; a consumer thread pulls them through generator stages
+(normalize, GTIN extraction, price per unit, dedupe, optional enrichment)
+into a sink. The default sink appends JSON lines to data/stream/crawl-*.jsonl
+and flushes every second, and whenever the buffer runs empty, so records are
+visible downstream (`tail -f`) while the crawl is still running, and the
+crawler never holds more than the buffer in memory.
+When the buffer is full the scrapers block until the sink catches up.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from scrapers.gtin import extract_gtin
+from scrapers.units import unit_price
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+STREAM_DIR = os.path.join(BASE_DIR, "data", "stream")
+BUFFER_SIZE = 256
+FLUSH_SECONDS = 1.0
+KEEP_STREAMS = 10
+TEXT_FIELDS = ("name", "brand", "unit", "price")
+
+_DONE = object()
+
+
+def record_key(record):
+    """Identity of a product: its URL, or supplier/name/image when it has none."""
+    if record.get("url"):
+        return record["url"]
+    return "|".join(
+        str(record.get(field) or "") for field in ("supplier", "name", "image_url")
+    )
+
+
+def normalize(records):
+    """Collapse whitespace in text fields and make image URLs absolute."""
+    for record in records:
+        for field in TEXT_FIELDS:
+            value = record.get(field)
+            if isinstance(value, str):
+                record[field] = re.sub(r"\s+", " ", value).strip() or None
+        image_url = record.get("image_url")
+        if image_url and image_url.startswith("//"):
+            record["image_url"] = "https:" + image_url
+        yield record
+
+
+def dedupe(records):
+    """Drop records already seen in this run (keeps 8-byte digests only).
+
+    The digests of the whole run are kept, around 100 bytes per distinct
+    record, so a product listed in two categories is written once.
+    """
+    seen = set()
+    for record in records:
+        digest = hashlib.blake2b(
+            record_key(record).encode("utf-8"), digest_size=8
+        ).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        yield record
+
+
+DEFAULT_STAGES = (normalize, extract_gtin, unit_price, dedupe)
+
+
+class JsonlSink:
+    """Appends records as JSON lines, flushing at most every FLUSH_SECONDS.
+
+    The pipeline also calls `flush` when its buffer runs empty, so the last
+    records of a burst do not wait for the next one.
+    """
+
+    def __init__(self, path, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.count = 0
+        self.flush_seconds = flush_seconds
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._flushed = time.monotonic()
+        self._dirty = False
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+        self._dirty = True
+        if time.monotonic() - self._flushed >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._dirty:
+            self._file.flush()
+            self._dirty = False
+        self._flushed = time.monotonic()
+
+    def close(self):
+        self._file.close()
+
+
+def new_stream_path(stream_dir=STREAM_DIR):
+    os.makedirs(stream_dir, exist_ok=True)
+    streams = sorted(f for f in os.listdir(stream_dir) if f.startswith("crawl-"))
+    for old in streams[: max(len(streams) - KEEP_STREAMS + 1, 0)]:
+        os.remove(os.path.join(stream_dir, old))
+    name = f"crawl-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl"
+    return os.path.join(stream_dir, name)
+
+
+def iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Pipeline:
+    """Bounded buffer feeding `stages` (generator functions) into `sink`.
+
+    `put`/`feed` block while the buffer is full, and the sink is flushed
+    whenever the buffer runs empty. If a stage or the sink fails, the error
+    is raised from the next `put` and from `close`.
+    """
+
+    def __init__(self, sink, stages=DEFAULT_STAGES, buffer_size=BUFFER_SIZE):
+        self.sink = sink
+        self.stages = stages
+        self.error = None
+        self._buffer = queue.Queue(maxsize=buffer_size)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _records(self):
+        while True:
+            try:
+                record = self._buffer.get_nowait()
+            except queue.Empty:
+                # The scrapers are between pages: show what we have
+                if self.error is None:
+                    self.sink.flush()
+                record = self._buffer.get()
+            if record is _DONE:
+                return
+            yield record
+
+    def _run(self):
+        records = self._records()
+        stream = records
+        for stage in self.stages:
+            stream = stage(stream)
+        try:
+            for record in stream:
+                self.sink.write(record)
+        except Exception as e:
+            self.error = e
+            # Keep draining so producers blocked on a full buffer wake up
+            for _ in records:
+                pass
+
+    def put(self, record):
+        if self.error is not None:
+            raise self.error
+        self._buffer.put(record)
+
+    def feed(self, records):
+        for record in records:
+            self.put(record)
+
+    def close(self):
+        """Flush everything through the stages; returns the records written."""
+        self._buffer.put(_DONE)
+        self._thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
+        return self.sink.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
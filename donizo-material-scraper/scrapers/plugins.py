@@ -0,0 +1,121 @@
+"""
+plugins.py
+Supplier plugin registry.
+
+Each supplier in scraper_config.yaml names the module that implements it
+(`plugin: scrapers.castorama`). The module is imported the first time that
+supplier is crawled, so a run only loads the suppliers it needs, and
+`main --dry-run` loads none (and no browser library). A plugin module
+provides:
+
+- discover_categories(supplier): {category key: listing URL}
+- prepare_page(page), optional: before a listing page is opened
+- after_navigate(page), optional: once it is open (popups, banners...)
+
+Discovered categories are cached in data/cache/categories.json, which is
+what the dry run plans from.
+"""
+
+import importlib
+import importlib.util
+import json
+import os
+import time
+
+from scrapers.helpers import load_config
+from scrapers.snapshot import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+CATEGORY_CACHE_PATH = os.path.join(BASE_DIR, "data", "cache", "categories.json")
+
+_plugins = {}
+
+
+def plugin_for(supplier_name):
+    """The plugin module of a supplier, imported on first use."""
+    key = supplier_name.lower()
+    if key not in _plugins:
+        for supplier in load_config()["suppliers"]:
+            if supplier["name"].lower() == key and supplier.get("plugin"):
+                _plugins[key] = importlib.import_module(supplier["plugin"])
+                break
+        else:
+            raise ValueError(f"No plugin configured for supplier {supplier_name}")
+    return _plugins[key]
+
+
+def hook(supplier_name, name, page):
+    """Run a plugin's optional page hook, if it has one."""
+    fn = getattr(plugin_for(supplier_name), name, None)
+    if fn is not None:
+        fn(page)
+
+
+def validate_config(config):
+    """Problems with the scraper config, as messages; [] when it is usable.
+
+    Plugin modules are located but not imported.
+    """
+    problems = []
+    suppliers = (config or {}).get("suppliers") or []
+    if not suppliers:
+        return ["no suppliers configured"]
+    names = set()
+    for i, supplier in enumerate(suppliers):
+        name = supplier.get("name") or f"suppliers[{i}]"
+        if name.lower() in names:
+            problems.append(f"{name}: duplicate supplier name")
+        names.add(name.lower())
+        for field in ("name", "base_url", "plugin"):
+            if not supplier.get(field):
+                problems.append(f"{name}: missing `{field}`")
+        plugin = supplier.get("plugin")
+        if plugin and importlib.util.find_spec(plugin) is None:
+            problems.append(f"{name}: plugin module {plugin} not found")
+        categories = supplier.get("categories") or {}
+        if not categories:
+            problems.append(f"{name}: no `categories` selectors")
+        for key, selectors in categories.items():
+            if not (selectors or {}).get("product_selector"):
+                problems.append(f"{name}: category {key} has no product_selector")
+        concurrency = (supplier.get("pagination") or {}).get("concurrency", 1)
+        if not isinstance(concurrency, int) or concurrency < 1:
+            problems.append(f"{name}: pagination.concurrency must be a positive int")
+        for setting, value in (supplier.get("rate_limit") or {}).items():
+            if not isinstance(value, (int, float)) or value < 0:
+                problems.append(f"{name}: rate_limit.{setting} must be a number >= 0")
+    return problems
+
+
+def _category_key(value):
+    # Castorama keys are (primary, secondary, tertiary) tuples
+    return tuple(value) if isinstance(value, list) else value
+
+
+def load_category_cache(path=None):
+    try:
+        with open(path or CATEGORY_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def cached_categories(supplier_name, path=None):
+    """(discovered at, [(category key, URL)]) from the last discovery, or None."""
+    entry = load_category_cache(path).get(supplier_name)
+    if entry is None:
+        return None
+    items = [(_category_key(key), url) for key, url in entry["categories"]]
+    return entry["discovered_at"], items
+
+
+def cache_categories(supplier_name, items, path=None):
+    path = path or CATEGORY_CACHE_PATH
+    cache = load_category_cache(path)
+    cache[supplier_name] = {
+        "discovered_at": time.time(),
+        "categories": [[key, url] for key, url in items],
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = json.dumps(cache, ensure_ascii=False, indent=2)
+    atomic_write(path, payload.encode("utf-8"))
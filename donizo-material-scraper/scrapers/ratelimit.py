@@ -0,0 +1,307 @@
+"""
+ratelimit.py
+Adaptive per-supplier pacing for page navigations.
+
+Each supplier gets a token bucket whose refill rate adapts to how the site
+responds: healthy pages raise the rate a little (additive increase), while
+403/429 responses and bot-challenge pages halve it and pause the supplier
+with an exponential backoff before the page is retried. Every decision is
+printed so a slow or blocked run can be explained afterwards.
+
+Worker processes of a `main --workers` crawl share each supplier's limiter
+through the queue's SQLite file (`share_limiters`): the rate, the backoff
+and the time the next navigation is allowed are one row per supplier, so
+the workers together keep to the supplier's rate and a block seen by one
+slows them all.
+"""
+
+import random
+import re
+import sqlite3
+import threading
+import time
+
+from playwright.sync_api import Error as PlaywrightError
+
+from scrapers.helpers import load_config
+from scrapers.replay import replaying
+from scrapers.telemetry import count, span
+
+DEFAULTS = {
+    "initial_rate": 0.33,  # navigations per second (about one every 3s)
+    "min_rate": 0.05,
+    "max_rate": 1.0,
+    "burst": 1,
+    "increase": 0.02,
+    "backoff_base": 5.0,  # seconds, doubled on each consecutive block
+    "max_backoff": 300.0,
+    "max_retries": 3,
+    "challenge_wait": 10.0,  # seconds a JS challenge gets to clear by itself
+}
+BLOCK_STATUSES = {403, 429, 503}
+# Recorded pages are served locally: no pacing, no waiting
+REPLAY_SETTINGS = {
+    "initial_rate": 1000.0,
+    "max_rate": 1000.0,
+    "burst": 1000,
+    "backoff_base": 0.0,
+    "challenge_wait": 0.0,
+}
+SHARED_SCHEMA = """
+CREATE TABLE IF NOT EXISTS limiters (
+    name TEXT PRIMARY KEY,
+    rate REAL NOT NULL,
+    next_at REAL NOT NULL,
+    blocked_until REAL NOT NULL,
+    consecutive_blocks INTEGER NOT NULL
+);
+"""
+# Interstitial titles (Cloudflare)
+CHALLENGE_TITLES = ("just a moment", "attention required")
+# The interstitial's own markup: Cloudflare's challenge form or widget, or a
+# Cloudflare/DataDome challenge iframe. Not "challenge-platform": Cloudflare
+# injects /cdn-cgi/challenge-platform/ scripts into ordinary pages too.
+CHALLENGE_MARKUP = re.compile(
+    r'<form[^>]+(?:id="challenge-form"|action="[^"]*__cf_chl)'
+    r'|(?:id|class)="cf-chl-'
+    r'|<iframe[^>]+src="[^"]*(?:challenges\.cloudflare\.com|captcha-delivery\.com)',
+    re.I,
+)
+
+
+class BlockedError(Exception):
+    """A page stayed blocked after all retries."""
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, name, **settings):
+        self.name = name
+        self.settings = dict(DEFAULTS, **settings)
+        self.rate = self.settings["initial_rate"]
+        self.tokens = float(self.settings["burst"])
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.consecutive_blocks = 0
+        self.max_retries = self.settings["max_retries"]
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        print(f"🚦 [{self.name}] {message} (rate {self.rate:.2f}/s)")
+
+    def acquire(self):
+        """Block until this supplier may issue its next navigation."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                float(self.settings["burst"]),
+                self.tokens + (now - self.updated) * self.rate,
+            )
+            self.updated = now
+            # Reserve a token now and sleep outside the lock
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, self.blocked_until - now, 0.0)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def faster(self, rate):
+        return min(self.settings["max_rate"], rate + self.settings["increase"])
+
+    def slower(self, rate):
+        return max(self.settings["min_rate"], rate / 2)
+
+    def backoff(self, consecutive_blocks):
+        return min(
+            self.settings["max_backoff"],
+            self.settings["backoff_base"] * 2 ** (consecutive_blocks - 1),
+        ) * random.uniform(0.8, 1.2)
+
+    def on_success(self):
+        with self._lock:
+            self.consecutive_blocks = 0
+            old = self.rate
+            self.rate = self.faster(old)
+        if self.rate != old:
+            self.log("healthy response, speeding up")
+
+    def on_block(self, reason):
+        with self._lock:
+            self.consecutive_blocks += 1
+            self.rate = self.slower(self.rate)
+            backoff = self.backoff(self.consecutive_blocks)
+            self.blocked_until = time.monotonic() + backoff
+        self.log(f"{reason}, backing off {backoff:.1f}s")
+        return backoff
+
+
+class SharedRateLimiter(AdaptiveRateLimiter):
+    """A supplier's limiter shared by processes through a SQLite file.
+
+    Navigations are spaced 1/rate apart across all processes (`burst` is
+    not used); state changes happen in one transaction on the supplier's
+    row, with wall-clock times since processes share no monotonic clock.
+    """
+
+    FIELDS = ("rate", "next_at", "blocked_until", "consecutive_blocks")
+
+    def __init__(self, name, path, **settings):
+        super().__init__(name, **settings)
+        self._db = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SHARED_SCHEMA)
+        self._db.execute(
+            "INSERT OR IGNORE INTO limiters VALUES (?, ?, 0, 0, 0)",
+            (name, self.rate),
+        )
+
+    def _update(self, fn):
+        """Apply `fn(state, now)` to the shared row; returns its result."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT {', '.join(self.FIELDS)} FROM limiters WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                state = dict(zip(self.FIELDS, row))
+                result = fn(state, time.time())
+                self._db.execute(
+                    "UPDATE limiters SET rate = :rate, next_at = :next_at,"
+                    " blocked_until = :blocked_until,"
+                    " consecutive_blocks = :consecutive_blocks WHERE name = :name",
+                    dict(state, name=self.name),
+                )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self.rate = state["rate"]
+        return result
+
+    def acquire(self):
+        def reserve(state, now):
+            start = max(now, state["next_at"], state["blocked_until"])
+            state["next_at"] = start + 1 / state["rate"]
+            return start - now
+
+        wait = self._update(reserve)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self):
+        def speed_up(state, now):
+            old = state["rate"]
+            state["consecutive_blocks"] = 0
+            state["rate"] = self.faster(old)
+            return old
+
+        if self._update(speed_up) != self.rate:
+            self.log("healthy response, speeding up")
+
+    def on_block(self, reason):
+        def back_off(state, now):
+            state["consecutive_blocks"] += 1
+            state["rate"] = self.slower(state["rate"])
+            backoff = self.backoff(state["consecutive_blocks"])
+            state["blocked_until"] = max(state["blocked_until"], now + backoff)
+            return backoff
+
+        backoff = self._update(back_off)
+        self.log(f"{reason}, backing off {backoff:.1f}s")
+        return backoff
+
+
+def is_challenge(page):
+    try:
+        title = page.title().lower()
+        if any(marker in title for marker in CHALLENGE_TITLES):
+            return True
+        return CHALLENGE_MARKUP.search(page.content()[:20000]) is not None
+    except PlaywrightError:
+        return False
+
+
+def block_reason(response, page):
+    """Why a navigation counts as blocked, or None when the page is usable."""
+    if response is not None and response.status in BLOCK_STATUSES:
+        return f"HTTP {response.status}"
+    if is_challenge(page):
+        return "challenge page"
+    return None
+
+
+def wait_for_challenge(page, timeout):
+    """Give an interstitial (e.g. Cloudflare) a chance to clear by itself."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not is_challenge(page):
+            return True
+        time.sleep(1)
+    return not is_challenge(page)
+
+
+def navigate(page, url, limiter, timeout=45000):
+    """`page.goto` paced by `limiter`, retried with backoff while blocked."""
+    supplier = limiter.name
+    for attempt in range(limiter.max_retries + 1):
+        if attempt:
+            limiter.log(f"retrying {url} ({attempt}/{limiter.max_retries})")
+            count("retries", supplier=supplier)
+        with span("rate_limit_wait", supplier=supplier):
+            limiter.acquire()
+        try:
+            with span("navigate", supplier=supplier):
+                response = page.goto(url, timeout=timeout)
+        except PlaywrightError as e:
+            count("errors", supplier=supplier)
+            limiter.on_block(f"navigation error ({type(e).__name__})")
+            continue
+        reason = block_reason(response, page)
+        if reason == "challenge page":
+            with span("challenge_wait", supplier=supplier):
+                if wait_for_challenge(page, limiter.settings["challenge_wait"]):
+                    reason = None
+        if reason is None:
+            limiter.on_success()
+            return response
+        count("blocks", supplier=supplier)
+        limiter.on_block(reason)
+    raise BlockedError(f"{limiter.name}: {url} still blocked after retries")
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_shared = {"path": None}
+
+
+def share_limiters(path):
+    """Have `limiter_for` share limiters through the SQLite file at `path`."""
+    with _limiters_lock:
+        _shared["path"] = path
+        _limiters.clear()
+
+
+def limiter_for(supplier_name):
+    """The process-wide limiter of a supplier, configured from `rate_limit`.
+
+    Shared with the other worker processes after `share_limiters`.
+    """
+    key = supplier_name.lower()
+    with _limiters_lock:
+        if key not in _limiters:
+            settings = {}
+            for supplier in load_config()["suppliers"]:
+                if supplier["name"].lower() == key:
+                    settings = supplier.get("rate_limit") or {}
+            if replaying():
+                settings = dict(settings, **REPLAY_SETTINGS)
+            if _shared["path"]:
+                _limiters[key] = SharedRateLimiter(
+                    supplier_name, _shared["path"], **settings
+                )
+            else:
+                _limiters[key] = AdaptiveRateLimiter(supplier_name, **settings)
+        return _limiters[key]
@@ -0,0 +1,192 @@
+"""
+replay.py
+Record/replay harness for offline crawls.
+
+`SCRAPER_MODE=record` makes every browser context write a HAR archive
+(page HTML plus every network response, bodies embedded) into
+SCRAPER_ARCHIVE (default data/recordings). `SCRAPER_MODE=replay` serves
+those archives from a local HTTP server and routes all browser traffic to
+it, so `scrape_category` and the discovery functions run unchanged,
+deterministically and without network. Pacing and human-like pauses are
+skipped while replaying.
+
+    python -m scrapers.main --supplier castorama --record data/recordings
+    python -m benchmarks.scrape_replay --archive data/recordings
+"""
+
+import base64
+import glob
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+ARCHIVE_DIR = os.path.join(BASE_DIR, "data", "recordings")
+MODES = ("live", "record", "replay")
+# Set from the archived body, which is stored decoded
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def mode():
+    value = os.getenv("SCRAPER_MODE", "live").lower()
+    if value not in MODES:
+        raise ValueError(f"SCRAPER_MODE must be one of {MODES}, got {value!r}")
+    return value
+
+
+def replaying():
+    return mode() == "replay"
+
+
+def archive_dir():
+    return os.getenv("SCRAPER_ARCHIVE") or ARCHIVE_DIR
+
+
+def headless():
+    """Replays need no display; live crawls stay headed unless asked."""
+    return replaying() or os.getenv("SCRAPER_HEADLESS", "0") == "1"
+
+
+def load_archive(path):
+    """(method, url) -> recorded responses, in recording order, from HAR files."""
+    files = [path] if os.path.isfile(path) else glob.glob(os.path.join(path, "*.har"))
+    responses = {}
+    for har_path in sorted(files):
+        with open(har_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)["log"]["entries"]
+        for entry in entries:
+            request, response = entry["request"], entry["response"]
+            content = response.get("content", {})
+            body = content.get("text") or ""
+            if content.get("encoding") == "base64":
+                body = base64.b64decode(body)
+            else:
+                body = body.encode("utf-8")
+            headers = [
+                (h["name"], h["value"])
+                for h in response.get("headers", [])
+                if h["name"].lower() not in DROPPED_HEADERS
+            ]
+            key = (request["method"], request["url"])
+            responses.setdefault(key, []).append(
+                {"status": response["status"], "headers": headers, "body": body}
+            )
+    return responses
+
+
+class ReplayServer:
+    """Local HTTP server answering `/?method=&url=` from a recorded archive.
+
+    Repeated requests for the same URL get the recorded responses in order,
+    then the last one again; unknown URLs get a 404 marked X-Replay-Miss.
+    """
+
+    def __init__(self, path):
+        self.responses = load_archive(path)
+        self.served = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                key = (query["method"][0], query["url"][0])
+                recorded = server.lookup(key)
+                if recorded is None:
+                    self.send_response(404)
+                    self.send_header("X-Replay-Miss", "1")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(recorded["status"])
+                for name, value in recorded["headers"]:
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(recorded["body"])))
+                self.end_headers()
+                self.wfile.write(recorded["body"])
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        thread.start()
+
+    def lookup(self, key):
+        with self._lock:
+            recorded = self.responses.get(key)
+            if not recorded:
+                self.misses += 1
+                return None
+            self.hits += 1
+            i = self.served.get(key, 0)
+            self.served[key] = i + 1
+            return recorded[min(i, len(recorded) - 1)]
+
+    def fetch(self, method, url):
+        """(status, headers, body) of the recorded answer; status 0 on a miss."""
+        query = urlencode({"method": method, "url": url})
+        try:
+            with urllib.request.urlopen(f"{self.url}/?{query}") as response:
+                return response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            if e.headers.get("X-Replay-Miss"):
+                return 0, {}, b""
+            return e.code, dict(e.headers), e.read()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def replay_server():
+    """The process-wide server for SCRAPER_ARCHIVE, started on first use."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            path = archive_dir()
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No recordings to replay at {path}")
+            _server = ReplayServer(path)
+        return _server
+
+
+def route_to_replay(route):
+    status, headers, body = replay_server().fetch(
+        route.request.method, route.request.url
+    )
+    if status == 0:
+        # Never recorded (trackers, ads...): fail fast like an offline network
+        route.abort("internetdisconnected")
+        return
+    route.fulfill(status=status, headers=headers, body=body)
+
+
+def new_context(browser, **kwargs):
+    """`browser.new_context` that records or replays according to SCRAPER_MODE.
+
+    Recorded archives are written when the context is closed.
+    """
+    current = mode()
+    if current == "record":
+        os.makedirs(archive_dir(), exist_ok=True)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.har"
+        kwargs["record_har_path"] = os.path.join(archive_dir(), name)
+        kwargs["record_har_content"] = "embed"
+    context = browser.new_context(**kwargs)
+    if current == "replay":
+        context.route("**/*", route_to_replay)
+    return context
@@ -0,0 +1,358 @@
+"""
+snapshot.py
+Read-only catalog snapshots shared between API worker processes.
+
+A snapshot is a single binary file holding every record (as UTF-8 JSON) plus
+the category index and a price-per-unit index (record ids of each category
+label and canonical unit, cheapest first; see scrapers/units.py), laid out
+so it can be memory-mapped. Each uvicorn worker
+maps the same file, so the records live once in the OS page cache instead of
+once per worker. New crawls publish a new generation next to the old one and
+swap the CURRENT pointer atomically; readers pick it up on their next request.
+A snapshot built from materials.json records the file's size and mtime, and
+a reader republishes it when the file has changed some other way (a manual
+edit, a restore, a `git pull`). Publishing holds a lock file in the snapshot
+directory, so concurrent publishers number generations in turn; a reader
+that finds the lock taken keeps serving its generation meanwhile.
+"""
+
+import contextlib
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+from scrapers.catalog import CategoryTable, iter_records
+from scrapers.changes import file_stamp
+from scrapers.units import price_per_unit
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "data", "materials.json")
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "data", "snapshots")
+CURRENT_NAME = "CURRENT"
+LOCK_NAME = ".publish.lock"
+KEEP_GENERATIONS = 2
+
+MAGIC = b"DZCAT001"
+PREAMBLE = struct.Struct("<8sQ")  # magic, header length
+
+
+def _align(buf, size=8):
+    buf.extend(b"\0" * (-len(buf) % size))
+
+
+def build_snapshot(data, generation, data_file=None):
+    """Serialize records and their category and unit indexes into snapshot bytes."""
+    blobs = []
+    postings = {}
+    unit_postings = {}
+    # Labels are worked out once per distinct category path
+    categories = CategoryTable()
+    for idx, item in enumerate(data):
+        blobs.append(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+        labels = categories.labels(categories.id_for(item))
+        for label in labels:
+            postings.setdefault(label, []).append(idx)
+        unit_price = price_per_unit(item)
+        if unit_price is not None:
+            for label in labels:
+                entries = unit_postings.setdefault((label, unit_price[1]), [])
+                entries.append((unit_price[0], idx))
+
+    body = bytearray()
+    offsets_at = len(body)
+    pos = 0
+    offsets = [0]
+    for blob in blobs:
+        pos += len(blob)
+        offsets.append(pos)
+    body += struct.pack(f"<{len(offsets)}Q", *offsets)
+
+    postings_at = len(body)
+    categories = []
+    start = 0
+    for label in sorted(postings):
+        ids = postings[label]
+        categories.append([label, start, len(ids)])
+        body += struct.pack(f"<{len(ids)}I", *ids)
+        start += len(ids)
+    _align(body)
+
+    units = []
+    unit_ids = []
+    unit_prices = []
+    for label, unit in sorted(unit_postings):
+        entries = sorted(unit_postings[label, unit])
+        units.append([label, unit, len(unit_ids), len(entries)])
+        unit_prices.extend(price for price, _ in entries)
+        unit_ids.extend(idx for _, idx in entries)
+    unit_prices_at = len(body)
+    body += struct.pack(f"<{len(unit_prices)}d", *unit_prices)
+    unit_ids_at = len(body)
+    body += struct.pack(f"<{len(unit_ids)}I", *unit_ids)
+    _align(body)
+
+    records_at = len(body)
+    for blob in blobs:
+        body += blob
+
+    header = json.dumps(
+        {
+            "generation": generation,
+            "count": len(blobs),
+            "created_at": time.time(),
+            # `file_stamp` of the data file the records were read from
+            "data_file": data_file,
+            "offsets_at": offsets_at,
+            "postings_at": postings_at,
+            "unit_prices_at": unit_prices_at,
+            "unit_ids_at": unit_ids_at,
+            "records_at": records_at,
+            "categories": categories,
+            "units": units,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    header += b" " * (-(PREAMBLE.size + len(header)) % 8)
+    return PREAMBLE.pack(MAGIC, len(header)) + header + bytes(body)
+
+
+class Snapshot:
+    """A memory-mapped, read-only view over one snapshot generation."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_len = PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        base = PREAMBLE.size + header_len
+        header = json.loads(bytes(self._mm[PREAMBLE.size : base]))
+        self.generation = header["generation"]
+        self.count = header["count"]
+        self.created_at = header["created_at"]
+        self.data_file = header.get("data_file")
+        self.categories = header["categories"]
+        view = memoryview(self._mm)
+        offsets_at = base + header["offsets_at"]
+        postings_at = base + header["postings_at"]
+        self._offsets = view[offsets_at : offsets_at + 8 * (self.count + 1)].cast("Q")
+        n_postings = sum(length for _, _, length in self.categories)
+        self._postings = view[postings_at : postings_at + 4 * n_postings].cast("I")
+        # Snapshots written before the unit index existed have none
+        self.units = header.get("units", [])
+        n_units = sum(length for _, _, _, length in self.units)
+        if n_units:
+            prices_at = base + header["unit_prices_at"]
+            ids_at = base + header["unit_ids_at"]
+            self._unit_prices = view[prices_at : prices_at + 8 * n_units].cast("d")
+            self._unit_ids = view[ids_at : ids_at + 4 * n_units].cast("I")
+        self._records_at = base + header["records_at"]
+
+    def __len__(self):
+        return self.count
+
+    def get(self, idx):
+        start = self._records_at + self._offsets[idx]
+        end = self._records_at + self._offsets[idx + 1]
+        return json.loads(self._mm[start:end])
+
+    def __iter__(self):
+        for idx in range(self.count):
+            yield self.get(idx)
+
+    def ids_for_category(self, category):
+        """Record ids whose category fields contain `category` (case-insensitive)."""
+        needle = category.lower()
+        ids = set()
+        for label, start, length in self.categories:
+            if needle in label:
+                ids.update(self._postings[start : start + length])
+        return sorted(ids)
+
+    def find_by_category(self, category):
+        return [self.get(idx) for idx in self.ids_for_category(category)]
+
+    def cheapest_per_unit(self, category, unit, limit=10):
+        """(price per unit, record id) of the cheapest offers per `unit` among
+        records whose category fields contain `category`, cheapest first."""
+        needle = category.lower()
+        runs = [
+            zip(
+                self._unit_prices[start : start + length],
+                self._unit_ids[start : start + length],
+            )
+            for label, label_unit, start, length in self.units
+            if label_unit == unit and needle in label
+        ]
+        result = []
+        seen = set()
+        # Each run is already sorted; a record on several labels counts once
+        for price, idx in heapq.merge(*runs):
+            if idx in seen:
+                continue
+            seen.add(idx)
+            result.append((price, idx))
+            if len(result) >= limit:
+                break
+        return result
+
+
+def _current_pointer(snapshot_dir):
+    return os.path.join(snapshot_dir, CURRENT_NAME)
+
+
+def _read_pointer(snapshot_dir):
+    try:
+        with open(_current_pointer(snapshot_dir), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def atomic_write(path, payload):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+@contextlib.contextmanager
+def publish_lock(snapshot_dir, blocking=True):
+    """Hold the snapshot directory's publish lock; yields whether it was taken
+    (always True when `blocking`)."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, LOCK_NAME), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def publish_snapshot(data=None, snapshot_dir=SNAPSHOT_DIR, data_path=DATA_PATH):
+    """Write a new snapshot generation and atomically make it current.
+
+    Without `data`, the records are read from `data_path`.
+    """
+    with publish_lock(snapshot_dir):
+        return _publish(data, snapshot_dir, data_path)
+
+
+def _publish(data, snapshot_dir, data_path):
+    # Called with the publish lock held: the generation number and pruning
+    # see every earlier publish
+    data_file = None
+    if data is None:
+        # Stamped before reading: a write meanwhile makes the snapshot stale
+        data_file = file_stamp(data_path)
+        data = iter_records(data_path)
+    current = _read_pointer(snapshot_dir)
+    generation = 1
+    if current:
+        generation = int(current.split("-")[1].split(".")[0]) + 1
+    name = f"catalog-{generation:08d}.bin"
+    atomic_write(
+        os.path.join(snapshot_dir, name),
+        build_snapshot(
+            [d for d in data if isinstance(d, dict)], generation, data_file
+        ),
+    )
+    atomic_write(_current_pointer(snapshot_dir), name.encode("utf-8"))
+    # Older generations may still be mapped by workers; unlinking is safe on
+    # POSIX, the pages stay valid until the last mapping goes away.
+    generations = sorted(
+        f for f in os.listdir(snapshot_dir) if f.startswith("catalog-")
+    )
+    for old in generations[:-KEEP_GENERATIONS]:
+        try:
+            os.remove(os.path.join(snapshot_dir, old))
+        except OSError:
+            pass
+    return os.path.join(snapshot_dir, name)
+
+
+class SnapshotReader:
+    """Per-process handle that follows the CURRENT pointer across generations."""
+
+    def __init__(self, snapshot_dir=SNAPSHOT_DIR, data_path=DATA_PATH):
+        self.snapshot_dir = snapshot_dir
+        self.data_path = data_path
+        self._stamp = None
+        self._snapshot = None
+
+    def current(self):
+        snapshot = self._load()
+        if snapshot is None:
+            if not os.path.exists(self.data_path):
+                return None
+            self._republish(blocking=True)
+        elif self._stale(snapshot):
+            # Another worker may be publishing: serve this generation until then
+            self._republish(blocking=False)
+        return self._snapshot
+
+    def _load(self):
+        """Follow CURRENT to its generation; None before the first publish."""
+        for _ in range(3):
+            try:
+                st = os.stat(_current_pointer(self.snapshot_dir))
+            except FileNotFoundError:
+                return self._snapshot
+            # os.replace gives the pointer a fresh inode on every publish
+            stamp = (st.st_ino, st.st_mtime_ns)
+            if stamp == self._stamp:
+                return self._snapshot
+            name = _read_pointer(self.snapshot_dir)
+            if not name:
+                return self._snapshot
+            try:
+                self._snapshot = Snapshot(os.path.join(self.snapshot_dir, name))
+            except FileNotFoundError:
+                # Pruned by a newer publish since the pointer was read
+                continue
+            self._stamp = stamp
+            break
+        return self._snapshot
+
+    def _republish(self, blocking):
+        with publish_lock(self.snapshot_dir, blocking) as locked:
+            if not locked:
+                return
+            # Re-read under the lock: another worker may have just published
+            snapshot = self._load()
+            if snapshot is not None and not self._stale(snapshot):
+                return
+            if snapshot is not None:
+                print(f"🔄 {self.data_path} changed outside a crawl, republishing")
+            _publish(None, self.snapshot_dir, self.data_path)
+        self._load()
+
+    def _stale(self, snapshot):
+        # Snapshots of records passed in directly have no data file to follow
+        if snapshot.data_file is None:
+            return False
+        stamp = file_stamp(self.data_path)
+        return stamp is not None and stamp != snapshot.data_file
+
+
+if __name__ == "__main__":
+    path = publish_snapshot()
+    snap = Snapshot(path)
+    print(f"Published generation {snap.generation} ({len(snap)} records) to {path}")
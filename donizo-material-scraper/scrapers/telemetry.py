@@ -0,0 +1,228 @@
+"""
+telemetry.py
+Per-phase timing spans and counters for crawl runs.
+
+Phases (navigation, rate-limit waits, challenge waits, scrolling, extraction,
+discovery, save, matching) are timed with `span(...)` and aggregated per
+supplier; events such as pages, cards, items, errors and retries are tallied
+with `count(...)`. Gauges that change over the run (browser memory) are
+recorded as time series with `sample(...)`. At the end of a run
+`write_report()` stores everything as JSON under data/reports, and the API
+renders the latest report in Prometheus text format on /metrics.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from scrapers.snapshot import atomic_write
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+REPORTS_DIR = os.path.join(BASE_DIR, "data", "reports")
+LATEST_NAME = "latest.json"
+KEEP_REPORTS = 20
+METRIC_PREFIX = "donizo_crawl"
+# Points kept per series; beyond that every other point is dropped
+MAX_SAMPLES = 240
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+class Telemetry:
+    """Thread-safe span/counter aggregates for one crawl run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self.spans = {}
+            self.counters = {}
+            self.samples = {}
+
+    def record(self, name, seconds, **labels):
+        with self._lock:
+            stats = self.spans.setdefault(
+                _key(name, labels), {"calls": 0, "seconds": 0.0, "max_seconds": 0.0}
+            )
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block as phase `name` (recorded even on errors)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, **labels)
+
+    def count(self, name, n=1, **labels):
+        with self._lock:
+            key = _key(name, labels)
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def sample(self, name, value, **labels):
+        """Add a (seconds into the run, value) point to the series `name`."""
+        with self._lock:
+            series = self.samples.setdefault(
+                _key(name, labels), {"points": [], "max": value, "every": 1, "n": 0}
+            )
+            series["max"] = max(series["max"], value)
+            series["n"] += 1
+            if series["n"] % series["every"]:
+                return
+            offset = round(time.perf_counter() - self._started, 2)
+            series["points"].append([offset, value])
+            if len(series["points"]) > MAX_SAMPLES:
+                # Halve the resolution rather than grow without bound
+                series["points"] = series["points"][::2]
+                series["every"] *= 2
+
+    def merge(self, report):
+        """Fold in the spans and counters of another process's report."""
+        with self._lock:
+            for s in report["spans"]:
+                stats = self.spans.setdefault(
+                    _key(s["phase"], s["labels"]),
+                    {"calls": 0, "seconds": 0.0, "max_seconds": 0.0},
+                )
+                stats["calls"] += s["calls"]
+                stats["seconds"] += s["seconds"]
+                stats["max_seconds"] = max(stats["max_seconds"], s["max_seconds"])
+            for c in report["counters"]:
+                key = _key(c["name"], c["labels"])
+                self.counters[key] = self.counters.get(key, 0) + c["value"]
+            # Another process's offsets count from its own start
+            shift = report["started_at"] - self.started_at
+            for s in report.get("samples", []):
+                series = self.samples.setdefault(
+                    _key(s["name"], s["labels"]),
+                    {"points": [], "max": s["max"], "every": 1, "n": 0},
+                )
+                series["max"] = max(series["max"], s["max"])
+                series["points"] = sorted(
+                    series["points"]
+                    + [[round(t + shift, 2), v] for t, v in s["points"]]
+                )
+
+    def report(self, **extra):
+        with self._lock:
+            spans = [
+                dict(
+                    phase=name,
+                    labels=dict(labels),
+                    calls=s["calls"],
+                    seconds=round(s["seconds"], 4),
+                    max_seconds=round(s["max_seconds"], 4),
+                )
+                for (name, labels), s in sorted(self.spans.items())
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            samples = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "max": s["max"],
+                    "points": list(s["points"]),
+                }
+                for (name, labels), s in sorted(self.samples.items())
+            ]
+            report = {
+                "started_at": self.started_at,
+                "duration_seconds": round(time.perf_counter() - self._started, 3),
+                "pid": os.getpid(),
+                "spans": spans,
+                "counters": counters,
+                "samples": samples,
+            }
+        report.update(extra)
+        return report
+
+
+# One collector per process; the scrapers record into it directly
+telemetry = Telemetry()
+span = telemetry.span
+count = telemetry.count
+
+
+def write_report(extra=None, reports_dir=REPORTS_DIR):
+    """Store the current run as JSON and point latest.json at it."""
+    report = telemetry.report(**(extra or {}))
+    os.makedirs(reports_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(report["started_at"]))
+    name = f"run-{stamp}-{report['pid']}.json"
+    payload = json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8")
+    atomic_write(os.path.join(reports_dir, name), payload)
+    atomic_write(os.path.join(reports_dir, LATEST_NAME), payload)
+    reports = sorted(f for f in os.listdir(reports_dir) if f.startswith("run-"))
+    for old in reports[:-KEEP_REPORTS]:
+        os.remove(os.path.join(reports_dir, old))
+    return os.path.join(reports_dir, name)
+
+
+def load_latest_report(reports_dir=REPORTS_DIR):
+    try:
+        with open(os.path.join(reports_dir, LATEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def prometheus_text(report):
+    """Render a run report in the Prometheus text exposition format."""
+    lines = [
+        f"# TYPE {METRIC_PREFIX}_run_started_timestamp_seconds gauge",
+        f"{METRIC_PREFIX}_run_started_timestamp_seconds {report['started_at']}",
+        f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+        f"{METRIC_PREFIX}_run_duration_seconds {report['duration_seconds']}",
+    ]
+    phase_metrics = [
+        ("phase_seconds_total", "seconds", "counter"),
+        ("phase_calls_total", "calls", "counter"),
+        ("phase_max_seconds", "max_seconds", "gauge"),
+    ]
+    for metric, field, kind in phase_metrics:
+        lines.append(f"# TYPE {METRIC_PREFIX}_{metric} {kind}")
+        for s in report["spans"]:
+            labels = dict(s["labels"], phase=s["phase"])
+            lines.append(f"{METRIC_PREFIX}_{metric}{_labels_text(labels)} {s[field]}")
+    typed = set()
+    for c in report["counters"]:
+        metric = f"{METRIC_PREFIX}_{c['name']}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels_text(c['labels'])} {c['value']}")
+    gauges = {}
+    for s in report.get("samples", []):
+        if s["points"]:
+            labels = _labels_text(s["labels"])
+            metric = f"{METRIC_PREFIX}_{s['name']}"
+            gauges.setdefault(metric, []).append(f"{labels} {s['points'][-1][1]}")
+            gauges.setdefault(f"{metric}_max", []).append(f"{labels} {s['max']}")
+    for metric, values in gauges.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{value}" for value in values)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,196 @@
+"""
+units.py
+Pack sizes and measures as canonical quantities, and prices per unit.
+
+`unit` on a record is whatever fragment of the name a supplier's unit
+pattern matched ("42 cm", "Lot de 4", "x 2"), so a 1 L bottle and a 5 L
+can cannot be compared from it. The `unit_price` pipeline stage reads the
+detail-page pack quantity (with `--enrich`), the name and the unit, and
+stores a canonical quantity in L, kg, m², m or pieces, plus the price per
+one of those units:
+
+    "Lot de 6 bouteilles 1,5L" at 9,00 € -> 9.0 L, price_per_unit 1.0
+
+Dimensions ("39 x 30 x 23 cm") are ignored; a pack count multiplies the
+measure it comes with. Catalog snapshots index the price per unit by
+category and unit, which is what the API's /cheapest endpoint reads.
+"""
+
+import re
+
+UNITS = ("L", "kg", "m²", "m", "piece")
+UNIT_FIELDS = ("quantity", "quantity_unit", "price_per_unit")
+UNIT_ALIASES = {
+    "l": "L",
+    "litre": "L",
+    "liter": "L",
+    "kg": "kg",
+    "m2": "m²",
+    "m²": "m²",
+    "m": "m",
+    "piece": "piece",
+    "pieces": "piece",
+    "pièce": "piece",
+    "pc": "piece",
+    "pcs": "piece",
+}
+
+_NUMBER = r"(\d+(?:[.,]\d+)?)"
+# Measures in priority order: a name giving both a volume and a length
+# ("tondeuse 46cm ... 50L") is priced per litre. Bare "g" and "m" must be
+# lower case, so "4G" and model names like "MTF 84M" are not read as measures.
+MEASURES = (
+    ("L", re.compile(_NUMBER + r"\s?((?i:ml|cl|l|litres?))\b")),
+    ("kg", re.compile(_NUMBER + r"\s?((?i:kg)|gr?)\b")),
+    ("m²", re.compile(_NUMBER + r"\s?((?i:m²|m2))(?!\w)")),
+    ("m", re.compile(_NUMBER + r"\s?((?i:mm|cm)|m)\b")),
+)
+# A figure right after one of these describes the product, not what is sold:
+# "charge 120 kg", "bac de ramassage 40 l", "largeur de coupe 46 cm"
+CONTEXT_WORDS = (
+    "bac",
+    "capacité",
+    "charge",
+    "coupe",
+    "hauteur",
+    "jusqu",
+    "largeur",
+    "max",
+    "ramassage",
+    "surface",
+)
+CONTEXT_CHARS = 25
+FACTORS = {
+    "ml": 0.001,
+    "cl": 0.01,
+    "l": 1,
+    "litre": 1,
+    "litres": 1,
+    "g": 0.001,
+    "gr": 0.001,
+    "kg": 1,
+    "m²": 1,
+    "m2": 1,
+    "mm": 0.001,
+    "cm": 0.01,
+    "m": 1,
+}
+COUNTS = (
+    re.compile(r"\b(?:lot|pack|set|bo[iî]te|carton|sachet) de\s?(\d+)", re.I),
+    # "Pack 2 x 5L": a count times the measure that follows
+    re.compile(r"\b(\d+)\s?x\s?(?=\d)", re.I),
+    re.compile(r"(?<![\w.,])x\s?(\d+)\b", re.I),
+    re.compile(r"\b(\d+)\s?(?:pcs|pi[eè]ces?|unit[eé]s?)\b", re.I),
+)
+# "39 x 30 x 23 cm", "18x18m", "Ø4,57m x h1,22m", "160L x 80l x 75H cm"; but
+# not "Lot de 6 x 1,5L", a count times a measure (see `_dimensions`)
+_SIDE = r"(?:[hlpø]\.?\s?)?\d+(?:[.,]\d+)?\s?(?:mm|cm|m|[lhp](?![a-z]))?"
+DIMENSIONS = re.compile(_SIDE + r"(?:\s?x\s?" + _SIDE + r")+", re.I)
+SIDE = re.compile(
+    r"([hlpø]\.?\s?)?\d+(?:[.,]\d+)?\s?(mm|cm|m|[hp](?![a-z]))?", re.I
+)
+
+
+def parse_price(price):
+    """Parse a scraped price such as "1 299,90 €" or "17,90€" into a float."""
+    if price is None:
+        return None
+    if isinstance(price, (int, float)):
+        return float(price)
+    digits = re.sub(r"[^\d,.]", "", str(price))
+    if "," in digits:
+        # French format: "." or spaces group thousands, "," is the decimal mark
+        digits = digits.replace(".", "").replace(",", ".")
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+def canonical_unit(name):
+    """"litre", "m2", "pcs"... as one of UNITS, or None."""
+    key = (name or "").strip().lower()
+    return UNIT_ALIASES.get(key) or UNIT_ALIASES.get(key.rstrip("s"))
+
+
+def _number(text):
+    return float(text.replace(",", "."))
+
+
+def _dimensions(match):
+    """Blank a run of sides that describes a size, keep "2 x 5L" and the like.
+
+    A run is a size when it has three or more sides, when its last side
+    carries a length unit (which "39 x 30 cm" shares between all sides) or
+    when at least two sides look like lengths (a unit or an h/l/p/ø prefix).
+    """
+    parts = re.split(r"\s?x\s?", match.group(0), flags=re.I)
+    sides = [SIDE.match(part) for part in parts]
+    lengths = [bool(side and (side.group(1) or side.group(2))) for side in sides]
+    last = sides[-1]
+    if len(sides) >= 3 or sum(lengths) >= 2 or (last and last.group(2)):
+        return " "
+    return match.group(0)
+
+
+def parse_quantity(text):
+    """(quantity, unit) described by a name or pack size, or None."""
+    if not text:
+        return None
+    text = DIMENSIONS.sub(_dimensions, text)
+    count = None
+    for pattern in COUNTS:
+        match = pattern.search(text)
+        if match and int(match.group(1)) > 0:
+            count = int(match.group(1))
+            break
+    for unit, pattern in MEASURES:
+        values = []
+        for match in pattern.finditer(text):
+            before = text[max(0, match.start() - CONTEXT_CHARS) : match.start()]
+            if any(word in before.lower() for word in CONTEXT_WORDS):
+                continue
+            value = _number(match.group(1)) * FACTORS[match.group(2).lower()]
+            if value > 0:
+                values.append(value)
+        if values:
+            # "mini galets 20gr - 1,2Kg": the largest figure is the pack's
+            return round(max(values) * (count or 1), 6), unit
+    if count:
+        return count, "piece"
+    return None
+
+
+def record_quantity(record):
+    """(quantity, unit) of a record: detail-page pack size, then name, unit."""
+    for field in ("pack_quantity", "name", "unit"):
+        value = record.get(field)
+        quantity = parse_quantity(value) if isinstance(value, str) else None
+        if quantity:
+            return quantity
+    return None
+
+
+def price_per_unit(record):
+    """(price per unit, unit) of a record, from its stored fields if present."""
+    if record.get("price_per_unit") is not None and record.get("quantity_unit"):
+        return record["price_per_unit"], record["quantity_unit"]
+    price = parse_price(record.get("price"))
+    quantity = record_quantity(record)
+    if price is None or quantity is None:
+        return None
+    return round(price / quantity[0], 4), quantity[1]
+
+
+def unit_price(records):
+    """Pipeline stage: set quantity, quantity_unit and price_per_unit."""
+    for record in records:
+        for field in UNIT_FIELDS:
+            record.pop(field, None)
+        quantity = record_quantity(record)
+        price = parse_price(record.get("price"))
+        if quantity is not None:
+            record["quantity"], record["quantity_unit"] = quantity
+            if price is not None:
+                record["price_per_unit"] = round(price / quantity[0], 4)
+        yield record
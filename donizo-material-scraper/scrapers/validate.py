@@ -0,0 +1,161 @@
+"""
+validate.py
+Streaming scrape-quality checks, page by page.
+
+Every listing page's records are checked against the supplier's `quality`
+expectations from scraper_config.yaml as soon as the page is extracted:
+
+- fill: minimum share of records with each field set (placeholder `data:`
+  images count as empty)
+- min_price_parse_rate: share of prices `parse_price` can read
+- max_duplicate_rate: share of a page's products already seen in the
+  category (a pager stuck on the same page)
+- max_bad_pages: bad pages (including pages without any records) after
+  which the rest of the category is skipped
+
+A drifted selector therefore stops its category after a couple of pages
+instead of using up the crawl budget. Fill counts are tallied in the run
+telemetry and `quality_report` turns them into per-supplier, per-field
+fill rates for the run report.
+"""
+
+from scrapers.helpers import load_config
+from scrapers.pipeline import record_key
+from scrapers.telemetry import count
+from scrapers.units import parse_price
+
+FIELDS = ("name", "price", "url", "image_url", "brand", "unit")
+DEFAULT_QUALITY = {
+    "fill": {"name": 0.9, "price": 0.8, "url": 0.8},
+    "min_price_parse_rate": 0.8,
+    "max_duplicate_rate": 0.5,
+    "max_bad_pages": 2,
+}
+
+
+def filled(record, field):
+    value = record.get(field)
+    if field == "image_url" and isinstance(value, str):
+        # Lazy-loading placeholder, not a product image
+        return not value.startswith("data:")
+    return bool(value)
+
+
+def _quality(supplier_config):
+    quality = dict(DEFAULT_QUALITY, **(supplier_config.get("quality") or {}))
+    quality["fill"] = dict(quality.get("fill") or {})
+    return quality
+
+
+_expectations = {}
+
+
+def expectations_for(supplier_name):
+    """A supplier's quality expectations, merged over the defaults once."""
+    key = supplier_name.lower()
+    if key not in _expectations:
+        for supplier in load_config()["suppliers"]:
+            _expectations.setdefault(supplier["name"].lower(), _quality(supplier))
+        _expectations.setdefault(key, _quality({}))
+    return _expectations[key]
+
+
+class CategoryValidator:
+    """Checks the pages of one category as they arrive."""
+
+    def __init__(self, supplier_name, category_key, quality=None):
+        self.supplier = supplier_name
+        self.category_key = category_key
+        self.quality = quality or expectations_for(supplier_name)
+        self.bad_pages = 0
+        self._seen = set()
+
+    @property
+    def failed(self):
+        """Whether the category has had too many bad pages to carry on."""
+        return self.bad_pages >= self.quality["max_bad_pages"]
+
+    def problems(self, records):
+        """Problems with one page of records ([] for a good page).
+
+        An empty page is a problem too: a drifted product selector shows up
+        as a grid wait that times out and a page without records.
+        """
+        n = len(records)
+        if not n:
+            return ["no products"]
+        count("records_checked", n, supplier=self.supplier)
+        problems = []
+        for field in FIELDS:
+            k = sum(1 for r in records if filled(r, field))
+            count("fields_filled", k, supplier=self.supplier, field=field)
+            minimum = self.quality["fill"].get(field)
+            if minimum is not None and k / n < minimum:
+                problems.append(f"{field} filled on {k}/{n}")
+        parsed = sum(1 for r in records if parse_price(r.get("price")) is not None)
+        count("prices_parsed", parsed, supplier=self.supplier)
+        if parsed / n < self.quality["min_price_parse_rate"]:
+            problems.append(f"price parsed on {parsed}/{n}")
+        keys = [record_key(r) for r in records]
+        duplicates = sum(1 for key in keys if key in self._seen)
+        self._seen.update(keys)
+        count("duplicates", duplicates, supplier=self.supplier)
+        if duplicates / n > self.quality["max_duplicate_rate"]:
+            problems.append(f"{duplicates}/{n} products already seen")
+        return problems
+
+    def bad_page(self, problems, bad_pages):
+        """Report a bad page, the category's `bad_pages`-th one."""
+        self.bad_pages = bad_pages
+        count("bad_pages", supplier=self.supplier)
+        print(f"⚠️ Bad page in {self.category_key}: {'; '.join(problems)}")
+        if bad_pages == self.quality["max_bad_pages"]:
+            count("aborted_categories", supplier=self.supplier)
+            print(
+                f"🛑 Skipping the rest of {self.category_key} after "
+                f"{bad_pages} bad pages; check its selectors"
+            )
+
+    def check(self, records):
+        """Check a page and count it if it is bad; returns its problems."""
+        problems = self.problems(records)
+        if problems:
+            self.bad_page(problems, self.bad_pages + 1)
+        return problems
+
+
+def quality_report(report):
+    """Per-supplier fill rates and validation counts from a run report."""
+    totals = {}
+    for c in report.get("counters", []):
+        supplier = c["labels"].get("supplier")
+        if c["name"] == "fields_filled":
+            fields = totals.setdefault(supplier, {}).setdefault("filled", {})
+            fields[c["labels"]["field"]] = c["value"]
+        elif c["name"] in (
+            "records_checked",
+            "prices_parsed",
+            "duplicates",
+            "bad_pages",
+            "aborted_categories",
+        ):
+            totals.setdefault(supplier, {})[c["name"]] = c["value"]
+    quality = {}
+    for supplier, t in sorted(totals.items()):
+        n = t.get("records_checked", 0)
+        # A supplier whose every page failed still reports its bad pages
+        if not n and not t.get("bad_pages"):
+            continue
+        per = max(n, 1)
+        quality[supplier] = {
+            "records": n,
+            "fill_rates": {
+                field: round(t.get("filled", {}).get(field, 0) / per, 3)
+                for field in FIELDS
+            },
+            "price_parse_rate": round(t.get("prices_parsed", 0) / per, 3),
+            "duplicate_rate": round(t.get("duplicates", 0) / per, 3),
+            "bad_pages": t.get("bad_pages", 0),
+            "aborted_categories": t.get("aborted_categories", 0),
+        }
+    return quality
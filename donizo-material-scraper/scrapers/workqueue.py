@@ -0,0 +1,461 @@
+"""
+workqueue.py
+Durable local work queue for multi-process crawls (`main --workers N`).
+
+Every listing page is a unit of work (supplier, category, page URL, page
+number) in a SQLite file under data/queue. Worker processes, each with its
+own browser, lease one unit at a time while respecting a per-supplier cap on
+concurrent leases, store the page's records and enqueue the next page in
+one transaction. Units whose worker died are leased again once their lease
+expires (at-least-once); records are keyed by unit, so a page scraped twice
+is stored once. The parent merges every unit's records when the queue drains.
+
+Bad pages (scrapers/validate.py) are counted per category in the queue, so
+all workers share one count; a category that reaches its limit has its
+pending pages skipped. Why a category stopped short of its last page (its
+crawl limits, the page budget, an unchanged first page, bad pages) is kept
+next to that count, so the parent knows which categories were crawled in
+full once every one of their pages is done.
+"""
+
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+
+from scrapers.crawl_state import crawl_limits, fingerprint
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+QUEUE_PATH = os.path.join(BASE_DIR, "data", "queue", "crawl.sqlite")
+LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+IDLE_POLL = 1.0
+# Why a category stopped short of its last page, least to most serious
+STOP_REASONS = ("unchanged", "limit", "budget", "bad pages")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    supplier TEXT NOT NULL,
+    category_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    collected INTEGER NOT NULL DEFAULT 0,
+    context TEXT NOT NULL,
+    selectors TEXT NOT NULL,
+    known_fingerprint TEXT,
+    full_crawl INTEGER NOT NULL DEFAULT 1,
+    follow_next INTEGER NOT NULL DEFAULT 1,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    error TEXT,
+    UNIQUE (supplier, url)
+);
+CREATE TABLE IF NOT EXISTS results (
+    unit_id INTEGER PRIMARY KEY,
+    records TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    worker TEXT PRIMARY KEY,
+    report TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    supplier TEXT NOT NULL,
+    category_key TEXT NOT NULL,
+    bad_pages INTEGER NOT NULL DEFAULT 0,
+    stopped TEXT,
+    PRIMARY KEY (supplier, category_key)
+);
+"""
+
+
+def _category_key(value):
+    # Castorama keys are (primary, secondary, tertiary) tuples
+    value = json.loads(value)
+    return tuple(value) if isinstance(value, list) else value
+
+
+class WorkQueue:
+    def __init__(self, path=QUEUE_PATH, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit mode; writes take the lock with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def _write(self, fn):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn()
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return result
+
+    def put(self, supplier, category_key, url, context, selectors, **fields):
+        """Enqueue a page unless the same supplier URL is already queued."""
+        row = dict(
+            supplier=supplier,
+            category_key=json.dumps(category_key, ensure_ascii=False),
+            url=url,
+            page=fields.get("page", 1),
+            collected=fields.get("collected", 0),
+            context=json.dumps(context, ensure_ascii=False),
+            selectors=json.dumps(selectors),
+            known_fingerprint=fields.get("known_fingerprint"),
+            full_crawl=int(fields.get("full_crawl", True)),
+            follow_next=int(fields.get("follow_next", True)),
+        )
+        self._db.execute(
+            f"INSERT OR IGNORE INTO units ({', '.join(row)}) "
+            f"VALUES ({', '.join('?' * len(row))})",
+            list(row.values()),
+        )
+
+    def reset(self):
+        def reset():
+            for table in ("units", "results", "reports", "categories"):
+                self._db.execute(f"DELETE FROM {table}")
+            # Shared limiters (scrapers/ratelimit.py) start from the config
+            self._db.execute("DROP TABLE IF EXISTS limiters")
+
+        self._write(reset)
+
+    def claim(self, worker, caps):
+        """Lease the oldest runnable unit whose supplier is under its cap."""
+
+        def claim():
+            now = time.time()
+            # Leases that expired too often belong to pages that kill workers
+            self._db.execute(
+                "UPDATE units SET state = 'failed', error = 'lease expired'"
+                " WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, MAX_ATTEMPTS),
+            )
+            active = dict(
+                self._db.execute(
+                    "SELECT supplier, COUNT(*) FROM units"
+                    " WHERE state = 'leased' AND lease_until >= ? GROUP BY supplier",
+                    (now,),
+                ).fetchall()
+            )
+            rows = self._db.execute(
+                "SELECT * FROM units WHERE state = 'pending'"
+                " OR (state = 'leased' AND lease_until < ?) ORDER BY page, id",
+                (now,),
+            )
+            for row in rows:
+                if active.get(row["supplier"], 0) < caps.get(row["supplier"], 1):
+                    self._db.execute(
+                        "UPDATE units SET state = 'leased', lease_until = ?,"
+                        " worker = ?, attempts = attempts + 1 WHERE id = ?",
+                        (now + self.lease_seconds, worker, row["id"]),
+                    )
+                    return dict(row, attempts=row["attempts"] + 1)
+            return None
+
+        unit = self._write(claim)
+        if unit is not None:
+            unit["category_key"] = _category_key(unit["category_key"])
+            unit["context"] = json.loads(unit["context"])
+            unit["selectors"] = json.loads(unit["selectors"])
+        return unit
+
+    def complete(
+        self,
+        unit,
+        records,
+        next_units=(),
+        bad_page=False,
+        max_bad_pages=None,
+        stopped=None,
+    ):
+        """Store a page's records, enqueue the next page(s) and close the unit.
+
+        A `bad_page` is counted against the unit's category; once the category
+        has `max_bad_pages`, its pending pages are skipped and no more are
+        enqueued. `stopped` records why the category ends before its last
+        page. Returns the category's bad-page count.
+        """
+        category = (
+            unit["supplier"],
+            json.dumps(unit["category_key"], ensure_ascii=False),
+        )
+
+        def stop(reason):
+            row = self._db.execute(
+                "SELECT stopped FROM categories"
+                " WHERE supplier = ? AND category_key = ?",
+                category,
+            ).fetchone()
+            # Another worker's page may have stopped it for a graver reason
+            current = row[0] if row else None
+            if current and STOP_REASONS.index(current) >= STOP_REASONS.index(reason):
+                return
+            self._db.execute(
+                "INSERT INTO categories (supplier, category_key, stopped)"
+                " VALUES (?, ?, ?) ON CONFLICT (supplier, category_key)"
+                " DO UPDATE SET stopped = excluded.stopped",
+                category + (reason,),
+            )
+
+        def complete():
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (unit_id, records) VALUES (?, ?)",
+                (unit["id"], json.dumps(records, ensure_ascii=False)),
+            )
+            if stopped:
+                stop(stopped)
+            if bad_page:
+                self._db.execute(
+                    "INSERT INTO categories (supplier, category_key, bad_pages)"
+                    " VALUES (?, ?, 1) ON CONFLICT (supplier, category_key)"
+                    " DO UPDATE SET bad_pages = bad_pages + 1",
+                    category,
+                )
+            row = self._db.execute(
+                "SELECT bad_pages FROM categories"
+                " WHERE supplier = ? AND category_key = ?",
+                category,
+            ).fetchone()
+            bad_pages = row[0] if row else 0
+            if max_bad_pages is not None and bad_pages >= max_bad_pages:
+                # Pages already fanned out by other workers are cancelled too
+                stop("bad pages")
+                self._db.execute(
+                    "UPDATE units SET state = 'skipped', error = 'bad pages'"
+                    " WHERE supplier = ? AND category_key = ? AND state = 'pending'",
+                    category,
+                )
+            else:
+                for follow in next_units:
+                    self.put(**follow)
+            self._db.execute(
+                "UPDATE units SET state = 'done', error = NULL WHERE id = ?",
+                (unit["id"],),
+            )
+            return bad_pages
+
+        return self._write(complete)
+
+    def fail(self, unit, error, max_attempts=MAX_ATTEMPTS):
+        state = "failed" if unit["attempts"] >= max_attempts else "pending"
+        self._db.execute(
+            "UPDATE units SET state = ?, error = ?, lease_until = 0 WHERE id = ?",
+            (state, str(error)[:500], unit["id"]),
+        )
+        return state
+
+    def save_report(self, worker, report):
+        self._db.execute(
+            "INSERT OR REPLACE INTO reports (worker, report) VALUES (?, ?)",
+            (worker, json.dumps(report)),
+        )
+
+    def reports(self):
+        rows = self._db.execute("SELECT report FROM reports")
+        return [json.loads(r[0]) for r in rows]
+
+    def counts(self):
+        return dict(
+            self._db.execute("SELECT state, COUNT(*) FROM units GROUP BY state")
+        )
+
+    def unfinished(self):
+        counts = self.counts()
+        return counts.get("pending", 0) + counts.get("leased", 0)
+
+    def iter_merged(self):
+        """Yield the records of every completed page, in queue order."""
+        rows = self._db.execute(
+            "SELECT results.records FROM results JOIN units"
+            " ON units.id = results.unit_id ORDER BY units.id"
+        )
+        for (records,) in rows:
+            yield from json.loads(records)
+
+    def first_pages(self):
+        """(supplier, category key, page 1 records) of every completed category."""
+        rows = self._db.execute(
+            "SELECT units.supplier, units.category_key, results.records"
+            " FROM units JOIN results ON units.id = results.unit_id"
+            " WHERE units.page = 1"
+        )
+        return [
+            (supplier, _category_key(key), json.loads(records))
+            for supplier, key, records in rows
+        ]
+
+    def finished_categories(self):
+        """{(supplier, category key): why it stopped short or None} of the
+        categories whose every page is done."""
+        rows = self._db.execute(
+            "SELECT units.supplier, units.category_key, categories.stopped"
+            " FROM units LEFT JOIN categories"
+            " ON categories.supplier = units.supplier"
+            " AND categories.category_key = units.category_key"
+            " GROUP BY units.supplier, units.category_key"
+            " HAVING SUM(units.state != 'done') = 0"
+        )
+        return {
+            (supplier, _category_key(key)): stopped for supplier, key, stopped in rows
+        }
+
+    def close(self):
+        self._db.close()
+
+
+def next_units(unit, records, next_url, total=None, page_budget=0, pages_done=0):
+    """(units for the following page(s), why the category stops short or None).
+
+    The units are [] when the category is done. From page 1 of a supplier
+    with a page URL template and a readable page count, every remaining page
+    is enqueued at once so workers fetch them in parallel; otherwise
+    pagination follows the next link page by page.
+    """
+    from scrapers.common import page_url
+
+    product_limit, page_limit = crawl_limits(unit["supplier"])
+    collected = unit["collected"] + len(records)
+    more = bool(next_url and unit["follow_next"]) or bool(
+        unit["page"] == 1 and total and total > 1
+    )
+    if collected >= product_limit or unit["page"] >= page_limit:
+        return [], "limit" if more else None
+    if page_budget and pages_done >= page_budget:
+        return [], "budget" if more else None
+    if unit["page"] == 1 and not unit["full_crawl"]:
+        if fingerprint(records) == unit["known_fingerprint"]:
+            print(f"⏭️ {unit['category_key']}: first page unchanged, not paginating")
+            return [], "unchanged"
+    follow = dict(
+        supplier=unit["supplier"],
+        category_key=unit["category_key"],
+        context=unit["context"],
+        selectors=unit["selectors"],
+    )
+    if unit["page"] == 1 and total and page_url(unit["url"], unit["supplier"], 2):
+        per_page = max(len(records), 1)
+        last = min(total, page_limit, math.ceil(product_limit / per_page))
+        stopped = "limit" if last < total else None
+        if page_budget and last > page_budget - pages_done + 1:
+            last = page_budget - pages_done + 1
+            stopped = "budget"
+        units = [
+            dict(
+                follow,
+                url=page_url(unit["url"], unit["supplier"], n),
+                page=n,
+                # Pages are fetched side by side; assume full pages before them
+                collected=per_page * (n - 1),
+                follow_next=False,
+            )
+            for n in range(2, last + 1)
+        ]
+        return units, stopped
+    if not next_url or not unit["follow_next"]:
+        return [], None
+    page = dict(follow, url=next_url, page=unit["page"] + 1, collected=collected)
+    return [page], None
+
+
+def run_worker(path, caps, page_budget=0):
+    """Worker process: lease pages and scrape them until the queue drains."""
+    from playwright.sync_api import sync_playwright
+
+    from scrapers.browser import ManagedBrowser
+    from scrapers.common import scrape_page
+    from scrapers.helpers import load_env
+    from scrapers.ratelimit import BlockedError, limiter_for, share_limiters
+    from scrapers.telemetry import count, telemetry
+    from scrapers.validate import CategoryValidator
+
+    load_env()
+    telemetry.reset()
+    # One pace per supplier across all workers, kept in the queue file
+    share_limiters(path)
+    worker = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    queue = WorkQueue(path)
+    # Page checks (fill rates, duplicates) of the categories seen here
+    validators = {}
+    with sync_playwright() as p:
+        browser = ManagedBrowser(p, "worker")
+        while True:
+            unit = queue.claim(worker, caps)
+            if unit is None:
+                if not queue.unfinished():
+                    break
+                # Other workers hold the remaining units (or the supplier caps)
+                time.sleep(IDLE_POLL)
+                continue
+            supplier = unit["context"]
+            product_limit, _ = crawl_limits(supplier["name"])
+            print(f"[worker {worker}] {unit['category_key']} page {unit['page']}")
+            try:
+                records, next_url, total = scrape_page(
+                    browser,
+                    supplier,
+                    unit["category_key"],
+                    unit["url"],
+                    unit["selectors"],
+                    product_limit - unit["collected"],
+                    page_number=unit["page"],
+                )
+            except Exception as e:
+                if not isinstance(e, BlockedError):
+                    # navigate counted the blocks behind a BlockedError
+                    count("errors", supplier=supplier["name"])
+                if queue.fail(unit, e) == "pending":
+                    count("retries", supplier=supplier["name"])
+                    limiter_for(supplier["name"]).on_block(
+                        f"page {unit['page']} of {unit['category_key']} failed"
+                    )
+                else:
+                    print(f"Error scraping {unit['category_key']}: {e}")
+                continue
+            pages_done = queue.counts().get("done", 0) + 1
+            follow, stopped = next_units(
+                unit, records, next_url, total, page_budget, pages_done
+            )
+            key = (supplier["name"], unit["category_key"])
+            if key not in validators:
+                validators[key] = CategoryValidator(*key)
+            validator = validators[key]
+            problems = validator.problems(records)
+            # The bad-page count lives in the queue, shared by every worker
+            bad_pages = queue.complete(
+                unit,
+                records,
+                follow,
+                bad_page=bool(problems),
+                max_bad_pages=validator.quality["max_bad_pages"],
+                stopped=stopped,
+            )
+            if problems:
+                validator.bad_page(problems, bad_pages)
+        browser.close()
+    queue.save_report(worker, telemetry.report())
+    queue.close()
+
+
+def run_workers(path, workers, caps, page_budget=0):
+    """Start `workers` processes on the queue at `path` and wait for them."""
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=run_worker, args=(path, caps, page_budget))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
@@ -1,15 +1,42 @@
 import streamlit as st
+import os
 import json
 from pathlib import Path
 import random
 from collections import defaultdict
 import difflib
-import spacy
+import subprocess
+import sys
+import time
+
+from scrapers.catalog import Catalog
+from scrapers.compare_prices import load_nlp, nlp_missing
+from scrapers.match import (
+    MATCHES_DIR,
+    describe_stats,
+    filter_groups,
+    latest_matches_path,
+)
+from scrapers.nlp_cache import NlpCache
+
+APP_START = time.perf_counter()
+PAGE_SIZES = [12, 24, 48]
 
 # Load data
 data_path = Path(__file__).parent / "data" / "materials.json"
-with open(data_path, encoding="utf-8") as f:
-    materials = json.load(f)
+
+
+def dataset_version():
+    # Changes whenever a crawl rewrites materials.json
+    stat = os.stat(data_path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@st.cache_resource
+def load_materials(version):
+    # Shared read-only across reruns/sessions; cache_data would copy it each run.
+    # Compact records; only the products on screen are turned back into dicts.
+    return Catalog.load(data_path)
 
 
 # Helper: filter valid category names
@@ -25,21 +52,88 @@ def words(text):
     return set(normalize(text).split())
 
 
-# Get all unique, proper categories and suppliers (handle string or list for category)
-all_categories = set()
-for item in materials:
-    cats = item.get("category", [])
-    if isinstance(cats, str):
-        cats = [cats]
-    if isinstance(cats, list):
-        for cat in cats:
-            if valid_category(cat):
-                all_categories.add(cat.strip())
-all_categories = sorted(all_categories)
-
-all_suppliers = sorted(
-    {item.get("supplier", "") for item in materials if item.get("supplier")}
-)
+@st.cache_data
+def build_browse_index(version):
+    """Category/supplier -> record ids, plus the option lists for the sidebar."""
+    by_category = defaultdict(list)
+    by_supplier = defaultdict(list)
+    all_categories = set()
+    materials = load_materials(version)
+    # Walk the distinct category paths rather than every record's fields
+    for cat_id, ids in materials.ids_by_category_id().items():
+        cats = materials.categories.fields(cat_id).get("category") or []
+        if isinstance(cats, str):
+            cats = [cats]
+        if isinstance(cats, list):
+            for cat in cats:
+                if isinstance(cat, str):
+                    by_category[cat].extend(ids)
+                if valid_category(cat):
+                    all_categories.add(cat.strip())
+    for idx, record in enumerate(materials.records):
+        if record.supplier:
+            by_supplier[record.supplier].append(idx)
+    return {
+        "categories": sorted(all_categories),
+        "suppliers": sorted(by_supplier),
+        "by_category": {cat: sorted(ids) for cat, ids in by_category.items()},
+        "by_supplier": dict(by_supplier),
+        "count": len(materials),
+    }
+
+
+@st.cache_data
+def browse_page(version, category, supplier, page, page_size):
+    """Total matches and the records of one page for the given filters."""
+    index = build_browse_index(version)
+    ids = None
+    if category != "All":
+        ids = index["by_category"].get(category, [])
+    if supplier != "All":
+        supplier_ids = index["by_supplier"].get(supplier, [])
+        ids = supplier_ids if ids is None else sorted(set(ids) & set(supplier_ids))
+    if ids is None:
+        ids = range(index["count"])
+    materials = load_materials(version)
+    start = page * page_size
+    return len(ids), [materials[i] for i in ids[start : start + page_size]]
+
+
+def card_html(item):
+    html = '<div class="ecom-card">'
+    if item.get("image_url"):
+        html += f'<img src="{item["image_url"]}" width="180" style="margin-bottom:8px;"/>'
+    html += f'<div class="ecom-title">{item.get("name", "")}</div>'
+    if item.get("price"):
+        html += f'<div class="ecom-price">{item["price"]}</div>'
+    if item.get("supplier"):
+        html += f'<span class="ecom-badge">{item["supplier"]}</span>'
+    # Show only non-empty scraped fields except image_url, name, price, supplier
+    field_html = ""
+    for key, value in item.items():
+        if key in [
+            "image_url",
+            "name",
+            "price",
+            "supplier",
+            "price_value",
+            "norm_name",
+            "norm_category",
+        ]:
+            continue
+        if value is None or value == "" or value == []:
+            continue
+        field_html += f"<div><strong>{key}:</strong> {value}</div>"
+    if field_html:
+        html += f'<div class="ecom-fields">{field_html}</div>'
+    html += "</div>"
+    return html
+
+
+version = dataset_version()
+browse_index = build_browse_index(version)
+all_categories = browse_index["categories"]
+all_suppliers = browse_index["suppliers"]
 
 st.title("Donizo Materials Explorer")
 
@@ -64,28 +158,21 @@ with tabs[0]:
             unsafe_allow_html=True,
         )
 
-    # Filter data
-    filtered = materials
-    if category != "All":
-        filtered = [
-            item
-            for item in filtered
-            if (
-                (
-                    isinstance(item.get("category", []), list)
-                    and category in item.get("category", [])
-                )
-                or (
-                    isinstance(item.get("category", []), str)
-                    and category == item.get("category", [])
-                )
-            )
-        ]
-    if supplier != "All":
-        filtered = [item for item in filtered if item.get("supplier") == supplier]
+    # Only the visible page of the filtered ids is materialized and rendered
+    page_size = st.sidebar.selectbox("Products per page", PAGE_SIZES, index=1)
+    total, _ = browse_page(version, category, supplier, 0, page_size)
+    n_pages = max(1, -(-total // page_size))
+    page = st.number_input(
+        f"Page (of {n_pages})",
+        min_value=1,
+        max_value=n_pages,
+        value=1,
+        key=f"page-{category}-{supplier}-{page_size}",
+    )
+    _, page_items = browse_page(version, category, supplier, page - 1, page_size)
 
     st.write(
-        f"Showing {len(filtered)} products in category: {category}, supplier: {supplier}"
+        f"Showing {len(page_items)} of {total} products in category: {category}, supplier: {supplier}"
     )
 
     # Set max width for the main content area
@@ -146,182 +233,139 @@ with tabs[0]:
 
     # Display products in a grid (3 per row), e-commerce style
     cols = st.columns(3)
-    for idx, item in enumerate(filtered):
+    for idx, item in enumerate(page_items):
         with cols[idx % 3]:
-            card_html = '<div class="ecom-card">'
-            if item.get("image_url"):
-                card_html += f'<img src="{item["image_url"]}" width="180" style="margin-bottom:8px;"/>'
-            card_html += f'<div class="ecom-title">{item.get("name", "")}</div>'
-            if item.get("price"):
-                card_html += f'<div class="ecom-price">{item["price"]}</div>'
-            if item.get("supplier"):
-                card_html += f'<span class="ecom-badge">{item["supplier"]}</span>'
-            # Show only non-empty fields except image_url, name, price, supplier
-            field_html = ""
-            for key, value in item.items():
-                if key in ["image_url", "name", "price", "supplier"]:
-                    continue
-                if value is None or value == "" or value == []:
-                    continue
-                field_html += f"<div><strong>{key}:</strong> {value}</div>"
-            if field_html:
-                card_html += f'<div class="ecom-fields">{field_html}</div>'
-            card_html += "</div>"
-            st.markdown(card_html, unsafe_allow_html=True)
+            st.markdown(card_html(item), unsafe_allow_html=True)
 
 
+# spaCy is only loaded the first time a keyword filter needs it (to
+# lemmatize the keyword), so the Browse tab renders without paying for it.
 @st.cache_resource
 def get_nlp():
-    return spacy.load("fr_core_news_md")  # Use medium model for better similarity
+    return load_nlp()  # Medium model for similarity, without parser/NER
 
 
-nlp = get_nlp()
+@st.cache_resource
+def get_nlp_cache():
+    # Lemmas and vectors persist on disk across reruns and app restarts
+    return NlpCache(get_nlp())
 
 
 def spacy_normalize(text):
-    doc = nlp(text.lower())
-    tokens = [token.lemma_ for token in doc if not token.is_stop and not token.is_punct]
-    return " ".join(tokens)
+    # Without spaCy the filter matches the plain lower-cased keyword
+    if nlp_missing():
+        return text.lower()
+    return get_nlp_cache().lemmas([text])[0]
+
 
+@st.cache_resource
+def matching_job():
+    # One background matching run at a time, shared by every session
+    return {"process": None, "started": None}
+
+
+def start_matching():
+    """Run `python -m scrapers.match` in the background, logging to a file."""
+    job = matching_job()
+    if job["process"] is not None and job["process"].poll() is None:
+        return False
+    os.makedirs(MATCHES_DIR, exist_ok=True)
+    with open(os.path.join(MATCHES_DIR, "match.log"), "w", encoding="utf-8") as log:
+        job["process"] = subprocess.Popen(
+            [sys.executable, "-m", "scrapers.match"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    job["started"] = time.time()
+    return True
 
-def spacy_similarity(text1, text2):
-    if not text1.strip() or not text2.strip():
-        return 0.0
-    doc1 = nlp(text1)
-    doc2 = nlp(text2)
-    return doc1.similarity(doc2)
+
+@st.cache_data
+def get_match_artifact(path, mtime):
+    # Keyed on the artifact path/mtime so a new matching run is picked up
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
 
 
 with tabs[1]:
     st.header("Compare Prices Across Suppliers")
     st.write(
-        "Products available from multiple suppliers (using spaCy NLP on name and all category fields) are shown below. In production this would be tokenized and processed via a vector database."
+        "Products available from multiple suppliers are shown below: offers sharing a GTIN/EAN are joined exactly, the rest by spaCy NLP similarity on name and all category fields. Groups are computed offline by `python -m scrapers.match` after each crawl; this tab only loads and filters them."
     )
 
     filter_keyword = st.text_input(
-        "Enter a keyword to filter products for debug (e.g., 'spa', 'piscine', 'bain'):",
-        value="spa",
+        "Enter a keyword to filter groups (e.g., 'spa', 'piscine', 'bain'):",
+        value="",
     )
-    norm_filter_keyword = spacy_normalize(filter_keyword)
+    norm_filter_keyword = spacy_normalize(filter_keyword) if filter_keyword else ""
     show_debug = st.checkbox("Show debug info", value=False)
-    compare_clicked = st.button("Compare")
-
-    if compare_clicked:
-        with st.spinner("Comparing products across suppliers..."):
-            # Build a list of (norm_name, norm_category, item) using all category fields
-            product_tuples = []
-            for item in materials:
-                name = item.get("name", "")
-                cats = item.get("category", [])
-                if isinstance(cats, str):
-                    cats = [cats]
-                for cat_field in [
-                    "category_primary",
-                    "category_secondary",
-                    "category_tertiary",
-                ]:
-                    cat_val = item.get(cat_field)
-                    if cat_val and isinstance(cat_val, str):
-                        cats.append(cat_val)
-                cat_str = " ".join(
-                    sorted(set([str(cat) for cat in cats if isinstance(cat, str)]))
-                )
-                norm_name = spacy_normalize(name)
-                norm_cat = spacy_normalize(cat_str)
-                product_tuples.append((norm_name, norm_cat, item))
-
-            # Debug output (optional)
-            if show_debug:
-                st.markdown(
-                    f"**Debug: Normalized names and categories for products containing '{filter_keyword}':**"
-                )
-                for norm_name, norm_cat, item in product_tuples:
-                    orig_name = item.get("name", "")
-                    orig_cats = item.get("category", [])
-                    if isinstance(orig_cats, str):
-                        orig_cats = [orig_cats]
-                    all_cats = orig_cats + [
-                        item.get(f, "")
-                        for f in [
-                            "category_primary",
-                            "category_secondary",
-                            "category_tertiary",
-                        ]
-                    ]
-                    all_cats_str = " ".join([str(c) for c in all_cats if c])
-                    # Use normalized keyword for matching
-                    if (
-                        norm_filter_keyword in norm_name
-                        or norm_filter_keyword in norm_cat
-                    ):
-                        st.write(f"Supplier: {item.get('supplier','')}")
-                        st.write(f"Original Name: {orig_name}")
-                        st.write(f"Normalized Name: {norm_name}")
-                        st.write(f"All Categories: {all_cats_str}")
-                        st.write(f"Normalized Categories: {norm_cat}")
-                        st.write("---")
-
-            # Group by spaCy similarity (lowered thresholds)
-            groups = []
-            used = set()
-            for i, (name1, cat1, item1) in enumerate(product_tuples):
-                if i in used:
-                    continue
-                group = [item1]
-                used.add(i)
-                for j, (name2, cat2, item2) in enumerate(product_tuples):
-                    if j == i or j in used:
-                        continue
-                    # Lowered thresholds for more flexible matching
-                    name_sim = spacy_similarity(name1, name2)
-                    cat_sim = spacy_similarity(cat1, cat2)
-                    if name_sim > 0.6 and cat_sim > 0.5:
-                        group.append(item2)
-                        used.add(j)
-                if len({g["supplier"] for g in group}) > 1:
-                    groups.append(group)
-
-            # Results display: use e-commerce card style for each product in group
-            if not groups:
-                st.info("No matching products found across suppliers.")
-            else:
-                for group in groups:
-                    st.subheader(group[0]["name"])
-                    # Display in rows of 3 cards per row
-                    for row_start in range(0, len(group), 3):
-                        row_items = group[row_start : row_start + 3]
-                        cols = st.columns(len(row_items))
-                        for idx, item in enumerate(row_items):
-                            with cols[idx]:
-                                card_html = '<div class="ecom-card">'
-                                if item.get("image_url"):
-                                    card_html += f'<img src="{item["image_url"]}" width="180" style="margin-bottom:8px;"/>'
-                                card_html += f'<div class="ecom-title">{item.get("name", "")}</div>'
-                                if item.get("price"):
-                                    card_html += (
-                                        f'<div class="ecom-price">{item["price"]}</div>'
-                                    )
-                                if item.get("supplier"):
-                                    card_html += f'<span class="ecom-badge">{item["supplier"]}</span>'
-                                # Show only non-empty fields except image_url, name, price, supplier
-                                field_html = ""
-                                for key, value in item.items():
-                                    if key in [
-                                        "image_url",
-                                        "name",
-                                        "price",
-                                        "supplier",
-                                    ]:
-                                        continue
-                                    if value is None or value == "" or value == []:
-                                        continue
-                                    field_html += (
-                                        f"<div><strong>{key}:</strong> {value}</div>"
-                                    )
-                                if field_html:
-                                    card_html += (
-                                        f'<div class="ecom-fields">{field_html}</div>'
-                                    )
-                                card_html += "</div>"
-                                st.markdown(card_html, unsafe_allow_html=True)
-                    st.markdown("---")
+    compare_clicked = st.button("Recompute matches")
+
+    if compare_clicked and not start_matching():
+        st.info("Matching is already running.")
+    job = matching_job()
+    if job["process"] is not None:
+        code = job["process"].poll()
+        if code is None:
+            st.info(
+                f"Matching has been running in the background for {time.time() - job['started']:.0f}s; rerun the page to load its results."
+            )
+        elif code != 0:
+            st.error(
+                f"The last matching run failed (exit code {code}); see {os.path.join(MATCHES_DIR, 'match.log')}."
+            )
+
+    artifact_path = latest_matches_path()
+    if artifact_path is None or not os.path.exists(artifact_path):
+        st.info(
+            "No match artifact yet. Run `python -m scrapers.match` or click Recompute matches."
+        )
+        groups = []
+    else:
+        artifact = get_match_artifact(
+            artifact_path, os.path.getmtime(artifact_path)
+        )
+        groups = filter_groups(
+            artifact["groups"], filter_keyword, norm_filter_keyword
+        )
+        st.caption(
+            f"Match artifact {artifact['version']}: {len(artifact['groups'])} groups over {artifact['catalog_size']} products"
+        )
+        if artifact.get("match_stats"):
+            st.caption(describe_stats(artifact["match_stats"]))
+
+        # Debug output (optional)
+        if show_debug:
+            st.markdown("**Debug: Normalized names and categories of grouped products:**")
+            for group in groups:
+                for item in group["products"]:
+                    st.write(f"Supplier: {item.get('supplier','')}")
+                    st.write(f"Original Name: {item.get('name', '')}")
+                    st.write(f"Normalized Name: {item['norm_name']}")
+                    st.write(f"Normalized Categories: {item['norm_category']}")
+                    st.write("---")
+
+        # Results display: use e-commerce card style for each product in group
+        if not groups:
+            st.info("No matching products found across suppliers.")
+        else:
+            for group in groups:
+                st.subheader(group["name"])
+                if group.get("match") == "gtin":
+                    st.caption(f"Matched by GTIN {group['gtin']}")
+                if group["spread"] is not None:
+                    st.write(
+                        f"Price range: {group['price_min']:.2f} € – {group['price_max']:.2f} € (spread {group['spread']:.2f} €)"
+                    )
+                # Display in rows of 3 cards per row
+                for row_start in range(0, len(group["products"]), 3):
+                    row_items = group["products"][row_start : row_start + 3]
+                    cols = st.columns(len(row_items))
+                    for idx, item in enumerate(row_items):
+                        with cols[idx]:
+                            st.markdown(card_html(item), unsafe_allow_html=True)
+                st.markdown("---")
+
+# Startup timing report: script run time for this rerun (first run = first render)
+st.sidebar.caption(f"Rendered in {time.perf_counter() - APP_START:.2f}s")
@@ -0,0 +1,163 @@
+"""
+legacy_attributes.py
+Reference for the attributes stage: the brand/unit inference that ran per card
+in scrape_category before it moved to config, kept verbatim. Shared by
+tests/test_attributes.py and benchmarks/attribute_inference.py.
+"""
+
+import re
+
+
+def legacy_brand(name):
+    # Verbatim from the old per-card loop in scrape_category (Castorama)
+    generic_words = [
+        "plastique",
+        "bois",
+        "acier",
+        "métal",
+        "metal",
+        "verre",
+        "alu",
+        "aluminium",
+        "inox",
+        "pvc",
+        "cuivre",
+        "laiton",
+        "béton",
+        "beton",
+        "céramique",
+        "ceramique",
+        "résine",
+        "resine",
+        "polypropylène",
+        "polypropylene",
+        "polyéthylène",
+        "polyethylene",
+        "caoutchouc",
+        "papier",
+        "carton",
+        "tissu",
+        "coton",
+        "laine",
+        "soie",
+        "nylon",
+        "polyester",
+        "polyamide",
+        "polyuréthane",
+        "polyurethane",
+        "liège",
+        "bambou",
+        "osier",
+        "rotin",
+        "chanvre",
+        "jute",
+        "lin",
+        "sisal",
+        "coco",
+        "peau",
+        "cuir",
+        "fourrure",
+        "laqué",
+        "laque",
+        "émaillé",
+        "emaille",
+        "fonte",
+        "granit",
+        "marbre",
+        "pierre",
+        "ardoise",
+        "terre",
+        "terre-cuite",
+        "terre cuite",
+        "porcelaine",
+        "argile",
+        "silicone",
+        "graphite",
+        "carbone",
+        "chrome",
+        "zinc",
+        "titane",
+        "plomb",
+        "argent",
+        "or",
+        "bronze",
+        "étain",
+        "etain",
+        "plastics",
+        "wood",
+        "steel",
+        "glass",
+        "iron",
+        "copper",
+        "brass",
+        "concrete",
+        "ceramic",
+        "resin",
+        "rubber",
+        "paper",
+        "cardboard",
+        "fabric",
+        "cotton",
+        "wool",
+        "silk",
+        "nylon",
+        "polyester",
+        "polyamide",
+        "polyurethane",
+        "cork",
+        "bamboo",
+        "rattan",
+        "hemp",
+        "jute",
+        "linen",
+        "sisal",
+        "coconut",
+        "skin",
+        "leather",
+        "fur",
+        "lacquered",
+        "enameled",
+        "cast",
+        "granite",
+        "marble",
+        "stone",
+        "slate",
+        "clay",
+        "porcelain",
+        "silicon",
+        "graphite",
+        "carbon",
+        "chrome",
+        "zinc",
+        "titanium",
+        "lead",
+        "silver",
+        "gold",
+        "bronze",
+        "tin",
+    ]
+    first_word = name.split()[0].lower()
+    if first_word not in generic_words:
+        brand = name.split()[0]
+    else:
+        brand = None
+    return brand
+
+
+def legacy_unit(name):
+    # Verbatim from the old per-card loop in scrape_category (ManoMano)
+    unit_patterns = [
+        r"\b\d+\s?(cm|m|pcs|places|personnes|L|kg|ml|mm)\b",
+        r"\b(lot de|lot)\s*\d+",
+        r"\bx\s?\d+",
+        r"\b\d+\s?pi[eè]ces?\b",
+    ]
+    unit = None
+    if name:
+        for pat in unit_patterns:
+            match = re.search(pat, name, re.IGNORECASE)
+            if match:
+                unit = match.group(0)
+                break
+    return unit
+
@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+from legacy_attributes import legacy_brand, legacy_unit
+from scrapers.attributes import rules_for
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "materials.json")
+
+# (name, brand, unit) as the old per-card inference in scrape_category gave
+# them: Castorama brands from the first word unless it is a generic material,
+# ManoMano units from the first matching pattern
+LEGACY_CASES = [
+    ("Liquide clarifiant pour Spa Bayrol 1L", "Liquide", "1L"),
+    ("Granulés Ph moins Spa Time 1,5 kg Bayrol", "Granulés", "5 kg"),
+    ("Éponges Absorbantes pour Spa Bayrol en Pack", "Éponges", None),
+    ("Nettoyeur Spa à Batterie Intex h.127cm", "Nettoyeur", "127cm"),
+    ("Appui-tête Intex PureSpa 39 x 30 x 23 cm", "Appui-tête", "23 cm"),
+    ("Lot de 2 cartouches de filtration Bestway Type VI", "Lot", "Lot de 2"),
+    ("Spa portable OCTOPUS NetSpa 6 Places - Octopus seul", "Spa", "6 Places"),
+    ("RIVIERA - Salon de jardin encastrable 12 places", "RIVIERA", "12 places"),
+    ("Acier galvanisé poteau 2 m", None, "2 m"),
+    ("Résine tressée fauteuil x 4", None, "x 4"),
+    ("Bois flotté", None, None),
+]
+
+
+def test_config_rules_match_legacy_inference():
+    names = [name for name, _, _ in LEGACY_CASES]
+    castorama = rules_for("Castorama").apply(
+        [{"name": name, "brand": None, "unit": None} for name in names]
+    )
+    manomano = rules_for("ManoMano").apply(
+        [{"name": name, "brand": None, "unit": None} for name in names]
+    )
+    assert [r["brand"] for r in castorama] == [brand for _, brand, _ in LEGACY_CASES]
+    assert [r["unit"] for r in castorama] == [None] * len(names)
+    assert [r["unit"] for r in manomano] == [unit for _, _, unit in LEGACY_CASES]
+    assert [r["brand"] for r in manomano] == [None] * len(names)
+
+
+def test_config_rules_match_legacy_inference_on_every_name():
+    if not os.path.exists(DATA_PATH):
+        pytest.skip("No data file yet")
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        names = [item["name"] for item in json.load(f) if item.get("name")]
+    castorama = rules_for("Castorama").apply(
+        [{"name": name, "brand": None} for name in names]
+    )
+    manomano = rules_for("ManoMano").apply(
+        [{"name": name, "unit": None} for name in names]
+    )
+    assert [r["brand"] for r in castorama] == [legacy_brand(n) for n in names]
+    assert [r["unit"] for r in manomano] == [legacy_unit(n) for n in names]
+
+
+def test_scraped_brand_is_kept():
+    records = [{"name": "Bois flotté", "brand": None}, {"name": "Acier", "brand": "X"}]
+    rules_for("Castorama").apply(records)
+    assert [r["brand"] for r in records] == [None, "X"]
@@ -0,0 +1,105 @@
+import os
+
+from scrapers import browser as browser_module
+from scrapers.browser import ManagedBrowser, memory_summary, page_due, process_rss
+from scrapers.telemetry import Telemetry, prometheus_text, telemetry
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.contexts = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self, **kwargs):
+        self.contexts += 1
+        return object()
+
+    def close(self):
+        self.connected = False
+
+
+class FakePage:
+    def __init__(self, heap):
+        self.heap = heap
+
+    def evaluate(self, script):
+        return self.heap
+
+
+def launches(monkeypatch):
+    launched = []
+
+    def launch(p):
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    monkeypatch.setattr(browser_module, "launch_browser", launch)
+    return launched
+
+
+def test_browser_is_recycled_after_max_navigations(monkeypatch):
+    launched = launches(monkeypatch)
+    managed = ManagedBrowser(None, "test", max_navigations=3)
+    for _ in range(7):
+        managed.new_context()
+    assert [b.contexts for b in launched] == [3, 3, 1]
+    assert not launched[0].is_connected()
+
+
+def test_crashed_browser_is_relaunched(monkeypatch):
+    launched = launches(monkeypatch)
+    managed = ManagedBrowser(None, "test")
+    managed.new_context()
+    launched[0].connected = False  # renderer/browser crash
+    assert not managed.is_connected()
+    managed.new_context()
+    assert len(launched) == 2 and launched[1].contexts == 1
+
+
+def test_memory_over_budget_recycles_before_next_context(monkeypatch):
+    launched = launches(monkeypatch)
+    monkeypatch.setattr(browser_module, "browser_pids", lambda b: [1, 2])
+    monkeypatch.setattr(browser_module, "process_rss", lambda pids: 600 * 1024**2)
+    telemetry.reset()
+    managed = ManagedBrowser(None, "test", max_rss_mb=512)
+    managed.new_context()
+    assert managed.measure(FakePage(50 * 1024**2)) == 600 * 1024**2
+    managed.new_context()
+    assert len(launched) == 2
+    report = telemetry.report()
+    names = {s["name"] for s in report["samples"]}
+    assert names == {"browser_rss_bytes", "page_js_heap_bytes"}
+    [line] = memory_summary(report)
+    assert "peak 600 MB" in line and "1 recycles" in line
+
+
+def test_page_due_on_uses_or_heap():
+    assert not page_due(FakePage(10 * 1024**2), 3, "discovery")
+    assert page_due(FakePage(10 * 1024**2), 25, "discovery")
+    assert page_due(FakePage(300 * 1024**2), 1, "discovery")
+    assert not page_due(FakePage(None), 1, "discovery")
+
+
+def test_process_rss_reads_proc():
+    rss = process_rss([os.getpid()])
+    assert rss is None or rss > 0
+
+
+def test_samples_are_downsampled_and_exported(monkeypatch):
+    monkeypatch.setattr("scrapers.telemetry.MAX_SAMPLES", 10)
+    t = Telemetry()
+    for value in range(100):
+        t.sample("browser_rss_bytes", value, browser="Castorama")
+    [series] = t.report()["samples"]
+    assert len(series["points"]) <= 10 and series["max"] == 99
+    other = Telemetry()
+    other.sample("browser_rss_bytes", 500, browser="Castorama")
+    t.merge(other.report())
+    [series] = t.report()["samples"]
+    assert series["max"] == 500
+    text = prometheus_text(t.report())
+    assert "# TYPE donizo_crawl_browser_rss_bytes_max gauge" in text
+    assert 'donizo_crawl_browser_rss_bytes_max{browser="Castorama"} 500' in text
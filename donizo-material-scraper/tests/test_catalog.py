@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from scrapers import changes, helpers
+from scrapers.catalog import Catalog, iter_records
+
+RECORDS = [
+    {
+        "name": "Faience murale blanche 20x20cm",
+        "category": ["Salle de bain", "Carrelage", "Faience"],
+        "price": "12,99 €",
+        "url": "",
+        "brand": "Faience",
+        "unit": "20x20cm",
+        "image_url": "https://media.castorama.fr/faience.jpg",
+        "supplier": "Castorama",
+        "category_primary": "Salle de bain",
+        "category_secondary": "Carrelage",
+        "category_tertiary": "Faience",
+    },
+    {
+        "name": "Carrelage sol gris 60x60cm",
+        "category": ["Salle de bain", "Carrelage", "Faience"],
+        "price": "24,90 €",
+        "url": "",
+        "brand": None,
+        "unit": "60x60cm",
+        "image_url": None,
+        "supplier": "Castorama",
+        "category_primary": "Salle de bain",
+        "category_secondary": "Carrelage",
+        "category_tertiary": "Faience",
+        "ean": "3663602000001",
+    },
+    {
+        "name": "Tondeuse 1800W",
+        "category": "tondeuse_à_gazon",
+        "price": "264,24€",
+        "url": "https://www.manomano.fr/p/tondeuse-1",
+        "brand": "BLACK & DECKER",
+        "unit": "42 cm",
+        "image_url": "data:image/svg+xml,placeholder",
+        "supplier": "ManoMano",
+        "category_primary": None,
+        "category_secondary": None,
+        "category_tertiary": None,
+    },
+]
+
+
+def write(path, records):
+    path.write_text(json.dumps(records, ensure_ascii=False, indent=2), "utf-8")
+    return str(path)
+
+
+def test_catalog_round_trips_records_and_shares_category_paths(tmp_path):
+    path = write(tmp_path / "materials.json", RECORDS)
+    catalog = Catalog.load(path)
+    assert list(catalog) == RECORDS
+    assert catalog[1] == RECORDS[1]
+    assert len(catalog.categories) == 2
+    first, second = catalog.records[:2]
+    assert first.category_id == second.category_id
+    catalog[0]["category"].append("mutated")
+    assert catalog[0]["category"] == RECORDS[0]["category"]
+
+
+def test_iter_records_streams_in_small_chunks(tmp_path):
+    path = write(tmp_path / "materials.json", RECORDS * 5)
+    assert list(iter_records(path, chunk_size=64)) == RECORDS * 5
+    (tmp_path / "empty.json").write_text("[]", "utf-8")
+    assert list(iter_records(str(tmp_path / "empty.json"))) == []
+    (tmp_path / "broken.json").write_text('{"name": 1}', "utf-8")
+    with pytest.raises(ValueError):
+        list(iter_records(str(tmp_path / "broken.json")))
+
+
+def test_save_data_merges_from_the_old_file(tmp_path, monkeypatch):
+    path = write(tmp_path / "materials.json", RECORDS[:2])
+    monkeypatch.setattr(helpers, "DATA_PATH", path)
+    monkeypatch.setattr(helpers, "publish_snapshot", lambda: None)
+    monkeypatch.setattr(changes, "CHANGES_PATH", str(tmp_path / "changes.sqlite"))
+    updated = dict(RECORDS[0], brand="Artens", price="1,00 €")
+    helpers.save_data(iter([updated, RECORDS[2]]))
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    # Products seen again keep their record and take the new price and brand
+    assert saved == [dict(RECORDS[0], brand="Artens", price="1,00 €")] + RECORDS[1:]
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from apis import api
+from scrapers import changes, helpers
+from scrapers.changes import ChangeLog
+
+
+def product(n, price, category="carrelage", supplier="ManoMano"):
+    return {
+        "name": f"Produit {n}",
+        "category": category,
+        "price": price,
+        "url": f"https://www.manomano.fr/p/{n}",
+        "supplier": supplier,
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    path = str(tmp_path / "materials.json")
+    monkeypatch.setattr(helpers, "DATA_PATH", path)
+    monkeypatch.setattr(helpers, "publish_snapshot", lambda: None)
+    monkeypatch.setattr(changes, "CHANGES_PATH", str(tmp_path / "changes.sqlite"))
+    return path
+
+
+def test_crawls_append_inserts_price_changes_and_removals(store):
+    first = [product(1, "10,00 €"), product(2, "20,00 €"), product(3, "5€", "colle")]
+    assert helpers.save_data(first) == {
+        "inserted": 3,
+        "price_changed": 0,
+        "removed": 0,
+    }
+    # Same price written differently, a new price, product 1 gone; "colle" was
+    # not crawled to its last page, so product 3 is kept
+    second = [product(2, "20,00€"), product(4, "7,50 €")]
+    second[0]["price"] = "19,90 €"
+    counts = helpers.save_data(second, completed={"ManoMano|carrelage"})
+    assert counts == {"inserted": 1, "price_changed": 1, "removed": 1}
+    with open(store, encoding="utf-8") as f:
+        assert [p["name"] for p in json.load(f)] == [
+            "Produit 2",
+            "Produit 3",
+            "Produit 4",
+        ]
+
+    feed, has_more = ChangeLog().since(3)
+    assert not has_more
+    assert [(c["version"], c["crawl"], c["kind"]) for c in feed] == [
+        (4, 2, "inserted"),
+        (5, 2, "removed"),
+        (6, 2, "price_changed"),
+    ]
+    assert feed[1]["record"]["name"] == "Produit 1"
+    assert (feed[2]["old_price"], feed[2]["price"]) == ("20,00 €", "19,90 €")
+
+
+def test_changes_endpoint_pages_with_a_cursor(store, monkeypatch):
+    helpers.save_data([product(n, "1,00 €") for n in range(5)])
+    monkeypatch.setattr(api, "change_log", {"log": None})
+    client = TestClient(api.app)
+    since, seen = 0, []
+    while True:
+        body = client.get("/changes", params={"since": since, "limit": 2}).json()
+        seen += [c["key"] for c in body["changes"]]
+        since = body["next"]
+        if not body["has_more"]:
+            break
+    assert seen == [f"https://www.manomano.fr/p/{n}" for n in range(5)]
+    assert since == body["latest"] == 5
+    assert client.get("/changes", params={"since": 5}).json()["changes"] == []
+
+
+def test_enriched_crawl_refreshes_stored_products(store):
+    helpers.save_data([dict(product(1, "6,90 €"), brand="Liquide")])
+    enriched = dict(
+        product(1, "6,90 €"),
+        brand="Starwax",
+        ean="3365000013425",
+        gtin="3365000013425",
+        pack_quantity="Vendu par 6",
+        quantity=6,
+        quantity_unit="piece",
+        price_per_unit=1.15,
+    )
+    counts = helpers.save_data([enriched])
+    assert counts == {"inserted": 0, "price_changed": 0, "removed": 0}
+    # A later crawl without --enrich keeps the detail-page brand
+    helpers.save_data([dict(product(1, "6,90 €"), brand="Liquide")])
+    with open(store, encoding="utf-8") as f:
+        [stored] = json.load(f)
+    assert (stored["brand"], stored["ean"], stored["gtin"]) == (
+        "Starwax",
+        "3365000013425",
+        "3365000013425",
+    )
+    assert (stored["pack_quantity"], stored["price_per_unit"]) == ("Vendu par 6", 1.15)
+
+
+def test_repriced_product_drops_stale_price_per_unit(store):
+    first = dict(product(1, "10,00 €"), quantity=5.0, quantity_unit="L")
+    helpers.save_data([dict(first, price_per_unit=2.0)])
+    helpers.save_data([product(1, "12,00 €")])
+    with open(store, encoding="utf-8") as f:
+        [stored] = json.load(f)
+    assert stored["price"] == "12,00 €"
+    assert not set(stored) & {"quantity", "quantity_unit", "price_per_unit"}
+
+
+def test_interrupted_save_is_settled_by_the_next_one(store, monkeypatch):
+    helpers.save_data([product(1, "10,00 €")])
+
+    def crash(*args):
+        raise KeyboardInterrupt
+
+    # Killed after materials.json was swapped: the changes are kept
+    with monkeypatch.context() as m:
+        m.setattr(ChangeLog, "commit_crawl", crash)
+        with pytest.raises(KeyboardInterrupt):
+            helpers.save_data([product(1, "12,00 €")])
+    assert ChangeLog().latest() == 1
+    helpers.save_data([product(1, "12,00 €"), product(2, "3,00 €")])
+    feed, _ = ChangeLog().since(0)
+    assert [c["kind"] for c in feed] == ["inserted", "price_changed", "inserted"]
+
+    # Killed before the swap: the file is unchanged and so are the changes
+    with monkeypatch.context() as m:
+        m.setattr(helpers.os, "replace", crash)
+        with pytest.raises(KeyboardInterrupt):
+            helpers.save_data([product(3, "1,00 €")])
+    helpers.save_data([product(4, "1,00 €")])
+    feed, _ = ChangeLog().since(3)
+    assert [c["key"] for c in feed] == ["https://www.manomano.fr/p/4"]
@@ -0,0 +1,137 @@
+import os
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+spacy = pytest.importorskip("spacy")
+
+from scrapers.compare_prices import (
+    CrossSupplierMatcher,
+    SimilarityIndex,
+    block_bits,
+    category_text,
+    compare_products,
+    exhaustive_pairs,
+    lemmatize,
+    normalize_texts,
+    pair_recall,
+)
+from scrapers.nlp_cache import NlpCache
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "materials.json")
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    try:
+        return spacy.load("fr_core_news_md")
+    except OSError:
+        pytest.skip("fr_core_news_md not installed")
+
+
+@pytest.fixture(scope="module")
+def materials():
+    if not os.path.exists(DATA_PATH):
+        pytest.skip("No data file yet")
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pairwise_groups(nlp, items):
+    # Reference: the original per-pair loop from the Compare tab
+    def similarity(text1, text2):
+        if not text1.strip() or not text2.strip():
+            return 0.0
+        return nlp(text1).similarity(nlp(text2))
+
+    tuples = [
+        (
+            lemmatize(nlp(item["name"].lower())),
+            lemmatize(nlp(category_text(item).lower())),
+        )
+        for item in items
+    ]
+    groups, used = [], set()
+    for i, (name1, cat1) in enumerate(tuples):
+        if i in used:
+            continue
+        group = [items[i]]
+        used.add(i)
+        for j, (name2, cat2) in enumerate(tuples):
+            if j == i or j in used:
+                continue
+            if similarity(name1, name2) > 0.6 and similarity(cat1, cat2) > 0.5:
+                group.append(items[j])
+                used.add(j)
+        if len({g["supplier"] for g in group}) > 1:
+            groups.append(group)
+    return groups
+
+
+def test_vectorized_groups_match_pairwise(nlp, materials):
+    sample = materials[::4]
+    _, _, groups = compare_products(nlp, sample)
+    assert groups == pairwise_groups(nlp, sample)
+
+
+def test_lsh_matcher_only_returns_exhaustive_cross_supplier_pairs(nlp, materials):
+    norm_names = normalize_texts(nlp, [item["name"] for item in materials])
+    norm_cats = normalize_texts(nlp, [category_text(item) for item in materials])
+    suppliers = [item["supplier"] for item in materials]
+    expected = exhaustive_pairs(SimilarityIndex(nlp, norm_names, norm_cats), suppliers)
+
+    found = CrossSupplierMatcher(nlp, norm_names, norm_cats, suppliers).matches()
+    assert {tuple(p) for p in found.tolist()} <= set(expected)
+    assert pair_recall(found, expected) >= 0.9
+
+
+def test_lsh_bits_grow_with_block_size():
+    # Buckets stay near 64 products: 6 bits up to 4,096, then log2(n / 64)
+    sizes = np.array([10, 4096, 5000, 10**6, 10**8])
+    assert block_bits(sizes).tolist() == [6, 6, 7, 14, 16]
+
+
+def test_nlp_cache_persists_and_evicts(nlp, materials, tmp_path):
+    path = str(tmp_path / "nlp.sqlite")
+    sample = materials[:40]
+    expected = compare_products(nlp, sample)
+
+    cache = NlpCache(nlp, path=path)
+    assert compare_products(nlp, sample, cache=cache) == expected
+    cache.close()
+
+    reopened = NlpCache(nlp, path=path)
+    assert compare_products(nlp, sample, cache=reopened) == expected
+    assert reopened.misses == 0 and reopened.hits > 0
+
+    size = len(reopened)
+    compare_products(nlp, sample[:10], cache=reopened)
+    assert len(reopened) < size
+
+
+def test_matching_stage_reuses_the_nlp_cache(nlp, tmp_path, monkeypatch):
+    from scrapers import compare_prices, match, nlp_cache
+
+    data_path = tmp_path / "materials.json"
+    data_path.write_text(
+        json.dumps(
+            [
+                {"name": "Colle carrelage 25kg", "supplier": "Castorama"},
+                {"name": "Colle pour carrelage 25 kg", "supplier": "ManoMano"},
+            ]
+        )
+    )
+    caches = []
+
+    def open_cache(nlp):
+        caches.append(NlpCache(nlp, path=str(tmp_path / "nlp.sqlite")))
+        return caches[-1]
+
+    monkeypatch.setattr(compare_prices, "load_nlp", lambda: nlp)
+    monkeypatch.setattr(nlp_cache, "NlpCache", open_cache)
+    monkeypatch.setattr(match, "publish_matches", lambda artifact: None)
+    for _ in range(2):
+        match.run_cached_matching(data_path=str(data_path))
+    assert caches[0].misses > 0
+    assert caches[1].misses == 0 and caches[1].hits > 0
@@ -0,0 +1,53 @@
+from scrapers.crawl_state import CrawlState, category_id, fingerprint
+
+PAGE = [
+    {"name": "Carrelage sol", "url": "", "image_url": "a.jpg", "price": "19,90€"},
+    {"name": "Faience", "url": "", "image_url": "b.jpg", "price": "9,90€"},
+]
+
+
+def test_fingerprint_tracks_ids_and_prices_only():
+    reordered = [dict(PAGE[1], brand="X"), PAGE[0]]
+    repriced = [PAGE[0], dict(PAGE[1], price="8,90€")]
+    assert fingerprint(reordered) == fingerprint(PAGE)
+    assert fingerprint(repriced) != fingerprint(PAGE)
+
+
+def test_unchanged_first_page_skips_pagination(tmp_path):
+    path = str(tmp_path / "state.json")
+    cat = category_id("Castorama", ("Sol", "Carrelage", None))
+    state = CrawlState(path)
+    assert state.observe(cat, PAGE)  # never seen
+    state.mark_complete(cat)
+    assert not state.observe(cat, PAGE)
+    state.save()
+
+    reloaded = CrawlState(path)
+    assert reloaded.categories[cat]["checks"] == 1
+    assert reloaded.observe(cat, [PAGE[0]])
+    assert CrawlState(path, full_recrawl_days=0).observe(cat, PAGE) is True
+
+
+def test_changing_categories_are_crawled_first(tmp_path):
+    state = CrawlState(str(tmp_path / "state.json"))
+    for i in range(4):
+        state.observe("stable", PAGE)
+        state.observe("moving", [dict(PAGE[0], price=f"{i},00€")])
+        state.mark_complete("stable")
+        state.mark_complete("moving")
+    assert state.prioritize(["stable", "moving", "new"]) == [
+        "new",
+        "moving",
+        "stable",
+    ]
+
+
+def test_fingerprint_waits_for_the_deeper_pages(tmp_path):
+    state = CrawlState(str(tmp_path / "state.json"))
+    assert state.observe("cat", PAGE)
+    # Pagination failed: the next run crawls the category again
+    assert state.observe("cat", PAGE)
+    state.mark_complete("cat", every_product=False)
+    assert not state.observe("cat", PAGE)
+    assert state.categories["cat"]["last_full_crawl"] > 0
+    assert state.completed == set()
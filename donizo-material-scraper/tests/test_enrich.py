@@ -0,0 +1,96 @@
+import json
+import time
+
+from scrapers.enrich import DetailCache, DetailEnricher, parse_product
+
+PRODUCT_PAGE = """
+<html><head><script type="application/ld+json">%s</script></head></html>
+""" % json.dumps(
+    {
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "BreadcrumbList", "itemListElement": []},
+            {
+                "@type": "Product",
+                "name": "Liquide de nettoyage carrelage 1L",
+                "brand": {"@type": "Brand", "name": "Starwax"},
+                "gtin13": "3365000013425",
+                "sku": "609174",
+                "depth": {"value": 8, "unitText": "cm"},
+                "additionalProperty": [
+                    {"name": "Conditionnement", "value": "Vendu par 6"},
+                    {"name": "Poids", "value": "1.1 kg"},
+                ],
+                "offers": {
+                    "@type": "Offer",
+                    "price": "6.90",
+                    "availability": "https://schema.org/InStock",
+                },
+            },
+        ],
+    }
+)
+
+
+def test_json_ld_product_fields_are_parsed():
+    assert parse_product(PRODUCT_PAGE) == {
+        "brand": "Starwax",
+        "ean": "3365000013425",
+        "sku": "609174",
+        "dimensions": {"depth": "8 cm", "poids": "1.1 kg"},
+        "pack_quantity": "Vendu par 6",
+        "availability": "InStock",
+    }
+    assert parse_product("<html><p>rendered by JavaScript</p></html>") == {}
+
+
+class FakeEnricher(DetailEnricher):
+    def __init__(self, cache, pages):
+        super().__init__(cache, concurrency=2)
+        self.pages = pages
+        self.fetched = []
+        self.browsed = []
+
+    def fetch_html(self, url, supplier):
+        self.fetched.append(url)
+        return 200, self.pages.get(url, "<html></html>")
+
+    def browser_details(self, url, supplier):
+        self.browsed.append(url)
+        return parse_product(PRODUCT_PAGE)
+
+
+def records():
+    return [
+        {"name": "Liquide", "brand": "Liquide", "url": "https://a/1", "price": "6,90€"},
+        {"name": "Sans lien", "url": "", "price": "1,00€"},
+        {"name": "Colle", "url": "https://a/2", "price": "9,90€"},
+    ]
+
+
+def test_details_are_fetched_once_and_kept_in_order(tmp_path):
+    cache = DetailCache(str(tmp_path / "details.sqlite"), ttl_days=7)
+    enricher = FakeEnricher(cache, {"https://a/1": PRODUCT_PAGE})
+    out = list(enricher(records()))
+    assert [r["name"] for r in out] == ["Liquide", "Sans lien", "Colle"]
+    assert out[0]["brand"] == "Starwax" and out[0]["ean"] == "3365000013425"
+    assert "ean" not in out[1]
+    # No JSON-LD over HTTP: the browser fallback filled it in
+    assert enricher.browsed == ["https://a/2"] and out[2]["sku"] == "609174"
+
+    again = FakeEnricher(cache, {})
+    changed = records()
+    changed[2]["price"] = "8,90€"
+    out = list(again(changed))
+    assert again.fetched == ["https://a/2"]
+    assert out[0]["brand"] == "Starwax"
+    again.close()
+
+
+def test_cached_details_expire(tmp_path):
+    cache = DetailCache(str(tmp_path / "details.sqlite"), ttl_days=1)
+    cache.put("https://a/1", "f", {"ean": "1"})
+    assert cache.get("https://a/1", "f") == {"ean": "1"}
+    cache._db.execute("UPDATE details SET fetched_at = ?", (time.time() - 2 * 86400,))
+    assert cache.get("https://a/1", "f") is None
+    cache.close()
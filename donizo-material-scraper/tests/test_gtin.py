@@ -0,0 +1,98 @@
+import pytest
+
+from scrapers.gtin import (
+    clean_gtin,
+    extract_gtin,
+    gtin_from_record,
+    gtin_groups,
+    valid_gtin,
+)
+
+IMAGE_URL = (
+    "https://media.castorama.fr/is/image/Castorama/"
+    "liquide-clarifiant-pour-spa-bayrol-1l~4008367953003_01c_FR_CF"
+)
+
+
+def test_valid_gtin_checks_length_and_check_digit():
+    assert valid_gtin("4008367953003")
+    assert valid_gtin("96385074")  # GTIN-8
+    assert valid_gtin("036000291452")  # UPC-A
+    assert not valid_gtin("4008367953004")
+    assert not valid_gtin("40083679530")
+    assert not valid_gtin("0000000000000")
+    assert not valid_gtin(None)
+    assert clean_gtin("4 008367 953003") == "4008367953003"
+    assert clean_gtin("not a code") is None
+
+
+def test_gtin_from_record_prefers_fields_then_image_url():
+    assert gtin_from_record({"image_url": IMAGE_URL}) == "4008367953003"
+    assert gtin_from_record({"ean": "036000291452", "image_url": IMAGE_URL}) == (
+        "036000291452"
+    )
+    # An invalid detail-page EAN falls back to the image
+    assert gtin_from_record({"ean": "123", "image_url": IMAGE_URL}) == "4008367953003"
+    assert gtin_from_record({"image_url": "data:image/svg+xml;base64,"}) is None
+
+
+def test_extract_gtin_stage():
+    records = [{"image_url": IMAGE_URL}, {"gtin": "4008367953004"}]
+    out = list(extract_gtin(records))
+    assert out[0]["gtin"] == "4008367953003"
+    assert "gtin" not in out[1]
+
+
+def test_gtin_groups_join_suppliers_on_padded_key():
+    gtins = ["4008367953003", "4008367953003", "036000291452", "0036000291452", None]
+    suppliers = ["Castorama", "ManoMano", "Castorama", "ManoMano", "ManoMano"]
+    assert sorted(gtin_groups(gtins, suppliers)) == [[0, 1], [2, 3]]
+    # The same product listed twice by one supplier is not a match
+    assert gtin_groups(gtins[:2], ["Castorama", "Castorama"]) == []
+
+
+def test_compute_matches_splits_exact_and_fuzzy():
+    spacy = pytest.importorskip("spacy")
+    try:
+        nlp = spacy.load("fr_core_news_md")
+    except OSError:
+        pytest.skip("fr_core_news_md not installed")
+    from scrapers.match import compute_matches
+
+    items = [
+        {
+            "name": "Clarifiant spa Bayrol",
+            "supplier": "Castorama",
+            "price": "12,90 €",
+            "image_url": IMAGE_URL,
+            "category": ["Spa"],
+        },
+        {
+            "name": "Bayrol liquide 1L",
+            "supplier": "ManoMano",
+            "price": "11,50 €",
+            "ean": "4008367953003",
+            "category": "Spa",
+        },
+        {
+            "name": "Tondeuse thermique",
+            "supplier": "Castorama",
+            "price": "199 €",
+            "category": ["Jardin"],
+        },
+        {
+            "name": "Tondeuse thermique",
+            "supplier": "ManoMano",
+            "price": "189 €",
+            "category": "Jardin",
+        },
+    ]
+    artifact = compute_matches(items, nlp=nlp)
+    by_match = {g["match"]: g for g in artifact["groups"]}
+    assert by_match["gtin"]["gtin"] == "4008367953003"
+    assert by_match["gtin"]["spread"] == 1.4
+    assert {p["name"] for p in by_match["fuzzy"]["products"]} == {"Tondeuse thermique"}
+    stats = artifact["match_stats"]
+    assert stats["gtin_groups"] == stats["fuzzy_groups"] == 1
+    assert stats["gtin_share_pct"] == 50.0
+    assert stats["with_gtin"] == 2
@@ -0,0 +1,42 @@
+from scrapers.helpers import parse_price
+from scrapers.match import filter_groups, load_matches, price_spread, publish_matches
+
+
+def test_parse_price_handles_french_formats():
+    assert parse_price("17,90 €") == 17.90
+    assert parse_price("256,49€") == 256.49
+    assert parse_price("1 299,00 €") == 1299.0
+    assert parse_price("99 €") == 99.0
+    assert parse_price(None) is None
+    assert parse_price("Prix indisponible") is None
+
+
+def test_price_spread():
+    products = [{"price_value": 10.0}, {"price_value": 12.5}, {"price_value": None}]
+    assert price_spread(products) == {
+        "price_min": 10.0,
+        "price_max": 12.5,
+        "spread": 2.5,
+        "spread_pct": 25.0,
+    }
+    assert price_spread([{"price_value": None}])["spread"] is None
+
+
+def test_publish_and_filter_matches(tmp_path):
+    groups = [
+        {
+            "name": "Spa gonflable",
+            "products": [
+                {"name": "Spa gonflable 4 places", "norm_name": "spa gonflable 4 place"}
+            ],
+        },
+        {
+            "name": "Tondeuse",
+            "products": [{"name": "Tondeuse thermique", "norm_name": "tondeuse"}],
+        },
+    ]
+    for version in ["20260101T000000-aaaa", "20260102T000000-bbbb"]:
+        publish_matches({"version": version, "groups": groups}, str(tmp_path))
+    assert load_matches(str(tmp_path))["version"] == "20260102T000000-bbbb"
+    assert [g["name"] for g in filter_groups(groups, "SPA")] == ["Spa gonflable"]
+    assert filter_groups(groups, "") == groups
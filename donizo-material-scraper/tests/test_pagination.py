@@ -0,0 +1,66 @@
+from scrapers.common import next_page_url, page_url, total_pages
+
+CASTORAMA = {"name": "Castorama", "base_url": "https://www.castorama.fr"}
+MANOMANO = {"name": "ManoMano", "base_url": "https://www.manomano.fr"}
+
+
+class FakeElement:
+    def __init__(self, href=None):
+        self.href = href
+
+    def get_attribute(self, name):
+        return self.href
+
+    def is_enabled(self):
+        return True
+
+
+class FakePage:
+    def __init__(self, url, elements):
+        self.url = url
+        self.elements = elements
+
+    def query_selector(self, selector):
+        found = self.elements.get(selector)
+        return found[0] if found else None
+
+    def query_selector_all(self, selector):
+        return self.elements.get(selector, [])
+
+
+def test_page_url_sets_the_configured_param():
+    url = "https://www.castorama.fr/carrelage.cat?sort=price&page=3"
+    assert page_url(url, "Castorama", 5) == (
+        "https://www.castorama.fr/carrelage.cat?sort=price&page=5"
+    )
+    assert page_url(url, "Castorama", 1) == (
+        "https://www.castorama.fr/carrelage.cat?sort=price"
+    )
+    assert page_url(url, "Unknown", 2) is None
+
+
+def test_total_pages_is_the_highest_linked_page():
+    links = [FakeElement(f"/carrelage.cat?page={n}") for n in (2, 3, 12)]
+    links.append(FakeElement("/carrelage.cat?page=next"))
+    page = FakePage(
+        "https://www.castorama.fr/carrelage.cat", {'a[href*="page="]': links}
+    )
+    assert total_pages(page, "Castorama") == 12
+    assert total_pages(FakePage(page.url, {}), "Castorama") is None
+
+
+def test_button_pager_uses_the_config_selector_and_template():
+    page = FakePage(
+        "https://www.manomano.fr/cat/carrelage?page=2",
+        {'button[aria-label="Next"]': [FakeElement()]},
+    )
+    assert next_page_url(page, MANOMANO, page_number=2) == (
+        "https://www.manomano.fr/cat/carrelage?page=3"
+    )
+    castorama = FakePage(
+        "https://www.castorama.fr/carrelage.cat",
+        {'a[aria-label="Page suivante"]': [FakeElement("/carrelage.cat?page=2")]},
+    )
+    assert next_page_url(castorama, CASTORAMA) == (
+        "https://www.castorama.fr/carrelage.cat?page=2"
+    )
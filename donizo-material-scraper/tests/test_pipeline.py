@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+
+import pytest
+
+from scrapers.pipeline import JsonlSink, Pipeline, iter_jsonl, record_key
+
+
+def test_records_flow_through_stages_into_the_sink(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    records = [
+        {"name": "  Carrelage\n sol ", "url": "/a", "image_url": "//img/a.jpg"},
+        {"name": "Carrelage sol", "url": "/a"},
+        {"name": "Faience", "url": "", "supplier": "Castorama"},
+        {"name": "Faience", "url": "", "supplier": "ManoMano"},
+    ]
+    with Pipeline(JsonlSink(path)) as pipeline:
+        pipeline.feed(records)
+    assert pipeline.sink.count == 3
+    written = list(iter_jsonl(path))
+    assert written[0]["name"] == "Carrelage sol"
+    assert written[0]["image_url"] == "https://img/a.jpg"
+    assert [record_key(r) for r in written[1:]] == [
+        "Castorama|Faience|",
+        "ManoMano|Faience|",
+    ]
+
+
+class SlowSink:
+    def __init__(self):
+        self.records = []
+        self.release = threading.Event()
+        self.count = 0
+
+    def write(self, record):
+        self.release.wait()
+        self.records.append(record)
+        self.count += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_full_buffer_blocks_the_producer():
+    sink = SlowSink()
+    pipeline = Pipeline(sink, stages=(), buffer_size=2)
+    records = [{"n": i} for i in range(10)]
+    producer = threading.Thread(target=pipeline.feed, args=(records,))
+    producer.start()
+    producer.join(timeout=0.5)
+    assert producer.is_alive()  # the buffer is full and the sink is stuck
+    sink.release.set()
+    producer.join()
+    assert pipeline.close() == 10
+    assert [r["n"] for r in sink.records] == list(range(10))
+
+
+def test_records_are_visible_before_the_run_ends(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    sink = JsonlSink(path, flush_seconds=0)
+    sink.write({"name": "Carrelage sol"})
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.loads(f.readline())["name"] == "Carrelage sol"
+    sink.close()
+
+
+def test_sink_is_flushed_when_the_buffer_drains(tmp_path):
+    path = str(tmp_path / "crawl.jsonl")
+    pipeline = Pipeline(JsonlSink(path, flush_seconds=3600), stages=())
+    pipeline.put({"name": "Carrelage sol"})
+    for _ in range(100):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read():
+                break
+        time.sleep(0.01)
+    assert [r["name"] for r in iter_jsonl(path)] == ["Carrelage sol"]
+    pipeline.close()
+
+
+def test_stage_errors_reach_the_producer(tmp_path):
+    def broken(records):
+        for record in records:
+            raise ValueError("bad record")
+            yield record
+
+    pipeline = Pipeline(JsonlSink(str(tmp_path / "x.jsonl")), stages=(broken,))
+    with pytest.raises(ValueError):
+        for i in range(1000):
+            pipeline.put({"n": i})
+    with pytest.raises(ValueError):
+        pipeline.close()
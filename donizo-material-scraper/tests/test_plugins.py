@@ -0,0 +1,68 @@
+import subprocess
+import sys
+
+from scrapers import main, plugins
+from scrapers.crawl_state import CrawlState
+from scrapers.helpers import load_config
+from scrapers.plugins import cache_categories, cached_categories, validate_config
+
+
+def test_shipped_config_is_valid():
+    assert validate_config(load_config()) == []
+
+
+def test_config_problems_are_reported():
+    config = {
+        "suppliers": [
+            {"name": "Leroy", "base_url": "https://x", "plugin": "scrapers.nope"},
+            {
+                "name": "Brico",
+                "categories": {"tiles": {"name_selector": "h3"}},
+                "pagination": {"concurrency": 0},
+                "rate_limit": {"initial_rate": "fast"},
+            },
+        ]
+    }
+    assert validate_config(config) == [
+        "Leroy: plugin module scrapers.nope not found",
+        "Leroy: no `categories` selectors",
+        "Brico: missing `base_url`",
+        "Brico: missing `plugin`",
+        "Brico: category tiles has no product_selector",
+        "Brico: pagination.concurrency must be a positive int",
+        "Brico: rate_limit.initial_rate must be a number >= 0",
+    ]
+
+
+def test_cli_starts_without_browser_or_supplier_modules():
+    code = (
+        "import sys, scrapers.main;"
+        "print([m for m in ('playwright', 'bs4', 'scrapers.castorama',"
+        " 'scrapers.manomano') if m in sys.modules])"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "[]"
+
+
+def test_dry_run_plans_from_the_category_cache(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(plugins, "CATEGORY_CACHE_PATH", str(tmp_path / "c.json"))
+    monkeypatch.setenv("CASTORAMA_CATEGORY_LIMIT", "1")
+    items = [
+        (("Sol", "Carrelage", None), "https://www.castorama.fr/carrelage.cat"),
+        (("Sol", "Parquet", "Chêne"), "https://www.castorama.fr/chene.cat"),
+    ]
+    cache_categories("Castorama", items)
+    assert cached_categories("Castorama")[1] == items
+
+    crawl_state = CrawlState(str(tmp_path / "state.json"))
+    crawl_state.observe("Castorama|Sol > Carrelage", [])
+    config = load_config()
+    castorama = [s for s in config["suppliers"] if s["name"] == "Castorama"]
+    assert main.dry_run(config, castorama, crawl_state, page_budget=0) == 0
+    out = capsys.readouterr().out
+    # The never-seen category ranks first and is the only one selected
+    assert "1 of 2 cached categories" in out
+    assert "Castorama|Sol > Parquet > Chêne [full crawl" in out
+    assert "carrelage.cat" not in out
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+import pytest
+
+from scrapers import ratelimit
+from scrapers.ratelimit import AdaptiveRateLimiter, BlockedError, navigate
+from scrapers.telemetry import telemetry
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+
+class FakePage:
+    """Serves one (status, title) pair per `goto` call."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.current = None
+        self.visits = 0
+
+    def goto(self, url, timeout=None):
+        self.visits += 1
+        self.current = self.responses.pop(0)
+        return FakeResponse(self.current[0])
+
+    def title(self):
+        return self.current[1]
+
+    def content(self):
+        return "<html></html>"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+
+
+def test_rate_adapts_to_blocks_and_successes():
+    limiter = AdaptiveRateLimiter("test", initial_rate=0.4, min_rate=0.1)
+    first = limiter.on_block("HTTP 429")
+    second = limiter.on_block("HTTP 429")
+    assert limiter.rate == pytest.approx(0.1)
+    assert 4 <= first <= 6 and 8 <= second <= 12
+    limiter.on_success()
+    assert limiter.rate == pytest.approx(0.12)
+    assert limiter.consecutive_blocks == 0
+
+
+def test_navigate_retries_blocked_pages():
+    limiter = AdaptiveRateLimiter("test", initial_rate=1.0)
+    page = FakePage([(429, ""), (200, "Just a moment..."), (200, "Carrelage")])
+    limiter.settings["challenge_wait"] = 0
+    assert navigate(page, "https://example.test", limiter).status == 200
+    assert page.visits == 3
+    assert limiter.rate < 1.0
+
+
+def test_navigate_gives_up_after_max_retries():
+    limiter = AdaptiveRateLimiter("test", max_retries=1)
+    page = FakePage([(403, ""), (403, "")])
+    with pytest.raises(BlockedError):
+        navigate(page, "https://example.test", limiter)
+    assert page.visits == 2
+
+
+def test_shared_limiter_paces_and_backs_off_across_processes(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    # Two worker processes' limiters for the same supplier
+    first = ratelimit.SharedRateLimiter("test", path, initial_rate=0.5)
+    second = ratelimit.SharedRateLimiter("test", path, initial_rate=0.5)
+    assert first.acquire() == 0
+    assert second.acquire() == pytest.approx(2.0, abs=0.1)
+    backoff = first.on_block("HTTP 429")
+    # The block halves the rate and pauses the other worker too
+    assert second.acquire() >= backoff - 0.1
+    assert second.rate == 0.25
+    second.on_success()
+    assert first.acquire() > 0 and first.rate == pytest.approx(0.27)
+
+
+class HtmlPage:
+    def __init__(self, title, html):
+        self._title, self.html = title, html
+
+    def title(self):
+        return self._title
+
+    def content(self):
+        return self.html
+
+
+def test_challenge_is_the_interstitial_not_cloudflare_scripts():
+    listing = HtmlPage(
+        "Carrelage sol | Castorama",
+        '<div data-test-id="product-panel"></div><script>'
+        "a.src='/cdn-cgi/challenge-platform/scripts/jsd/main.js'</script>",
+    )
+    assert not ratelimit.is_challenge(listing)
+    form = '<form id="challenge-form" action="/?__cf_chl_f_tk=abc" method="POST">'
+    assert ratelimit.is_challenge(HtmlPage("www.castorama.fr", form))
+    iframe = '<iframe src="https://geo.captcha-delivery.com/captcha/?t=1"></iframe>'
+    assert ratelimit.is_challenge(HtmlPage("manomano.fr", iframe))
+    assert ratelimit.is_challenge(HtmlPage("Just a moment...", ""))
+
+
+def test_fetch_page_counts_each_failure_once(monkeypatch):
+    from scrapers import common
+
+    telemetry.reset()
+    outcomes = [RuntimeError("browser closed"), BlockedError("still blocked")]
+
+    def scrape_page(*args, **kw):
+        raise outcomes.pop(0)
+
+    monkeypatch.setattr(common, "scrape_page", scrape_page)
+    browser = SimpleNamespace(is_connected=lambda: False)
+    with pytest.raises(BlockedError):
+        common.fetch_page(browser, {"name": "test"}, "tiles", "u", {}, 10)
+    counters = {c["name"]: c["value"] for c in telemetry.report()["counters"]}
+    # The crash is retried at once; the block was counted by navigate
+    assert counters == {"errors": 1, "retries": 1}
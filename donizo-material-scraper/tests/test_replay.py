@@ -0,0 +1,96 @@
+import base64
+import json
+
+import pytest
+
+from scrapers.replay import ReplayServer, mode
+
+BASE = "https://www.castorama.fr"
+CARD = (
+    '<div data-test-id="product-panel">'
+    '<h3 data-test-id="productTitle">{name}</h3>'
+    '<div data-test-id="product-primary-price">{price}</div>'
+    '<img data-test-id="image" src="{base}/img/{i}.jpg"></div>'
+)
+
+
+def listing(names, next_href=None):
+    cards = "".join(
+        CARD.format(name=name, price=f"{i},90 €", base=BASE, i=i)
+        for i, name in enumerate(names)
+    )
+    link = ""
+    if next_href:
+        link = f'<a aria-label="Page suivante" href="{next_href}">›</a>'
+    return f"<html><title>Carrelage</title><body>{cards}{link}</body></html>"
+
+
+def har_entry(url, body, status=200, mime="text/html; charset=utf-8"):
+    return {
+        "request": {"method": "GET", "url": url},
+        "response": {
+            "status": status,
+            "headers": [
+                {"name": "Content-Type", "value": mime},
+                {"name": "Content-Encoding", "value": "br"},
+            ],
+            "content": {
+                "mimeType": mime,
+                "text": base64.b64encode(body.encode("utf-8")).decode("ascii"),
+                "encoding": "base64",
+            },
+        },
+    }
+
+
+@pytest.fixture
+def archive(tmp_path):
+    first_page = listing(["Carrelage sol", "Faience"], "/carrelage?p=2")
+    entries = [
+        har_entry(f"{BASE}/carrelage", first_page),
+        har_entry(f"{BASE}/carrelage?p=2", listing(["Plinthe bois"])),
+        har_entry(f"{BASE}/carrelage?p=2", listing(["Plinthe chêne"])),
+    ]
+    with open(tmp_path / "crawl.har", "w", encoding="utf-8") as f:
+        json.dump({"log": {"entries": entries}}, f)
+    return tmp_path
+
+
+def test_server_replays_recorded_responses_in_order(archive):
+    server = ReplayServer(str(archive))
+    try:
+        status, headers, body = server.fetch("GET", f"{BASE}/carrelage")
+        assert status == 200 and b"Carrelage sol" in body
+        assert "Content-Encoding" not in headers
+        bodies = [server.fetch("GET", f"{BASE}/carrelage?p=2")[2] for _ in range(3)]
+        assert [b"Plinthe bois" in b for b in bodies] == [True, False, False]
+        assert server.fetch("GET", f"{BASE}/tracker.js")[0] == 0
+        assert (server.hits, server.misses) == (4, 1)
+    finally:
+        server.close()
+
+
+def test_unknown_mode_is_rejected(monkeypatch):
+    monkeypatch.setenv("SCRAPER_MODE", "offline")
+    with pytest.raises(ValueError):
+        mode()
+
+
+def test_scrape_category_runs_offline(archive, monkeypatch):
+    from playwright.sync_api import Error, sync_playwright
+
+    try:
+        with sync_playwright() as p:
+            p.chromium.launch(headless=True).close()
+    except Error:
+        pytest.skip("No Playwright Chromium installed")
+    monkeypatch.setenv("SCRAPER_MODE", "replay")
+    monkeypatch.setenv("SCRAPER_ARCHIVE", str(archive))
+    from scrapers.common import scrape_category
+    from scrapers.helpers import load_config
+
+    selectors = load_config()["suppliers"][0]["categories"]["tiles"]
+    supplier = {"name": "Castorama", "base_url": BASE}
+    results = scrape_category(supplier, "tiles", f"{BASE}/carrelage", selectors)
+    assert [r["name"] for r in results] == ["Carrelage sol", "Faience", "Plinthe bois"]
+    assert results[0]["price"] == "0,90€"
@@ -0,0 +1,111 @@
+import os
+import json
+
+import pytest
+
+from scrapers import snapshot as snapshot_module
+from scrapers.snapshot import (
+    Snapshot,
+    SnapshotReader,
+    publish_lock,
+    publish_snapshot,
+)
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "materials.json")
+
+
+def legacy_find(data, category):
+    # The per-request scan the API used before snapshots
+    category_lower = category.lower()
+    results = []
+    for item in data:
+        cat = item.get("category", "")
+        if isinstance(cat, list):
+            if any(category_lower in str(c).lower() for c in cat):
+                results.append(item)
+                continue
+        elif category_lower in str(cat).lower():
+            results.append(item)
+            continue
+        for key in ["category_primary", "category_secondary", "category_tertiary"]:
+            val = item.get(key, "")
+            if val and category_lower in str(val).lower():
+                results.append(item)
+                break
+    return results
+
+
+@pytest.fixture
+def materials():
+    if not os.path.exists(DATA_PATH):
+        pytest.skip("No data file yet")
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_snapshot_matches_legacy_category_search(tmp_path, materials):
+    snap = Snapshot(publish_snapshot(materials, snapshot_dir=str(tmp_path)))
+    assert len(snap) == len(materials)
+    for query in ["Jardin et extérieur", "spa", "SPA", "meuble", "piscine", "zzz"]:
+        assert snap.find_by_category(query) == legacy_find(materials, query)
+
+
+def test_reader_swaps_generations(tmp_path, materials):
+    publish_snapshot(materials[:10], snapshot_dir=str(tmp_path))
+    reader = SnapshotReader(snapshot_dir=str(tmp_path))
+    first = reader.current()
+    assert first.generation == 1 and len(first) == 10
+
+    publish_snapshot(materials, snapshot_dir=str(tmp_path))
+    second = reader.current()
+    assert second.generation == 2 and len(second) == len(materials)
+    # The previous generation stays readable for in-flight requests
+    assert first.get(0) == materials[0]
+
+
+def test_reader_republishes_when_data_file_changes(tmp_path):
+    data_path = tmp_path / "materials.json"
+    data_path.write_text(json.dumps([{"name": "Dalle", "category": "carrelage"}]))
+    reader = SnapshotReader(
+        snapshot_dir=str(tmp_path / "snapshots"), data_path=str(data_path)
+    )
+    assert len(reader.current()) == 1
+    assert reader.current().generation == 1
+    # Edited by hand, not through save_data
+    data_path.write_text(json.dumps([{"name": "Dalle"}, {"name": "Colle"}]))
+    os.utime(data_path, ns=(0, 10**9))
+    snap = reader.current()
+    assert snap.generation == 2 and len(snap) == 2
+
+
+def test_reader_serves_old_generation_while_another_publishes(tmp_path):
+    data_path = tmp_path / "materials.json"
+    data_path.write_text(json.dumps([{"name": "Dalle"}]))
+    snapshot_dir = str(tmp_path / "snapshots")
+    reader = SnapshotReader(snapshot_dir=snapshot_dir, data_path=str(data_path))
+    assert reader.current().generation == 1
+    data_path.write_text(json.dumps([{"name": "Dalle"}, {"name": "Colle"}]))
+    os.utime(data_path, ns=(0, 10**9))
+    with publish_lock(snapshot_dir):
+        assert reader.current().generation == 1
+    assert reader.current().generation == 2
+
+
+def test_reader_rereads_pointer_when_generation_was_pruned(tmp_path, monkeypatch):
+    snapshot_dir = str(tmp_path / "snapshots")
+    publish_snapshot([{"name": "Dalle"}], snapshot_dir=snapshot_dir)
+    for _ in range(2):
+        publish_snapshot([{"name": "Colle"}], snapshot_dir=snapshot_dir)
+    assert not os.path.exists(os.path.join(snapshot_dir, "catalog-00000001.bin"))
+    # The pointer named generation 1 when read, then a publish pruned it
+    pointers = iter(["catalog-00000001.bin"])
+    read_pointer = snapshot_module._read_pointer
+    monkeypatch.setattr(
+        snapshot_module,
+        "_read_pointer",
+        lambda d: next(pointers, None) or read_pointer(d),
+    )
+    reader = SnapshotReader(
+        snapshot_dir=snapshot_dir, data_path=str(tmp_path / "materials.json")
+    )
+    assert reader.current().generation == 3
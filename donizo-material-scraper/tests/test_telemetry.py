@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from scrapers.telemetry import (
+    Telemetry,
+    load_latest_report,
+    prometheus_text,
+    telemetry,
+    write_report,
+)
+
+
+def test_spans_and_counters_are_aggregated():
+    t = Telemetry()
+    for _ in range(3):
+        with t.span("extract", supplier="Castorama"):
+            pass
+    with pytest.raises(ValueError):
+        with t.span("navigate", supplier="Castorama"):
+            raise ValueError("boom")
+    t.count("cards", 24, supplier="Castorama")
+    t.count("cards", 12, supplier="Castorama")
+    report = t.report(items=36)
+    calls = {s["phase"]: s["calls"] for s in report["spans"]}
+    assert calls == {"extract": 3, "navigate": 1}
+    assert report["counters"] == [
+        {"name": "cards", "labels": {"supplier": "Castorama"}, "value": 36}
+    ]
+    assert report["items"] == 36
+
+
+def test_report_round_trip_and_prometheus_format(tmp_path):
+    telemetry.reset()
+    with telemetry.span("save"):
+        pass
+    telemetry.count("pages", supplier='Mano"Mano')
+    path = write_report({"supplier": "all"}, reports_dir=str(tmp_path))
+    with open(path, "r", encoding="utf-8") as f:
+        assert json.load(f)["supplier"] == "all"
+    text = prometheus_text(load_latest_report(str(tmp_path)))
+    assert 'donizo_crawl_phase_calls_total{phase="save"} 1' in text
+    assert 'donizo_crawl_pages_total{supplier="Mano\\"Mano"} 1' in text
+    assert "# TYPE donizo_crawl_pages_total counter" in text
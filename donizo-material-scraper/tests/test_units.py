@@ -0,0 +1,84 @@
+from fastapi.testclient import TestClient
+
+from apis import api
+from scrapers.snapshot import Snapshot, SnapshotReader, publish_snapshot
+from scrapers.units import canonical_unit, parse_quantity, unit_price
+
+
+def test_parse_quantity_canonical_units():
+    assert parse_quantity("Liquide clarifiant pour Spa Bayrol 1L") == (1.0, "L")
+    assert parse_quantity("Savon 500ml") == (0.5, "L")
+    assert parse_quantity("Lot de 6 bouteilles 1,5L") == (9.0, "L")
+    assert parse_quantity("Brome mini galets 20gr - 1,2Kg") == (1.2, "kg")
+    assert parse_quantity("Gazon 25 m2") == (25.0, "m²")
+    assert parse_quantity("Lot de 2 cartouches pour spa") == (2, "piece")
+    assert parse_quantity("Salon de jardin 5 pcs") == (5, "piece")
+    assert parse_quantity("Lot de 6 x 1,5L") == (9.0, "L")
+    assert parse_quantity("Pack 2 x 5L") == (10.0, "L")
+    # Dimensions, capacities and model names are not quantities sold
+    assert parse_quantity("Appui-tête 39 x 30 x 23 cm") is None
+    assert parse_quantity("Bâche 18x18m") is None
+    assert parse_quantity("Piscine Ø4,57m x h1,22m") is None
+    assert parse_quantity("Lot de 4 chaises, charge 120 kg") == (4, "piece")
+    assert parse_quantity("Mountfield MTF 84M") is None
+    assert parse_quantity("Spa gonflable 6 places") is None
+    assert canonical_unit("Litres") == "L"
+    assert canonical_unit("m2") == "m²"
+    assert canonical_unit("gallon") is None
+
+
+def test_unit_price_stage_prefers_detail_pack_quantity():
+    records = [
+        {"name": "Chlore choc 1 kg", "price": "20,00 €"},
+        {"name": "Chlore choc", "price": "45 €", "pack_quantity": "5 kg"},
+        {"name": "Spa gonflable", "price": "399 €", "price_per_unit": 1.0},
+    ]
+    out = list(unit_price(records))
+    assert (out[0]["quantity"], out[0]["quantity_unit"]) == (1.0, "kg")
+    assert out[0]["price_per_unit"] == 20.0
+    assert out[1]["price_per_unit"] == 9.0
+    assert "price_per_unit" not in out[2]
+
+
+def offer(n, name, price, supplier, category="Traitement de l'eau"):
+    return {
+        "name": name,
+        "category": category,
+        "price": price,
+        "url": f"https://example.com/{n}",
+        "supplier": supplier,
+    }
+
+
+OFFERS = [
+    offer(1, "Clarifiant 1L", "17,90 €", "Castorama"),
+    offer(2, "Clarifiant 5 L", "59,00 €", "ManoMano"),
+    offer(3, "Anti-écume 500ml", "9,90 €", "ManoMano"),
+    offer(4, "Brome 1 kg", "32,90 €", "Castorama"),
+    offer(5, "Huile moteur 2L", "10,00 €", "ManoMano", category="Tondeuse"),
+]
+
+
+def test_snapshot_indexes_price_per_unit(tmp_path):
+    snap = Snapshot(publish_snapshot(OFFERS, snapshot_dir=str(tmp_path)))
+    cheapest = snap.cheapest_per_unit("traitement", "L")
+    assert [(price, snap.get(i)["name"]) for price, i in cheapest] == [
+        (11.8, "Clarifiant 5 L"),
+        (17.9, "Clarifiant 1L"),
+        (19.8, "Anti-écume 500ml"),
+    ]
+    assert len(snap.cheapest_per_unit("traitement", "L", limit=1)) == 1
+    assert snap.cheapest_per_unit("traitement", "m²") == []
+
+
+def test_cheapest_endpoint(tmp_path, monkeypatch):
+    publish_snapshot(OFFERS, snapshot_dir=str(tmp_path))
+    monkeypatch.setattr(api, "catalog", SnapshotReader(snapshot_dir=str(tmp_path)))
+    client = TestClient(api.app)
+    body = client.get("/cheapest/tondeuse", params={"unit": "litre"}).json()
+    assert body["unit"] == "L"
+    assert [(o["name"], o["price_per_unit"]) for o in body["offers"]] == [
+        ("Huile moteur 2L", 5.0)
+    ]
+    response = client.get("/cheapest/tondeuse", params={"unit": "gallon"})
+    assert response.status_code == 400
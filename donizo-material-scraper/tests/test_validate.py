@@ -0,0 +1,116 @@
+import contextlib
+
+from scrapers import common
+from scrapers.common import extract_card
+from scrapers.telemetry import telemetry
+from scrapers.validate import CategoryValidator, quality_report
+
+SUPPLIER = {"name": "Castorama", "base_url": "https://www.castorama.fr"}
+SELECTORS = {
+    "name_selector": "h3",
+    "price_selector": ".price",
+    "url_selector": "a",
+    "image_selector": "img",
+    "brand_selector": "",
+}
+QUALITY = {
+    "fill": {"name": 0.9, "price": 0.8, "url": 0.8},
+    "min_price_parse_rate": 0.8,
+    "max_duplicate_rate": 0.5,
+    "max_bad_pages": 2,
+}
+
+
+class FakeElement:
+    def __init__(self, text="", attrs=None):
+        self.text = text
+        self.attrs = attrs or {}
+
+    def inner_text(self):
+        return self.text
+
+    def get_attribute(self, name):
+        return self.attrs.get(name)
+
+
+class FakeCard(FakeElement):
+    def __init__(self, elements, attrs=None):
+        super().__init__(attrs=attrs)
+        self.elements = elements
+
+    def query_selector(self, selector):
+        return self.elements.get(selector)
+
+
+def test_extract_card_leaves_missing_elements_empty():
+    card = FakeCard(
+        {
+            "h3": FakeElement(" Carrelage sol 60x60 "),
+            "a": FakeElement(attrs={"href": "/carrelage/123.html"}),
+        }
+    )
+    record = extract_card(card, SUPPLIER, "tiles", SELECTORS)
+    assert record["name"] == "Carrelage sol 60x60"
+    assert record["url"] == "https://www.castorama.fr/carrelage/123.html"
+    assert record["price"] is None and record["image_url"] is None
+    assert record["brand"] is None and record["unit"] is None
+
+
+def product(n, name="Carrelage", price="19,90 €"):
+    return {"name": name, "price": price, "url": f"https://example.com/{n}"}
+
+
+def test_drifted_selector_fails_category_after_bad_pages():
+    telemetry.reset()
+    validator = CategoryValidator("Castorama", "tiles", QUALITY)
+    assert validator.check([product(n) for n in range(10)]) == []
+    drifted = [product(n, price=None) for n in range(10, 20)]
+    assert validator.check(drifted) == ["price filled on 0/10", "price parsed on 0/10"]
+    assert not validator.failed
+    validator.check([product(n, price=None) for n in range(20, 30)])
+    assert validator.failed and validator.bad_pages == 2
+    quality = quality_report(telemetry.report())["Castorama"]
+    assert quality["records"] == 30
+    assert quality["fill_rates"]["price"] == round(10 / 30, 3)
+    assert quality["fill_rates"]["image_url"] == 0
+    assert (quality["bad_pages"], quality["aborted_categories"]) == (2, 1)
+
+
+def test_repeated_page_counts_as_duplicates():
+    telemetry.reset()
+    validator = CategoryValidator("ManoMano", "tiles", QUALITY)
+    page = [product(n) for n in range(4)]
+    assert validator.check(page) == []
+    assert validator.check(page) == ["4/4 products already seen"]
+    assert quality_report(telemetry.report())["ManoMano"]["duplicate_rate"] == 0.5
+
+
+def test_empty_page_is_a_bad_page():
+    # A drifted product_selector: the grid wait times out, no records
+    validator = CategoryValidator("Castorama", "tiles", QUALITY)
+    assert validator.check([]) == ["no products"]
+    validator.check([])
+    assert validator.failed
+
+
+class FakeBrowser:
+    def __init__(self, playwright, name):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_failed_first_page_is_a_bad_page(monkeypatch):
+    telemetry.reset()
+
+    def fetch_page(*args, **kw):
+        raise TimeoutError("grid never showed up")
+
+    monkeypatch.setattr(common, "fetch_page", fetch_page)
+    monkeypatch.setattr(common, "sync_playwright", contextlib.nullcontext)
+    monkeypatch.setattr(common, "ManagedBrowser", FakeBrowser)
+    castorama = dict(SUPPLIER, name="Castorama")
+    assert common.scrape_category(castorama, "tiles", "https://x", SELECTORS) == []
+    quality = quality_report(telemetry.report())["Castorama"]
+    assert (quality["records"], quality["bad_pages"]) == (0, 1)
@@ -0,0 +1,147 @@
+from types import SimpleNamespace
+
+import pytest
+
+from scrapers import main
+from scrapers.crawl_state import CrawlState, fingerprint
+from scrapers.workqueue import WorkQueue, next_units
+
+CONTEXT = {"name": "Castorama", "base_url": "https://www.castorama.fr"}
+RECORDS = [{"name": "Carrelage sol", "price": "19,90€", "image_url": "a.jpg"}]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.sqlite"))
+    yield queue
+    queue.close()
+
+
+def put(queue, url, supplier="Castorama", **fields):
+    key = ("Sol", "Carrelage", None)
+    queue.put(supplier, key, url, dict(CONTEXT, name=supplier), {}, **fields)
+
+
+def test_claims_respect_supplier_caps(queue):
+    for i in range(3):
+        put(queue, f"https://www.castorama.fr/c{i}")
+    put(queue, "https://www.manomano.fr/c0", supplier="ManoMano")
+    caps = {"Castorama": 2, "ManoMano": 1}
+    claimed = [queue.claim("w", caps) for _ in range(4)]
+    assert [u["supplier"] for u in claimed[:3]] == ["Castorama"] * 2 + ["ManoMano"]
+    assert claimed[3] is None
+    assert claimed[0]["category_key"] == ("Sol", "Carrelage", None)
+
+
+def test_expired_leases_are_retried_and_results_stored_once(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WorkQueue(path, lease_seconds=-1)
+    put(queue, "https://www.castorama.fr/c0")
+    first = queue.claim("dead-worker", {"Castorama": 1})
+    again = WorkQueue(path).claim("w2", {"Castorama": 1})
+    assert again["id"] == first["id"] and again["attempts"] == 2
+    queue.complete(first, RECORDS)
+    queue.complete(again, RECORDS)
+    assert list(queue.iter_merged()) == RECORDS
+    assert queue.unfinished() == 0
+    queue.close()
+
+
+def test_failed_pages_are_retried_until_max_attempts(queue):
+    put(queue, "https://www.castorama.fr/c0")
+    for attempt in range(3):
+        unit = queue.claim("w", {"Castorama": 1})
+        state = queue.fail(unit, RuntimeError("grid never showed up"))
+    assert state == "failed"
+    assert queue.claim("w", {"Castorama": 1}) is None
+    assert queue.counts() == {"failed": 1}
+
+
+def test_pagination_is_enqueued_in_the_same_transaction(queue):
+    put(queue, "https://www.castorama.fr/c0")
+    unit = queue.claim("w", {"Castorama": 1})
+    follow, stopped = next_units(unit, RECORDS, "https://www.castorama.fr/c0?page=2")
+    assert stopped is None
+    queue.complete(unit, RECORDS, follow)
+    page_two = queue.claim("w", {"Castorama": 1})
+    assert (page_two["page"], page_two["collected"]) == (2, 1)
+    assert next_units(page_two, RECORDS, None) == ([], None)
+
+
+def test_unchanged_first_page_is_not_paginated(queue):
+    for url, known in [("c0", fingerprint(RECORDS)), ("c1", "previous crawl")]:
+        put(queue, url, known_fingerprint=known, full_crawl=False)
+    unchanged = queue.claim("w", {"Castorama": 2})
+    changed = queue.claim("w", {"Castorama": 2})
+    assert next_units(unchanged, RECORDS, "c0?page=2") == ([], "unchanged")
+    follow, _ = next_units(changed, RECORDS, "c1?page=2")
+    assert [u["page"] for u in follow] == [2]
+
+
+def test_templated_pages_fan_out_from_page_one(queue, monkeypatch):
+    monkeypatch.setenv("CASTORAMA_PAGE_LIMIT", "4")
+    put(queue, "https://www.castorama.fr/c0?sort=price")
+    unit = queue.claim("w", {"Castorama": 1})
+    follow, stopped = next_units(unit, RECORDS * 24, "ignored", total=12)
+    assert [u["url"] for u in follow] == [
+        f"https://www.castorama.fr/c0?sort=price&page={n}" for n in (2, 3, 4)
+    ]
+    assert stopped == "limit"
+    queue.complete(unit, RECORDS * 24, follow, stopped=stopped)
+    pages = [queue.claim("w", {"Castorama": 3}) for _ in range(3)]
+    assert pages[1]["collected"] == 48
+    assert next_units(pages[1], RECORDS * 24, "c0?page=4") == ([], None)
+    for page in pages[:2]:
+        queue.complete(page, RECORDS * 24)
+    assert queue.finished_categories() == {}
+    queue.complete(pages[2], RECORDS * 24)
+    key = ("Castorama", ("Sol", "Carrelage", None))
+    assert queue.finished_categories() == {key: "limit"}
+
+
+def test_bad_pages_are_counted_across_workers_and_skip_the_category(queue):
+    for page in (1, 2, 3):
+        put(queue, f"https://www.castorama.fr/c0?page={page}", page=page)
+    first = queue.claim("w1", {"Castorama": 3})
+    second = queue.claim("w2", {"Castorama": 3})
+    assert queue.complete(first, [], bad_page=True, max_bad_pages=2) == 1
+    follow = [
+        dict(
+            supplier="Castorama",
+            category_key=("Sol", "Carrelage", None),
+            url="https://www.castorama.fr/c0?page=4",
+            context=CONTEXT,
+            selectors={},
+        )
+    ]
+    assert queue.complete(second, [], follow, bad_page=True, max_bad_pages=2) == 2
+    # Page 3 was already enqueued; it is skipped and page 4 never queued
+    assert queue.counts() == {"done": 2, "skipped": 1}
+    assert queue.unfinished() == 0
+    assert queue.finished_categories() == {}
+
+
+def test_worker_crawl_completes_only_finished_categories(tmp_path, monkeypatch):
+    path = str(tmp_path / "queue.sqlite")
+    monkeypatch.setattr(main, "WorkQueue", lambda: WorkQueue(path))
+    categories = [("Carrelage", "c0"), ("Parquet", "c1")]
+    monkeypatch.setattr(main, "discover_categories", lambda s, c: categories)
+    monkeypatch.setattr(main, "category_context", lambda s, k: (CONTEXT, {}))
+
+    def run_workers(path, workers, caps, page_budget):
+        queue = WorkQueue(path)
+        queue.complete(queue.claim("w", caps), RECORDS)
+        queue.fail(queue.claim("w", caps), RuntimeError("boom"), max_attempts=1)
+        queue.close()
+        return [1]
+
+    monkeypatch.setattr(main, "run_workers", run_workers)
+    crawl_state = CrawlState(str(tmp_path / "state.json"))
+    fed = []
+    pipeline = SimpleNamespace(feed=fed.extend)
+    main.crawl_with_workers([{"name": "Castorama"}], crawl_state, 0, pipeline, 1)
+    assert fed == RECORDS
+    assert crawl_state.completed == {"Castorama|Carrelage"}
+    assert crawl_state.plan("Castorama|Carrelage")[0] == fingerprint(RECORDS)
+    # The failed category is neither observed nor complete
+    assert "Castorama|Parquet" not in crawl_state.categories
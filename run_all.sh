@@ -2,12 +2,21 @@
 
 cd donizo-material-scraper
 
+# Number of API worker processes (set API_WORKERS=4 to serve with 4 workers)
+API_WORKERS=${API_WORKERS:-1}
+
 # Start FastAPI (on port 8000) in the background
-uvicorn apis.api:app --reload &
+if [ "$API_WORKERS" -gt 1 ]; then
+  # Build the shared snapshot once so workers only map it
+  python -m scrapers.snapshot
+  uvicorn apis.api:app --workers "$API_WORKERS" &
+else
+  uvicorn apis.api:app --reload &
+fi
 API_PID=$!
 
 # Start Streamlit (on port 8501) in the foreground
 streamlit run streamlit_app.py
 
 # When Streamlit exits, kill the FastAPI server
-kill $API_PID 
\ No newline at end of file
+kill $API_PID 